@@ -0,0 +1,54 @@
+"""
+Benchmarks for RossROS.
+
+Each benchmark module provides a run(backend, duration) function that measures one aspect of RossROS
+performance on the "thread" (rossros) or "asyncio" (rossros_asyncio) backend, and returns a list of result
+dictionaries. Running the package (python -m benchmarks) runs the benchmarks and writes the results as JSON,
+so that they can be compared between versions to catch performance regressions.
+"""
+
+import importlib
+
+# The backends that the benchmarks can run on, and the RossROS module that implements each one
+backend_modules = {"thread": "rossros",
+                   "asyncio": "rossros_asyncio"}
+
+
+def getBackend(backend):
+    """
+    Function that imports and returns the RossROS module for a backend
+    """
+
+    if backend not in backend_modules:
+        raise ValueError("Unknown backend {0!r}: expected one of {1}".format(backend, sorted(backend_modules)))
+
+    return importlib.import_module(backend_modules[backend])
+
+
+def makeResult(benchmark, backend, **values):
+    """
+    Function that builds a result dictionary, naming the benchmark and backend before the measured values
+    """
+
+    result = {"benchmark": benchmark, "backend": backend}
+    result.update(values)
+
+    return result
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """
+    Function that returns the requested percentiles (nearest-rank) and maximum of a list of samples
+    """
+
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    summary = {}
+    for point in points:
+        rank = min(len(ordered) - 1, max(0, int(round(point / 100 * len(ordered))) - 1))
+        summary["p{0:d}".format(point)] = ordered[rank]
+    summary["max"] = ordered[-1]
+
+    return summary
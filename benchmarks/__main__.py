@@ -0,0 +1,67 @@
+"""
+Run the RossROS benchmarks and write their results as JSON.
+
+Usage:
+
+python -m benchmarks [--backend thread|asyncio|all] [--benchmark NAME ...] [--duration SECONDS] [--output FILE]
+
+The output is a JSON document holding the Python version, platform, and time of the run, followed by a
+list of result dictionaries (one per measurement), so that runs can be stored and compared.
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import platform
+import sys
+import time
+
+from benchmarks import backend_modules
+
+# Benchmark modules, in the order they are run
+benchmark_names = ("bus_throughput", "fast_methods", "loop_overhead", "node_scaling", "pipeline_latency")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the RossROS benchmarks")
+    parser.add_argument("--backend", choices=sorted(backend_modules) + ["all"], default="all",
+                        help="backend to benchmark (default: all)")
+    parser.add_argument("--benchmark", choices=benchmark_names, action="append",
+                        help="benchmark to run (may be repeated; default: all)")
+    parser.add_argument("--duration", type=float, default=1.0,
+                        help="seconds to spend on each measurement (default: 1)")
+    parser.add_argument("--output", help="file to write the JSON results to (default: standard output)")
+    args = parser.parse_args(argv)
+
+    # Keep DEBUG logging off, so that the fast methods are used unless a benchmark asks otherwise
+    logging.getLogger().setLevel(logging.INFO)
+
+    if args.backend == "all":
+        backends = sorted(backend_modules)
+    else:
+        backends = [args.backend]
+
+    results = []
+    for name in args.benchmark or benchmark_names:
+        benchmark = importlib.import_module("benchmarks." + name)
+        for backend in backends:
+            print("Running {0:s} on the {1:s} backend".format(name, backend), file=sys.stderr)
+            results.extend(benchmark.run(backend, args.duration))
+
+    report = {"python": platform.python_version(),
+              "platform": platform.platform(),
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "duration": args.duration,
+              "results": results}
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == "__main__":
+    main()
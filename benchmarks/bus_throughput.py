@@ -0,0 +1,152 @@
+"""
+Benchmark of bus read/write throughput under contention.
+
+On the thread backend, it starts writer and reader threads that hammer a single bus for a fixed length of
+time, for several bus types and numbers of readers and writers. On the asyncio backend, the readers and
+writers are tasks that yield to each other after every batch of operations. In both cases it reports the
+number of reads and writes completed per second.
+"""
+
+import asyncio
+import threading
+import time
+
+from benchmarks import getBackend, makeResult
+
+# Numbers of readers and writers to test
+reader_counts = (1, 4, 16)
+writer_counts = (1, 2)
+
+# Number of operations an asyncio task performs before yielding to the other tasks
+asyncio_batch = 100
+
+# Number of operations a thread performs between checks of the deadline, and how many seconds past the
+# deadline to wait for the threads to stop
+thread_batch = 100
+join_timeout = 5.0
+
+
+def busClasses(rr, n_writers):
+    """ Return the bus classes that can be tested with the given number of writers """
+    bus_classes = [rr.Bus, rr.HistoryBus]
+    if n_writers == 1:
+        bus_classes.append(rr.SingleWriterBus)
+    return bus_classes
+
+
+def measureThreads(bus, n_readers, n_writers, duration):
+    """
+    Run reader and writer threads against a bus, returning the total reads and writes, and the number of
+    seconds they took
+    """
+    read_counts = [0] * n_readers
+    write_counts = [0] * n_writers
+    times = {}
+
+    # The threads all start together, with the deadline set once the last of them is ready, so that threads
+    # started late are not left with no time to run
+    def setDeadline():
+        times['start'] = time.monotonic()
+        times['end'] = times['start'] + duration
+
+    start_barrier = threading.Barrier(n_readers + n_writers, action=setDeadline)
+
+    # Each thread watches the deadline itself (checking it after each batch of operations), so that the
+    # measurement does not depend on the main thread getting the GIL back to stop the others. Every thread
+    # completes at least one batch, even if it only gets the GIL after the deadline
+    def reader(idx):
+        start_barrier.wait()
+        while True:
+            for _ in range(thread_batch):
+                bus.get_message("reader")
+            read_counts[idx] += thread_batch
+            if time.monotonic() >= times['end']:
+                break
+
+    def writer(idx):
+        start_barrier.wait()
+        while True:
+            for count in range(thread_batch):
+                bus.set_message(count, "writer")
+            write_counts[idx] += thread_batch
+            if time.monotonic() >= times['end']:
+                break
+
+    threads = [threading.Thread(target=reader, args=(idx,), daemon=True) for idx in range(n_readers)]
+    threads += [threading.Thread(target=writer, args=(idx,), daemon=True) for idx in range(n_writers)]
+    for t in threads:
+        t.start()
+
+    # Give the threads a grace period to finish their last batch, rather than waiting on a stuck one forever
+    t_join = time.monotonic() + duration + join_timeout
+    for t in threads:
+        t.join(max(0.0, t_join - time.monotonic()))
+    if any(t.is_alive() for t in threads):
+        raise RuntimeError("bus_throughput: {0:s} threads did not stop within {1:g} s of the deadline".format(
+            type(bus).__name__, join_timeout))
+
+    # The last batches can run past the deadline, so measure the rates over the time the threads took
+    return sum(read_counts), sum(write_counts), time.monotonic() - times['start']
+
+
+async def measureTasks(bus, n_readers, n_writers, duration):
+    """
+    Run reader and writer tasks against a bus, returning the total reads and writes, and the number of
+    seconds they took
+    """
+    t_start = time.monotonic()
+    t_end = t_start + duration
+    read_counts = [0] * n_readers
+    write_counts = [0] * n_writers
+
+    # As with the threads, every task completes at least one batch
+    async def reader(idx):
+        while True:
+            for _ in range(asyncio_batch):
+                bus.get_message("reader")
+            read_counts[idx] += asyncio_batch
+            if time.monotonic() >= t_end:
+                break
+            await asyncio.sleep(0)
+
+    async def writer(idx):
+        while True:
+            for count in range(asyncio_batch):
+                bus.set_message(count, "writer")
+            write_counts[idx] += asyncio_batch
+            if time.monotonic() >= t_end:
+                break
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*[reader(idx) for idx in range(n_readers)],
+                         *[writer(idx) for idx in range(n_writers)])
+
+    return sum(read_counts), sum(write_counts), time.monotonic() - t_start
+
+
+def run(backend="thread", duration=1.0):
+    """
+    Measure bus throughput for each bus type, reader count and writer count, spending the given
+    duration on each combination
+    """
+
+    rr = getBackend(backend)
+    results = []
+
+    for n_writers in writer_counts:
+        for n_readers in reader_counts:
+            for bus_class in busClasses(rr, n_writers):
+                bus = bus_class(0, "Benchmark bus")
+                if backend == "asyncio":
+                    reads, writes, elapsed = asyncio.run(measureTasks(bus, n_readers, n_writers, duration))
+                else:
+                    reads, writes, elapsed = measureThreads(bus, n_readers, n_writers, duration)
+
+                results.append(makeResult("bus_throughput", backend,
+                                          bus=bus_class.__name__,
+                                          readers=n_readers,
+                                          writers=n_writers,
+                                          reads_per_s=reads / elapsed,
+                                          writes_per_s=writes / elapsed))
+
+    return results
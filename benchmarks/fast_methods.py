@@ -0,0 +1,53 @@
+"""
+Benchmark of the logging decorators on the RossROS bus read/write path.
+
+It builds one bus and consumer-producer with the logged methods, and one with the undecorated fast methods
+that RossROS installs when DEBUG logging is disabled, and times reads, writes and the collect/deal/termination
+steps that a consumer-producer runs on every loop iteration.
+"""
+
+import timeit
+
+from benchmarks import getBackend, makeResult
+
+
+def timePerCall(statement, number):
+    """ Time a statement, returning the best-of-three cost per call in microseconds """
+    return min(timeit.repeat(statement, number=number, repeat=3)) / number * 1e6
+
+
+def run(backend="thread", duration=1.0):
+    """
+    Measure the per-call cost of the logged and fast methods, spending roughly the given duration
+    """
+
+    rr = getBackend(backend)
+    results = []
+
+    # Split the time between the five operations, the two paths, and the three repeats, assuming each call
+    # takes of the order of 50 microseconds on the logged path
+    number = max(100, int(duration / (5 * 2 * 3) / 50e-6))
+
+    for fast in (False, True):
+        rr.setFastMethods(fast)
+        bus = rr.Bus(0, "Benchmark bus")
+        node = rr.ConsumerProducer(lambda x: x, bus, bus, 0, rr.Bus(False, "Benchmark termination bus"),
+                                   "Benchmark node")
+
+        operations = {
+            "get_message": lambda: bus.get_message("bench"),
+            "set_message": lambda: bus.set_message(1, "bench"),
+            "collectbusesToValues": lambda: node.collectbusesToValues(node.input_buses),
+            "dealValuesTobuses": lambda: node.dealValuesTobuses(1, node.output_buses),
+            "checkTerminationbuses": node.checkTerminationbuses,
+        }
+        for operation, statement in operations.items():
+            results.append(makeResult("fast_methods", backend,
+                                      operation=operation,
+                                      fast_methods=fast,
+                                      us_per_call=timePerCall(statement, number)))
+
+    # Restore automatic selection of the fast methods
+    rr.setFastMethods(None)
+
+    return results
@@ -0,0 +1,49 @@
+"""
+Benchmark of the per-iteration overhead of the ConsumerProducer loop.
+
+It runs a consumer-producer with a no-op function and no delay, with and without the fast methods, until a
+timer stops it, and divides the elapsed time by the number of cycles completed. Because the function does no
+work, the result is the cost that RossROS adds to every cycle (termination check, bus reads and writes,
+scheduling and metrics).
+"""
+
+import time
+
+from benchmarks import getBackend, makeResult
+
+
+def noOp(value):
+    return value
+
+
+def run(backend="thread", duration=1.0):
+    """
+    Measure the per-iteration overhead of a no-op consumer-producer, running it for the given
+    duration with each logging path
+    """
+
+    rr = getBackend(backend)
+    results = []
+
+    for fast in (False, True):
+        rr.setFastMethods(fast)
+
+        bTerminate = rr.Bus(0, "Benchmark termination bus")
+        bValue = rr.Bus(0, "Benchmark value bus")
+        node = rr.ConsumerProducer(noOp, bValue, bValue, 0, bTerminate, "No-op node")
+        timer = rr.Timer(bTerminate, duration, 0.01, bTerminate, "Benchmark timer")
+
+        t_start = time.perf_counter()
+        rr.runConcurrently([node, timer])
+        elapsed = time.perf_counter() - t_start
+
+        iterations = node.getMetrics()["iterations"]
+        results.append(makeResult("loop_overhead", backend,
+                                  fast_methods=fast,
+                                  iterations=iterations,
+                                  us_per_iteration=elapsed / max(iterations, 1) * 1e6))
+
+    # Restore automatic selection of the fast methods
+    rr.setFastMethods(None)
+
+    return results
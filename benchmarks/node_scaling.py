@@ -0,0 +1,88 @@
+"""
+Benchmark of how a graph of many low-rate nodes scales with the number of nodes.
+
+It runs a number of independent consumer-producers, each cycling every 20 ms, until a timer stops them, and
+reports the cycles completed per second, the peak number of threads, and the context switches incurred. On the
+thread backend this is done for each execution mode that keeps the nodes in one process ("thread", which gives
+every node its own thread, "executive" and the fixed-size worker "pool"); the asyncio backend runs every node
+as a task on one event loop.
+"""
+
+import resource
+import threading
+import time
+
+from benchmarks import getBackend, makeResult
+
+# Numbers of nodes to test
+node_counts = (10, 100, 200)
+
+# Loop delay of each node, in seconds
+node_delay = 0.02
+
+# Execution modes to compare on the thread backend, and the number of workers in the pool
+thread_executions = ("thread", "executive", "pool")
+pool_workers = 4
+
+
+def increment(value):
+    return value + 1
+
+
+def measureGraph(rr, n_nodes, duration, execution):
+    """ Run a graph of independent nodes, returning the cycles, peak threads and context switches """
+    bTerminate = rr.Bus(0, "Benchmark termination bus")
+    nodes = [rr.ConsumerProducer(increment, bus, bus, node_delay, bTerminate, "Node {0:d}".format(idx))
+             for idx, bus in enumerate(rr.Bus(0, "Node bus {0:d}".format(idx)) for idx in range(n_nodes))]
+    timer = rr.Timer(bTerminate, duration, 0, bTerminate, "Benchmark timer")
+
+    # Sample the number of running threads while the graph runs
+    peak_threads = [threading.active_count()]
+    stop = threading.Event()
+
+    def sampleThreads():
+        while not stop.wait(0.01):
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+    sampler = threading.Thread(target=sampleThreads)
+    sampler.start()
+
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    if execution is None:
+        rr.runConcurrently(nodes + [timer])
+    else:
+        rr.runConcurrently(nodes + [timer], execution=execution, workers=pool_workers)
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+
+    stop.set()
+    sampler.join()
+
+    cycles = sum(node.getMetrics()["iterations"] for node in nodes)
+    context_switches = (usage_end.ru_nvcsw + usage_end.ru_nivcsw) - (usage_start.ru_nvcsw + usage_start.ru_nivcsw)
+
+    # Leave out the sampling thread itself
+    return cycles, peak_threads[0] - 1, context_switches
+
+
+def run(backend="thread", duration=1.0):
+    """
+    Measure node throughput, threads and context switches for each node count (and, on the thread
+    backend, each execution mode), running each graph for the given duration
+    """
+
+    rr = getBackend(backend)
+    results = []
+
+    executions = thread_executions if backend == "thread" else (None,)
+    for execution in executions:
+        for n_nodes in node_counts:
+            cycles, threads, context_switches = measureGraph(rr, n_nodes, duration, execution)
+            results.append(makeResult("node_scaling", backend,
+                                      execution=execution or "asyncio",
+                                      nodes=n_nodes,
+                                      cycles_per_s=cycles / duration,
+                                      expected_cycles_per_s=n_nodes / node_delay,
+                                      peak_threads=threads,
+                                      context_switches=context_switches))
+
+    return results
@@ -0,0 +1,82 @@
+"""
+Benchmark of sensor-to-actuator latency through a chain of consumer-producers.
+
+A "sensor" producer writes the current time to the first bus of a chain, a number of pass-through stages
+copy it along the chain, and an "actuator" consumer at the end records how long each new value took to
+arrive. The chain is run with polling stages (each with a fixed delay) and with triggered stages (which run
+when their input bus is written), and the latency percentiles are reported for each chain length.
+"""
+
+import time
+
+from benchmarks import getBackend, makeResult, percentiles
+
+# Numbers of pass-through stages to test
+stage_counts = (1, 4, 8)
+
+# Period of the sensor, and loop delay of the polling stages and the actuator, in seconds
+sensor_delay = 0.01
+stage_delay = 0.005
+
+
+def passThrough(value):
+    return value
+
+
+def measureChain(rr, n_stages, trigger, duration):
+    """ Run a chain with the given number of stages, returning the latencies seen by the actuator """
+    bTerminate = rr.Bus(0, "Benchmark termination bus")
+    buses = [rr.Bus(time.perf_counter(), "Stage bus {0:d}".format(idx)) for idx in range(n_stages + 1)]
+
+    sensor = rr.Producer(time.perf_counter, buses[0], sensor_delay, bTerminate, "Sensor")
+
+    # Triggered stages run as soon as their input changes; polling stages check it every stage_delay
+    if trigger:
+        delay = 0
+        trigger_mode = "any"
+    else:
+        delay = stage_delay
+        trigger_mode = None
+
+    stages = [rr.ConsumerProducer(passThrough, buses[idx], buses[idx + 1], delay, bTerminate,
+                                  "Stage {0:d}".format(idx), trigger=trigger_mode)
+              for idx in range(n_stages)]
+
+    # The actuator records the latency of each new sensor value that reaches the end of the chain
+    latencies = []
+    last_stamp = [None]
+
+    def actuator(stamp):
+        if stamp != last_stamp[0]:
+            latencies.append(time.perf_counter() - stamp)
+            last_stamp[0] = stamp
+
+    sink = rr.Consumer(actuator, buses[-1], delay, bTerminate, "Actuator", trigger=trigger_mode)
+    timer = rr.Timer(bTerminate, duration, 0.01, bTerminate, "Benchmark timer")
+
+    rr.runConcurrently([sensor] + stages + [sink, timer])
+
+    # The first value is the one the buses were created with, not one sent by the sensor
+    return latencies[1:]
+
+
+def run(backend="thread", duration=1.0):
+    """
+    Measure end-to-end latency for each chain length, with polling and triggered stages, running
+    each chain for the given duration
+    """
+
+    rr = getBackend(backend)
+    results = []
+
+    for trigger in (False, True):
+        for n_stages in stage_counts:
+            latencies = measureChain(rr, n_stages, trigger, duration)
+            summary = {key + "_ms": value * 1000 for key, value in percentiles(latencies).items()}
+            results.append(makeResult("pipeline_latency", backend,
+                                      stages=n_stages,
+                                      mode="trigger" if trigger else "polling",
+                                      samples=len(latencies),
+                                      **summary))
+
+    return results
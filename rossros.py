@@ -1,31 +1,166 @@
 #! /usr/bin/python3
+import bisect
+import collections
 import concurrent.futures
+import cProfile
+import functools
+import heapq
+import inspect
+import mmap
+import multiprocessing
+import os
+import pickle
+import pstats
+import re
+import selectors
+import socket
+import struct
+import sys
+import threading
 import time
+import types
+import weakref
 import logging
+from multiprocessing import shared_memory
 from readerwriterlock import rwlock
 from logdecorator import log_on_start, log_on_end, log_on_error
 
+# NumPy is only needed for ArrayBus
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 DEBUG = logging.DEBUG
 logging_format = "%(asctime)s: %(message)s"
 logging.basicConfig(format=logging_format, level=logging.INFO,
                     datefmt="%H:%M:%S")
 
+# Multiprocessing context used for process buses and process-backed consumer-producers. Forking lets child
+# processes inherit their consumer-producers (including functions that cannot be pickled, such as lambdas) and
+# the shared memory behind the process buses; where fork is unavailable, the platform default is used instead
+if 'fork' in multiprocessing.get_all_start_methods():
+    process_context = multiprocessing.get_context('fork')
+else:
+    process_context = multiprocessing.get_context()
+
+# Whether buses and consumer-producers should replace their logged per-iteration methods with undecorated
+# versions when they are constructed. None means "do so whenever DEBUG logging is disabled at construction
+# time"; True and False force the fast or the logged methods on. Change this with setFastMethods
+FAST_METHODS = None
+
+
+def setFastMethods(mode):
+    """
+    Function that selects whether objects created from now on use undecorated fast methods
+    (True), logged methods (False), or whichever matches the current logging level (None)
+    """
+
+    global FAST_METHODS
+    FAST_METHODS = mode
+
+
+def installFastMethods(obj, method_names):
+    """
+    Function that replaces the named logged methods of an object with their undecorated versions,
+    skipping the log_on_start/log_on_error/log_on_end wrappers (which format their messages on every call,
+    even when the messages are then discarded)
+    """
+
+    # Decide whether to install the fast methods
+    if FAST_METHODS is None:
+        use_fast_methods = not logging.getLogger(__name__).isEnabledFor(DEBUG)
+    else:
+        use_fast_methods = FAST_METHODS
+
+    if not use_fast_methods:
+        return
+
+    # Bind the innermost function behind each logged method directly onto the instance, where it
+    # shadows the decorated method on the class
+    for method_name in method_names:
+        undecorated = inspect.unwrap(getattr(type(obj), method_name))
+        setattr(obj, method_name, types.MethodType(undecorated, obj))
+
+
+# Metadata attached to each write on a stamped bus: the monotonic time of the write, the bus version it created,
+# and the name of the writer, along with the time and writer of the source write that the message derives from
+# (for a message computed from stamped inputs, the oldest of their sources; otherwise the write itself)
+MessageStamp = collections.namedtuple(
+    'MessageStamp', ('timestamp', 'sequence', 'writer', 'origin_time', 'origin_writer'))
+
+
+def makeStamp(sequence, writer, origin=None):
+    """
+    Function that stamps a write with the current time, carrying over the source of the origin stamp (if any)
+    """
+
+    timestamp = time.monotonic()
+    if origin is None:
+        return MessageStamp(timestamp, sequence, writer, timestamp, writer)
+    else:
+        return MessageStamp(timestamp, sequence, writer, origin.origin_time, origin.origin_writer)
+
+
+def olderOrigin(origin, stamp):
+    """
+    Function that returns whichever of two stamps (either of which may be None) has the older source
+    """
+
+    if stamp is None or (origin is not None and origin.origin_time <= stamp.origin_time):
+        return origin
+    else:
+        return stamp
+
 
 class Bus:
     """
     Class for passing broadcast messages between processes.
     """
 
+    # Logged methods that are swapped for undecorated versions when DEBUG logging is off
+    fast_method_names = ('get_message', 'set_message', 'get_stamped_message')
+
+    # Whether the bus can carry messages between processes (see runConcurrently)
+    process_shared = False
+
+    # Whether writes to the bus are stamped (buses that do not support stamping leave this off)
+    stamped = False
+
+    # Group that the bus belongs to, if any (see BusGroup)
+    group = None
+
+    # Whether the bus is a placeholder for a bus argument that was not given (see placeholderBus)
+    placeholder = False
+
     def __init__(self,
                  initial_message=0,
-                 name="Unnamed Bus"):
+                 name="Unnamed Bus",
+                 stamped=False):  # stamp every write with its time, sequence number and writer
 
         self.message = initial_message
         self.name = name
 
+        # The stamp of the latest write (None until the bus is first written, or if stamping is off)
+        self.stamped = stamped
+        self.stamp = None
+
         # Set up the class so that functions can get a lock while working
         self.lock = rwlock.RWLockFairD()
 
+        # Count the writes to the bus, so that readers can tell whether the message has changed, and set up a
+        # condition that readers can wait on until it does. Listeners are functions (taking no arguments) that
+        # are called after every write, so that one reader can wait for changes on several buses at once. Write
+        # listeners are called with each message while the write still holds the bus, so that they see exactly
+        # the messages written, in the order they were written
+        self.version = 0
+        self.changed = threading.Condition()
+        self.listeners = []
+        self.write_listeners = []
+
+        # Skip the logging decorators on reads and writes if they would not log anything
+        installFastMethods(self, self.fast_method_names)
+
     @log_on_start(DEBUG, "{self.name:s}: Initiating read by {_name:s}")
     @log_on_error(DEBUG, "{self.name:s}: Error on read by {_name:s}")
     @log_on_end(DEBUG, "{self.name:s}: Finished read by {_name:s}")
@@ -39,307 +174,4086 @@ class Bus:
     @log_on_start(DEBUG, "{self.name:s}: Initiating write by {_name:s}")
     @log_on_error(DEBUG, "{self.name:s}: Error on write by {_name:s}")
     @log_on_end(DEBUG, "{self.name:s}: Finished write by {_name:s}")
-    def set_message(self, message, _name='Unspecified function'):
+    def set_message(self, message, _name='Unspecified function', _origin=None):
 
         with self.lock.gen_wlock():
             self.message = message
+            self.version += 1
+            if self.stamped:
+                self.stamp = makeStamp(self.version, _name, _origin)
+            for write_listener in self.write_listeners:
+                write_listener(message)
 
+        # Wake up anything waiting for the message to change
+        with self.changed:
+            self.changed.notify_all()
+        for listener in self.listeners:
+            listener()
 
-def ensureTuple(value):
+    @log_on_start(DEBUG, "{self.name:s}: Initiating wait for change by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on wait for change by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished wait for change by {_name:s}")
+    def wait_for_change(self, version, timeout=None, _name='Unspecified function'):
+
+        # Block until the bus has been written since it was at the given version (or until the timeout
+        # runs out), and return the current version
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+
+        return self.version
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating stamped read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on stamped read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished stamped read by {_name:s}")
+    def get_stamped_message(self, _name='Unspecified function'):
+
+        # Read the message together with the stamp of the write that stored it
+        with self.lock.gen_rlock():
+            message = self.message
+            stamp = self.stamp
+
+        return message, stamp
+
+    def add_listener(self, listener):
+
+        # Register a function to be called after every write to the bus
+        self.listeners.append(listener)
+
+    def add_write_listener(self, write_listener):
+
+        # Register a function to be called with every message written to the bus
+        self.write_listeners.append(write_listener)
+
+
+class SingleWriterBus(Bus):
     """
-    Function that wraps an input value in a tuple if it is not already a tuple
+    Bus for topics that have exactly one writer, which skips the reader-writer lock. Reading or replacing
+    the message is a single reference operation (atomic under the GIL), so readers always see either the
+    old or the new message, and with only one writer there is no race on the version counter
     """
-    
-    if isinstance(value, tuple):
-        value_tuple = value
-    else:
-        value_tuple = (value,)  # comma creates the tuple
 
-    return value_tuple
+    def __init__(self,
+                 initial_message=0,
+                 name="Unnamed Bus",
+                 stamped=False):
 
+        super().__init__(initial_message, name, stamped)
 
-class ConsumerProducer:
+        # Stamped messages are also stored as a (message, stamp) pair, so that readers get a matching pair
+        # from a single reference read
+        self.stamped_message = (initial_message, None)
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished read by {_name:s}")
+    def get_message(self, _name='Unspecified function'):
+
+        return self.message
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating write by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on write by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished write by {_name:s}")
+    def set_message(self, message, _name='Unspecified function', _origin=None):
+
+        # Publish the new message before bumping the version, so that a reader that sees the new version
+        # also sees the new message
+        if self.stamped:
+            self.stamp = makeStamp(self.version + 1, _name, _origin)
+            self.stamped_message = (message, self.stamp)
+        self.message = message
+        self.version += 1
+        for write_listener in self.write_listeners:
+            write_listener(message)
+
+        # Wake up anything waiting for the message to change
+        with self.changed:
+            self.changed.notify_all()
+        for listener in self.listeners:
+            listener()
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating stamped read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on stamped read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished stamped read by {_name:s}")
+    def get_stamped_message(self, _name='Unspecified function'):
+
+        return self.stamped_message
+
+
+class HistoryBus(Bus):
     """
-    Class that turns a provided function into a service that reads from
-    the input buses, stores the resulting data into the output buses,
-    and watches a set of termination buses for a "True" or non-negative signal, at which
-    point the service shuts down
+    Bus that keeps a history of the messages written to it in a preallocated ring buffer, so that readers that
+    run slower than the writer can still see every sample. get_message returns the latest message as for a
+    regular bus, while drain returns all of the samples that a given reader has not yet seen. When the ring
+    is full of samples that a registered reader has not drained, the overflow policy decides whether to
+    overwrite the oldest sample ("drop_oldest"), discard the new one ("drop_newest"), or make the writer wait
+    for the reader ("block"). A blocked writer gives up on readers that have not drained anything within
+    block_timeout seconds, unregistering them so that a reader that has stopped cannot hold up the writer for
+    good (a reader that comes back is registered again by its next drain). On a stamped bus, drain_stamped also
+    returns the stamp of each sample. Readers are told apart by their names, unless they pass a reader token
+    (such as the node object) to keep readers that share a name apart
     """
 
-    @log_on_start(DEBUG, "{name:s}: Starting to create consumer-producer")
-    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating consumer-producer")
-    @log_on_end(DEBUG, "{name:s}: Finished creating consumer-producer")
+    # Logged methods that are swapped for undecorated versions when DEBUG logging is off
+    fast_method_names = ('get_message', 'set_message', 'get_stamped_message', 'drain', 'drain_stamped')
+
     def __init__(self,
-                 consumer_producer_function,
-                 input_buses,
-                 output_buses,
-                 delay=0,
-                 termination_buses=Bus(False, "Default consumer_producer termination bus"),
-                 name="Unnamed consumer_producer"):
+                 initial_message=0,
+                 name="Unnamed Bus",
+                 capacity=64,  # number of samples held in the ring
+                 overflow="drop_oldest",  # "drop_oldest", "drop_newest" or "block"
+                 stamped=False,  # stamp every write with its time, sequence number and writer
+                 block_timeout=1.0):  # seconds a blocked writer waits before giving up on the readers holding it
 
-        self.consumer_producer_function = consumer_producer_function
-        self.input_buses = ensureTuple(input_buses)
-        self.output_buses = ensureTuple(output_buses)
-        self.delay = delay
-        self.termination_buses = ensureTuple(termination_buses)
-        self.name = name
+        if overflow not in ('drop_oldest', 'drop_newest', 'block'):
+            raise ValueError("{0:s}: overflow must be 'drop_oldest', 'drop_newest' or 'block', not {1!r}".format(
+                name, overflow))
 
-    @log_on_start(DEBUG, "{self.name:s}: Starting consumer-producer service")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while executing consumer-producer")
-    @log_on_end(DEBUG, "{self.name:s}: Closing down consumer-producer service")
-    def __call__(self):
+        super().__init__(initial_message, name, stamped)
 
-        while True:
+        self.capacity = capacity
+        self.overflow = overflow
+        self.block_timeout = block_timeout
 
-            # Check if the loop should terminate
-            # termination_value = self.termination_buses[0].get_message(self.name)
-            if self.checkTerminationbuses():
-                break
+        # The ring holds the samples, with the write count giving the total number of samples ever stored (so the
+        # newest sample is at index (write_count - 1) % capacity). Each registered reader has a read count giving
+        # how many samples it has consumed, keyed by its reader token (or its name), and the name of each reader
+        # for log messages. The ring condition guards all of these, and lets a blocked writer wait for readers to
+        # make space
+        self.ring = [None] * capacity
+        self.stamp_ring = [None] * capacity
+        self.write_count = 0
+        self.read_counts = {}
+        self.reader_names = {}
+        self.ring_condition = threading.Condition()
 
-            # Collect all of the values from the input buses into a list
-            input_values = self.collectbusesToValues(self.input_buses)
+        # Number of samples lost to overflow, either overwritten before a reader drained them or not stored
+        self.dropped = 0
 
-            # Get the output value or tuple of values corresponding to the inputs
-            output_values = self.consumer_producer_function(*input_values)
+    def register_reader(self, _name='Unspecified function', reader=None):
 
-            # Deal the values into the output buses
-            self.dealValuesTobuses(output_values, self.output_buses)
+        # Start tracking a reader, so that the overflow policy protects the samples it has not yet drained. Readers
+        # are also registered automatically the first time they drain the bus
+        key = _name if reader is None else reader
+        with self.ring_condition:
+            self.read_counts.setdefault(key, self.write_count)
+            self.reader_names[key] = _name
 
-            # Pause for set amount of time
-            time.sleep(self.delay)
+    def unregister_reader(self, _name='Unspecified function', reader=None):
 
-    # Take in a bus or a tuple of buses, and store their
-    # messages into a list
-    @log_on_start(DEBUG, "{self.name:s}: Starting collecting bus values into list")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while collecting bus values")
-    @log_on_end(DEBUG, "{self.name:s}: Finished collecting bus values")
-    def collectbusesToValues(self, buses):
+        # Stop tracking a reader (for example, when its node shuts down), and let a blocked writer know that the
+        # reader is no longer holding it up
+        key = _name if reader is None else reader
+        with self.ring_condition:
+            self.read_counts.pop(key, None)
+            self.reader_names.pop(key, None)
+            self.ring_condition.notify_all()
 
-        # Wrap buses in a tuple if it isn't one already
-        buses = ensureTuple(buses)
+    @log_on_start(DEBUG, "{self.name:s}: Initiating write by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on write by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished write by {_name:s}")
+    def set_message(self, message, _name='Unspecified function', _origin=None):
 
-        # Create a list for storing the values in the buses
-        values = []
+        with self.ring_condition:
 
-        # Loop over the buses, recording their values
-        for p in buses:
-            values.append(p.get_message(self.name))
+            # Stamp the write (the stamp sequence is the version the write creates)
+            if self.stamped:
+                stamp = makeStamp(self.version + 1, _name, _origin)
+            else:
+                stamp = None
 
-        return values
+            # Check whether the ring is full of samples that the slowest reader has not drained
+            stored = True
+            if self.read_counts and self.overflow != 'drop_oldest':
+                if self.overflow == 'block':
+                    if not self.ring_condition.wait_for(self.ringHasSpace, self.block_timeout):
+                        self.dropStalledReaders()
+                elif self.write_count - min(self.read_counts.values()) >= self.capacity:
+                    stored = False
 
-    # Take in  a tuple of values and a tuple of buses, and deal the values
-    # into the buses
-    @log_on_start(DEBUG, "{self.name:s}: Starting dealing values into buses")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while dealing values into buses")
-    @log_on_end(DEBUG, "{self.name:s}: Finished dealing values into buses")
-    def dealValuesTobuses(self, values, buses):
+            if stored:
+                # Overwriting a sample that a reader has not drained loses it
+                if self.write_count >= self.capacity and any(
+                        read_count <= self.write_count - self.capacity for read_count in self.read_counts.values()):
+                    self.dropped += 1
+                self.ring[self.write_count % self.capacity] = message
+                self.stamp_ring[self.write_count % self.capacity] = stamp
+                self.write_count += 1
+            else:
+                self.dropped += 1
 
-        # Wrap buses in a tuple if it isn't one already
-        buses = ensureTuple(buses)
+            # The latest message is updated even when the sample is not stored in the ring
+            with self.lock.gen_wlock():
+                self.message = message
+                self.version += 1
+                self.stamp = stamp
+            for write_listener in self.write_listeners:
+                write_listener(message)
 
-        # Handle different combinations of bus and value counts
+        # Wake up anything waiting for the message to change
+        with self.changed:
+            self.changed.notify_all()
+        for listener in self.listeners:
+            listener()
 
-        # If there is only one bus, then the values should be treated as a
-        # single entity, and wrapped into a tuple for the dealing process
-        if len(buses) == 1:
-            values = (values, )
-        # If there are multiple buses
-        else:
-            # If the values are already presented as a tuple, leave them
-            if isinstance(values, tuple):
-                pass
-            # If the values are not already presented as a tuple,
-            # Make a tuple with one entry per bus, all of which are the
-            # equal to the input values
-            else:
-                values = tuple([values]*len(buses))
+    def ringHasSpace(self):
 
-        for idx, v in enumerate(values):
-            buses[idx].set_message(v, self.name)
+        # Check whether the slowest registered reader has left room in the ring for another sample
+        return not self.read_counts or self.write_count - min(self.read_counts.values()) < self.capacity
 
-    @log_on_start(DEBUG, "{self.name:s}: Starting to check termination buses")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while checking termination buses")
-    @log_on_end(DEBUG, "{self.name:s}: Finished checking termination buses")
-    def checkTerminationbuses(self):
+    def dropStalledReaders(self):
 
-        # Look at all of the termination buses
-        termination_bus_values = self.collectbusesToValues(self.termination_buses)
+        # Unregister the readers that are a full ring behind, so that the writer can carry on
+        for key, read_count in list(self.read_counts.items()):
+            if self.write_count - read_count >= self.capacity:
+                logging.warning("{0:s}: {1:s} has not drained the bus for {2:g} s, so it is no longer "
+                                "blocking the writer".format(self.name, self.reader_names[key], self.block_timeout))
+                del self.read_counts[key]
+                del self.reader_names[key]
 
-        # If any of the termination buses have triggered (gone true or non-negative), signal the loop to end
-        for tbv in termination_bus_values:
-            if tbv and tbv >= 0:
-                return True
+    @log_on_start(DEBUG, "{self.name:s}: Initiating drain by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on drain by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished drain by {_name:s}")
+    def drain(self, _name='Unspecified function', reader=None):
 
+        samples, _stamps = self.drain_stamped(_name, reader)
 
-class Producer(ConsumerProducer):
-    """
-    Special case of the consumer-producer class, that sends values to buses
-    but does not read them
-    """
+        return samples
 
-    @log_on_start(DEBUG, "{name:s}: Starting to create producer")
-    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating producer")
-    @log_on_end(DEBUG, "{name:s}: Finished creating producer")
-    def __init__(self,
-                 producer_function,
-                 output_buses,
-                 delay=0,
-                 termination_buses=Bus(False, "Default producer termination bus"),
-                 name="Unnamed producer"):
+    @log_on_start(DEBUG, "{self.name:s}: Initiating stamped drain by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on stamped drain by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished stamped drain by {_name:s}")
+    def drain_stamped(self, _name='Unspecified function', reader=None):
 
-        # Producers don't use an input bus
-        input_buses = Bus(0, "Default producer input bus")
+        key = _name if reader is None else reader
+        with self.ring_condition:
 
-        # Match naming convention for this class with its parent class
-        # def syntax is necessary because a producer function will not accept
-        # input values
-        def consumer_producer_function(_input_value): return producer_function()
+            # Start from the reader's last position, or from the oldest sample still in the ring if the reader
+            # is new or has fallen so far behind that its next sample has been overwritten
+            oldest = max(self.write_count - self.capacity, 0)
+            start = max(self.read_counts.get(key, oldest), oldest)
 
-        # Call the parent class init function
-        super().__init__(
-            consumer_producer_function,
-            input_buses,
-            output_buses,
-            delay,
-            termination_buses,
-            name)
+            # Copy out the unread samples (and their stamps, which are None if stamping is off) in the order
+            # they were written
+            samples = [self.ring[idx % self.capacity] for idx in range(start, self.write_count)]
+            stamps = [self.stamp_ring[idx % self.capacity] for idx in range(start, self.write_count)]
 
+            # Mark them as read, and let a blocked writer know there is space
+            self.read_counts[key] = self.write_count
+            self.reader_names[key] = _name
+            self.ring_condition.notify_all()
 
-class Consumer(ConsumerProducer):
+        return samples, stamps
+
+
+class ProcessBus(Bus):
     """
-    Special case of the consumer-producer class, that reads values from buses
-    but does not send to them
+    Bus whose message is stored in shared memory, so that consumer-producers running in separate
+    processes (see runConcurrently) can exchange data. Messages are pickled into a fixed-size block,
+    which must be large enough to hold the largest message (and its stamp) written to the bus
     """
 
-    @log_on_start(DEBUG, "{name:s}: Starting to create consumer")
-    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating consumer")
-    @log_on_end(DEBUG, "{name:s}: Finished creating consumer")
+    # The shared block starts with a header holding the bus version and the length of the pickled message
+    header = struct.Struct('qq')
+
+    process_shared = True
+
     def __init__(self,
-                 consumer_function,
-                 input_buses,
-                 delay=0,
-                 termination_buses=Bus(False, "Default consumer termination bus"),
-                 name="Unnamed consumer"):
+                 initial_message=0,
+                 name="Unnamed Bus",
+                 size=65536,  # maximum size of a pickled message, in bytes
+                 stamped=False):  # stamp every write with its time, sequence number and writer
 
-        # Match naming convention for this class with its parent class
-        consumer_producer_function = consumer_function
+        self.name = name
+        self.size = size
+        self.stamped = stamped
 
-        # Consumers don't use an output bus
-        output_buses = Bus(0, "Default consumer output bus")
+        # Allocate the shared block, and release it when this bus is garbage collected in the creating process
+        self.shm = shared_memory.SharedMemory(create=True, size=self.header.size + size)
+        self.creator_pid = os.getpid()
+        weakref.finalize(self, ProcessBus.releaseSharedMemory, self.shm, self.creator_pid)
 
-        # Call the parent class init function
-        super().__init__(
-            consumer_producer_function,
-            input_buses,
-            output_buses,
-            delay,
-            termination_buses,
-            name)
+        # A process-shared lock guards the block, and doubles as the lock for a process-shared condition that
+        # readers can wait on until the message changes. Listeners only hear about writes from this process
+        self.lock = process_context.Lock()
+        self.changed = process_context.Condition(self.lock)
+        self.listeners = []
+        self.write_listeners = []
 
+        # Store the initial message as version zero
+        self.writeMessage(initial_message, 0)
 
-class Timer(Producer):
-    """
-    Timer is a producer that keeps track of time since it was instantiated
-    Time is instantiated with a duration value, and writes a "countdown" value (time before or after the
-    specified duration) to its output bus. The output bus can be used as the termination bus for other
-    consumer-producers (and for the timer itself); these consumer producers will terminate when the timer reaches zero
-    """
+        # Skip the logging decorators on reads and writes if they would not log anything
+        installFastMethods(self, self.fast_method_names)
 
-    @log_on_start(DEBUG, "{name:s}: Starting to create timer")
-    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating timer")
-    @log_on_end(DEBUG, "{name:s}: Finished creating timer")
-    def __init__(self,
-                 output_buses,  # buses that receive the countdown value
-                 duration=5,  # how many seconds the timer should run for (0 is forever)
-                 delay=0,  # how many seconds to sleep for between checking time
-                 termination_buses=Bus(False, "Default timer termination bus"),
-                 name="Unnamed termination timer"):
+    @staticmethod
+    def releaseSharedMemory(shm, creator_pid):
 
-        super().__init__(
-            self.timer,  # Timer class defines its own producer function
-            output_buses,
-            delay,
-            termination_buses,
-            name)
+        # Only the process that created the block removes it; other processes just unmap it
+        shm.close()
+        if os.getpid() == creator_pid:
+            shm.unlink()
 
-        self.duration = duration
-        self.t_start = time.time()
+    def __getstate__(self):
 
-    @log_on_start(DEBUG, "{self.name:s}: Checking current time against starting time")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while checking current time against starting time")
-    @log_on_end(DEBUG, "{self.name:s}: Finished checking current time against starting time")
-    def timer(self):
+        # Send the name of the shared block rather than the block itself (used when processes are spawned
+        # instead of forked)
+        return {'name': self.name,
+                'size': self.size,
+                'stamped': self.stamped,
+                'shm_name': self.shm.name,
+                'creator_pid': self.creator_pid,
+                'lock': self.lock,
+                'changed': self.changed}
 
-        # Trigger the timer if the duration is non-zero and the time elapsed
-        # since instantiation is longer than the duration
-        if self.duration:
-            time_relative_to_end_time = time.time() - self.t_start - self.duration
-            return time_relative_to_end_time
-        else:
-            return False
+    def __setstate__(self, state):
 
+        self.name = state['name']
+        self.size = state['size']
+        self.stamped = state['stamped']
+        self.shm = shared_memory.SharedMemory(name=state['shm_name'])
+        self.creator_pid = state['creator_pid']
+        self.lock = state['lock']
+        self.changed = state['changed']
+        self.listeners = []
+        self.write_listeners = []
 
-class Printer(Consumer):
-    """
-    Printer is a consumer that reads a value stored in a bus and prints it out at specified intervals
-    """
+        installFastMethods(self, self.fast_method_names)
 
-    @log_on_start(DEBUG, "{name:s}: Starting to create printer")
-    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating printer")
-    @log_on_end(DEBUG, "{name:s}: Finished creating printer")
-    def __init__(self,
-                 printer_bus,  # bus or tuple of buses that should be printed to the terminal
-                 delay=0,  # how many seconds to sleep for between printing data
-                 termination_buses=Bus(False, "Default printer termination bus"),  # buses to check for termination
-                 name="Unnamed termination timer",  # name of this printer
-                 print_prefix="Unspecified printer: "):  # prefix for output
+    @property
+    def version(self):
+        return self.header.unpack_from(self.shm.buf, 0)[0]
 
-        super().__init__(
-            self.print_bus,  # Printer class defines its own printing function
-            printer_bus,
-            delay,
-            termination_buses,
-            name)
+    @property
+    def message(self):
+        return self.get_message()
 
-        self.print_prefix = print_prefix
+    @property
+    def stamp(self):
+        return self.get_stamped_message()[1]
 
-    def print_bus(self, *messages):
-        output_string = self.print_prefix                  # Start the output string with the print prefix
-        for msg in messages:                               # Append bus messages to the output
+    def writeMessage(self, message, version, stamp=None):
 
-            if isinstance(msg, str):                       # If the message is a string, leave it as it is
-                msg_str = msg
-            else:                                          # If it's not a string, assume it's a number and convert it
-                msg_str = str("{0:.4g}".format(msg))       # Convert to string with 4 significant figures
-                if msg >= 0:                               # Append a space before the value if it is not negative
-                    msg_str = " " + msg_str
+        # Pickle the message and its stamp and copy them into the shared block behind the header
+        data = pickle.dumps((message, stamp), pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.size:
+            raise ValueError("{0:s}: message needs {1:d} bytes, but the bus only holds {2:d}".format(
+                self.name, len(data), self.size))
 
-            output_string = output_string + " " + msg_str  # Append the message string to the output string
+        self.shm.buf[self.header.size:self.header.size + len(data)] = data
+        self.header.pack_into(self.shm.buf, 0, version, len(data))
 
-            for i in range(1, 12 - len(msg_str)):          # Add spacing to put the outputs into columns
-                output_string = output_string + " "
+    @log_on_start(DEBUG, "{self.name:s}: Initiating read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished read by {_name:s}")
+    def get_message(self, _name='Unspecified function'):
 
-        print(output_string)                               # Print the formatted output
+        return self.get_stamped_message(_name)[0]
 
+    @log_on_start(DEBUG, "{self.name:s}: Initiating stamped read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on stamped read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished stamped read by {_name:s}")
+    def get_stamped_message(self, _name='Unspecified function'):
 
-@log_on_start(DEBUG, "runConcurrently: Starting concurrent execution")
-@log_on_error(DEBUG, "runConcurrently: Encountered an error during concurrent execution")
-@log_on_end(DEBUG, "runConcurrently: Finished concurrent execution")
-def runConcurrently(producer_consumer_list):
+        # Copy the pickled message out while holding the lock, and unpickle it after releasing the lock
+        with self.lock:
+            length = self.header.unpack_from(self.shm.buf, 0)[1]
+            data = bytes(self.shm.buf[self.header.size:self.header.size + length])
+
+        return pickle.loads(data)
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating write by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on write by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished write by {_name:s}")
+    def set_message(self, message, _name='Unspecified function', _origin=None):
+
+        # Write the message, and wake up anything (in any process) waiting for it to change
+        with self.changed:
+            version = self.version + 1
+            if self.stamped:
+                self.writeMessage(message, version, makeStamp(version, _name, _origin))
+            else:
+                self.writeMessage(message, version)
+            for write_listener in self.write_listeners:
+                write_listener(message)
+            self.changed.notify_all()
+
+        # Wake up listeners in this process
+        for listener in self.listeners:
+            listener()
+
+
+class ArrayBus(Bus):
     """
-    runConcurrently is aFunction that uses a concurrent.futures ThreadPoolExecutor to concurrently
-    execute a set of ConsumerProducer functions
+    Bus for large fixed-size arrays (such as camera frames or lidar scans), which avoids both copying on read
+    and torn reads. The bus holds a ring of buffers: the writer fills the oldest one and then publishes it
+    by swapping a single index, and readers get read-only views of the most recently published buffer.
+    A view stays valid until the writer has published (n_buffers - 1) further frames, so readers that hold
+    on to a frame for longer than that should copy it. Each ArrayBus should only have one writer, and
+    its writes are not stamped
     """
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(producer_consumer_list)) as executor:
+    # Logged methods that are swapped for undecorated versions when DEBUG logging is off
+    fast_method_names = ('get_message', 'set_message', 'get_stamped_message', 'publish')
 
-        # Create a list to hold the executors created from the provided functions
-        executor_list = []
+    # Writes to an array bus are never stamped
+    stamp = None
 
-        # Loop over the list of provided functions, turning each into an executor for the thread pool
-        for cp in producer_consumer_list:
-            executor_list.append(executor.submit(cp))
+    @log_on_start(DEBUG, "{name:s}: Starting to create array bus")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating array bus")
+    @log_on_end(DEBUG, "{name:s}: Finished creating array bus")
+    def __init__(self,
+                 shape,  # shape of each array
+                 dtype=float,  # NumPy dtype of each array
+                 initial_message=0,  # value (or array) to fill the first buffer with
+                 name="Unnamed Bus",
+                 n_buffers=3,  # buffers in the ring (2 for double buffering, 3 for triple buffering)
+                 shared=False,  # keep the buffers in shared memory, so they can be used by process nodes
+                 filename=None):  # keep the buffers in a memory-mapped file instead
 
-    # Loop over the executors that were created above, running their result methods
-    for e in executor_list:
-        e.result()
+        if np is None:
+            raise ImportError("{0:s}: ArrayBus requires NumPy".format(name))
+        if n_buffers < 2:
+            raise ValueError("{0:s}: ArrayBus needs at least two buffers, not {1:d}".format(name, n_buffers))
+
+        self.name = name
+        self.n_buffers = n_buffers
+        self.process_shared = shared
+
+        # The state array holds the index of the published buffer and the bus version. It sits in front of the
+        # buffers when they are in shared memory, so that every process sees the same state
+        buffer_shape = (n_buffers,) + tuple(np.atleast_1d(shape))
+        state_size = 2 * np.dtype(np.int64).itemsize
+        buffers_size = int(np.prod(buffer_shape)) * np.dtype(dtype).itemsize
+        if shared:
+            self.shm = shared_memory.SharedMemory(create=True, size=state_size + buffers_size)
+            weakref.finalize(self, ProcessBus.releaseSharedMemory, self.shm, os.getpid())
+            self.state = np.ndarray((2,), np.int64, buffer=self.shm.buf)
+            self.buffers = np.ndarray(buffer_shape, dtype, buffer=self.shm.buf, offset=state_size)
+            self.changed = process_context.Condition()
+        else:
+            self.state = np.zeros(2, np.int64)
+            if filename is None:
+                self.buffers = np.empty(buffer_shape, dtype)
+            else:
+                self.buffers = np.memmap(filename, dtype, mode='w+', shape=buffer_shape)
+            self.changed = threading.Condition()
+        self.listeners = []
+        self.write_listeners = []
+
+        # Make a read-only view of each buffer once, so that reads do not have to create views
+        self.read_views = []
+        for buffer in self.buffers:
+            view = buffer.view()
+            view.flags.writeable = False
+            self.read_views.append(view)
+
+        # Fill the first buffer with the initial message, and publish it as version zero
+        self.buffers[0] = initial_message
+        self.state[:] = (0, 0)
+
+        # Skip the logging decorators on reads and writes if they would not log anything
+        installFastMethods(self, self.fast_method_names)
+
+    @property
+    def version(self):
+        return int(self.state[1])
+
+    @property
+    def message(self):
+        return self.read_views[self.state[0]]
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished read by {_name:s}")
+    def get_message(self, _name='Unspecified function'):
+
+        # Hand out a read-only view of the published buffer, without copying it
+        return self.read_views[self.state[0]]
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating stamped read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on stamped read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished stamped read by {_name:s}")
+    def get_stamped_message(self, _name='Unspecified function'):
+
+        # Writes are not stamped, so the view of the published buffer always comes with a stamp of None
+        return self.read_views[self.state[0]], None
+
+    def get_back_buffer(self):
+
+        # Return a writable view of the buffer that the next publish will make current. This is the buffer that
+        # was published longest ago, so it is the one least likely to still be in use by a reader
+        return self.buffers[(self.state[0] + 1) % self.n_buffers]
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating publish by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on publish by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished publish by {_name:s}")
+    def publish(self, _name='Unspecified function'):
+
+        # Make the back buffer current. Swapping the index is the only step readers can observe, so they
+        # see either the complete old frame or the complete new one
+        self.state[0] = (self.state[0] + 1) % self.n_buffers
+        self.state[1] += 1
+        for write_listener in self.write_listeners:
+            write_listener(self.read_views[self.state[0]])
+
+        # Wake up anything waiting for the message to change
+        with self.changed:
+            self.changed.notify_all()
+        for listener in self.listeners:
+            listener()
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating write by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on write by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished write by {_name:s}")
+    def set_message(self, message, _name='Unspecified function', _origin=None):
+
+        # Copy the message into the back buffer and publish it. Writers that can produce their data in
+        # place should instead fill get_back_buffer() and call publish(), which avoids this copy (the
+        # origin is accepted for compatibility with the other buses, and dropped along with the stamp)
+        self.get_back_buffer()[...] = message
+        self.publish(_name)
+
+
+# Consistent view of the buses in a BusGroup: their messages, the stamps of the writes that stored them, and their
+# versions, along with a group version (the sum of the bus versions) that changes whenever any of them is written
+BusSnapshot = collections.namedtuple('BusSnapshot', ('messages', 'stamps', 'versions', 'version'))
+
+
+class BusGroup:
+    """
+    Class that ties several buses together, so that they can be read as one consistent snapshot and written
+    as one atomic update. The buses in the group share a single reader-writer lock, so a snapshot of the
+    whole group costs one lock acquisition, and readers never see some buses before an update and others after
+    it. Consumer-producers read the grouped buses among their inputs from one snapshot, and write the grouped
+    buses among their outputs in one update, so nodes pick the group up without any changes. Only regular
+    Buses can be grouped, and each bus can only belong to one group
+    """
+
+    # Logged methods that are swapped for undecorated versions when DEBUG logging is off
+    fast_method_names = ('get_snapshot', 'get_messages', 'set_messages')
+
+    # Class of the buses that can be grouped
+    bus_class = Bus
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create bus group")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating bus group")
+    @log_on_end(DEBUG, "{name:s}: Finished creating bus group")
+    def __init__(self,
+                 buses,  # list or tuple of buses to group
+                 name="Unnamed bus group"):
+
+        self.buses = tuple(buses)
+        self.name = name
+
+        if not self.buses:
+            raise ValueError("{0:s}: a bus group needs at least one bus".format(name))
+        for bus in self.buses:
+            if type(bus) is not self.bus_class:
+                raise ValueError("{0:s}: {1:s} is a {2:s}, and only regular buses can be grouped".format(
+                    name, bus.name, type(bus).__name__))
+            if bus.group is not None:
+                raise ValueError("{0:s}: {1:s} already belongs to {2:s}".format(name, bus.name, bus.group.name))
+
+        # Replace the buses' own locks with the group lock, so that single-bus reads and writes also keep out of
+        # the way of group reads and writes
+        self.lock = rwlock.RWLockFairD()
+        self.positions = {}
+        for idx, bus in enumerate(self.buses):
+            bus.lock = self.lock
+            bus.group = self
+            self.positions[bus] = idx
+
+        # Skip the logging decorators on reads and writes if they would not log anything
+        installFastMethods(self, self.fast_method_names)
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating snapshot by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on snapshot by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished snapshot by {_name:s}")
+    def get_snapshot(self, _name='Unspecified function'):
+
+        # Copy the state of every bus while holding the lock once, and sort it out afterwards
+        with self.lock.gen_rlock():
+            state = [(bus.message, bus.stamp, bus.version) for bus in self.buses]
+        messages, stamps, versions = zip(*state)
+
+        return BusSnapshot(messages, stamps, versions, sum(versions))
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished read by {_name:s}")
+    def get_messages(self, _name='Unspecified function'):
+
+        with self.lock.gen_rlock():
+            messages = tuple([bus.message for bus in self.buses])
+
+        return messages
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating write by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on write by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished write by {_name:s}")
+    def set_messages(self, messages, _name='Unspecified function', _origin=None):
+
+        # Messages are given either for every bus, in order, or as a dictionary for some of the buses
+        writes = self.matchMessages(messages)
+
+        with self.lock.gen_wlock():
+            for bus, message in writes:
+                bus.message = message
+                bus.version += 1
+                if bus.stamped:
+                    bus.stamp = makeStamp(bus.version, _name, _origin)
+                for write_listener in bus.write_listeners:
+                    write_listener(message)
+
+        # Wake up anything waiting for the messages to change
+        for bus, _message in writes:
+            with bus.changed:
+                bus.changed.notify_all()
+            for listener in bus.listeners:
+                listener()
+
+    def matchMessages(self, messages):
+
+        # Pair up the buses to write with their messages
+        if isinstance(messages, dict):
+            for bus in messages:
+                if bus not in self.positions:
+                    raise ValueError("{0:s}: {1:s} is not in the group".format(self.name, bus.name))
+            return list(messages.items())
+
+        messages = tuple(messages)
+        if len(messages) != len(self.buses):
+            raise ValueError("{0:s}: expected {1:d} messages, not {2:d}".format(
+                self.name, len(self.buses), len(messages)))
+
+        return list(zip(self.buses, messages))
+
+
+def placeholderBus(initial_message, name):
+    """
+    Function that makes a bus to stand in for a bus argument that was not given. Nothing writes to a placeholder
+    bus, so nodes do not listen to it (a default termination bus is shared by every node that uses the default,
+    and would otherwise keep all of them alive through its listeners)
+    """
+
+    bus = Bus(initial_message, name)
+    bus.placeholder = True
+
+    return bus
+
+
+def isTerminationValue(value):
+    """
+    Function that checks whether a termination bus value signals shutdown (True or non-negative)
+    """
+
+    return bool(value and value >= 0)
+
+
+def ensureTuple(value):
+    """
+    Function that wraps an input value in a tuple if it is not already a tuple
+    """
+    
+    if isinstance(value, tuple):
+        value_tuple = value
+    else:
+        value_tuple = (value,)  # comma creates the tuple
+
+    return value_tuple
+
+
+def spreadValues(values, bus_count):
+    """
+    Function that spreads the output of a consumer-producer function over its output buses, returning one
+    value per bus
+    """
+
+    # If there is only one bus, then the values should be treated as a
+    # single entity, and wrapped into a tuple for the dealing process
+    if bus_count == 1:
+        return (values, )
+    # If there are multiple buses
+    else:
+        # If the values are already presented as a tuple, leave them
+        if isinstance(values, tuple):
+            return values
+        # If the values are not already presented as a tuple,
+        # Make a tuple with one entry per bus, all of which are the
+        # equal to the input values
+        else:
+            return tuple([values]*bus_count)
+
+
+def copyMessage(message):
+    """
+    Function that copies a message if it is a NumPy array (which may be a view of a buffer that its bus reuses),
+    so that it can be compared with later messages
+    """
+
+    if np is not None and isinstance(message, np.ndarray):
+        return message.copy()
+
+    return message
+
+
+def sameMessage(old, new):
+    """
+    Function that checks whether two messages are equal, treating messages that cannot be compared as different
+    """
+
+    if old is new:
+        return True
+    if np is not None and (isinstance(old, np.ndarray) or isinstance(new, np.ndarray)):
+        return bool(np.array_equal(old, new))
+    try:
+        return bool(old == new)
+    except (TypeError, ValueError):
+        return False
+
+
+class NodeMetrics:
+    """
+    Class holding the always-on runtime counters for a consumer-producer: how many cycles it has run, how long
+    its function takes (as a running total, a maximum and a histogram), how regular its period is, and how many
+    times it has read from and written to each bus. Updating the counters costs a few additions per cycle
+    """
+
+    # Upper edges (in seconds) of the function-time histogram bins; the last bin counts everything slower
+    histogram_edges = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+
+    def __init__(self):
+
+        # Function execution time
+        self.iterations = 0
+        self.function_time_total = 0.0
+        self.function_time_max = 0.0
+        self.function_time_histogram = [0] * (len(self.histogram_edges) + 1)
+
+        # Time between the starts of successive cycles, tracked as a running mean and sum of squared deviations
+        # (Welford's method) so that the jitter (standard deviation of the period) can be reported at any time
+        self.last_cycle_start = None
+        self.period_count = 0
+        self.period_mean = 0.0
+        self.period_m2 = 0.0
+        self.period_min = float('inf')
+        self.period_max = 0.0
+
+        # Bus traffic, keyed by bus name
+        self.bus_reads = {}
+        self.bus_writes = {}
+
+    def recordCycle(self, cycle_start, function_time):
+
+        # Count the cycle and add its function time to the histogram
+        self.iterations += 1
+        self.function_time_total += function_time
+        if function_time > self.function_time_max:
+            self.function_time_max = function_time
+        self.function_time_histogram[bisect.bisect_left(self.histogram_edges, function_time)] += 1
+
+        # Update the period statistics
+        if self.last_cycle_start is not None:
+            period = cycle_start - self.last_cycle_start
+            self.period_count += 1
+            delta = period - self.period_mean
+            self.period_mean += delta / self.period_count
+            self.period_m2 += delta * (period - self.period_mean)
+            if period < self.period_min:
+                self.period_min = period
+            if period > self.period_max:
+                self.period_max = period
+        self.last_cycle_start = cycle_start
+
+    def recordRead(self, bus):
+        self.bus_reads[bus.name] = self.bus_reads.get(bus.name, 0) + 1
+
+    def recordWrite(self, bus):
+        self.bus_writes[bus.name] = self.bus_writes.get(bus.name, 0) + 1
+
+    def snapshot(self):
+        """
+        Return the current counters as a dictionary of plain values
+        """
+
+        if self.period_count:
+            jitter = (self.period_m2 / self.period_count) ** 0.5
+            period_min = self.period_min
+        else:
+            jitter = 0.0
+            period_min = 0.0
+
+        if self.iterations:
+            function_time_mean = self.function_time_total / self.iterations
+        else:
+            function_time_mean = 0.0
+
+        return {'iterations': self.iterations,
+                'function_time_mean': function_time_mean,
+                'function_time_max': self.function_time_max,
+                'function_time_histogram': dict(zip(
+                    ["<{0:g}".format(edge) for edge in self.histogram_edges] + [">={0:g}".format(
+                        self.histogram_edges[-1])],
+                    self.function_time_histogram)),
+                'period_mean': self.period_mean,
+                'period_min': period_min,
+                'period_max': self.period_max,
+                'jitter': jitter,
+                'bus_reads': dict(self.bus_reads),
+                'bus_writes': dict(self.bus_writes)}
+
+
+def formatMetrics(metrics):
+    """
+    Function that formats a metrics snapshot (as published by runConcurrently) into a table with one
+    line per node, with times in milliseconds
+    """
+
+    lines = ["{0:<30s}{1:>10s}{2:>10s}{3:>10s}{4:>10s}{5:>10s}{6:>10s}{7:>10s}".format(
+        "node", "cycles", "fn mean", "fn max", "period", "jitter", "overruns", "skipped")]
+    for name, node_metrics in metrics.items():
+        lines.append("{0:<30s}{1:>10d}{2:>10.3f}{3:>10.3f}{4:>10.3f}{5:>10.3f}{6:>10d}{7:>10d}".format(
+            name[:29],
+            node_metrics['iterations'],
+            node_metrics['function_time_mean'] * 1000,
+            node_metrics['function_time_max'] * 1000,
+            node_metrics['period_mean'] * 1000,
+            node_metrics['jitter'] * 1000,
+            node_metrics['overruns'],
+            node_metrics['skipped_calls']))
+
+    return "\n".join(lines)
+
+
+class WakeableEvent:
+    """
+    Event (with the same methods as threading.Event) whose waiters can also be woken early without setting it,
+    so that a node pausing until its next cycle can be told that its schedule has changed
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.flag = False
+
+    def is_set(self):
+        return self.flag
+
+    def set(self):
+        with self.condition:
+            self.flag = True
+            self.condition.notify_all()
+
+    def clear(self):
+        with self.condition:
+            self.flag = False
+
+    def wait(self, timeout=None):
+
+        # Return whether the event is set, once it is set, the timeout runs out, or the waiters are woken
+        with self.condition:
+            if not self.flag:
+                self.condition.wait(timeout)
+            return self.flag
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+
+class ConsumerProducer:
+    """
+    Class that turns a provided function into a service that reads from
+    the input buses, stores the resulting data into the output buses,
+    and watches a set of termination buses for a "True" or non-negative signal, at which
+    point the service shuts down
+    """
+
+    # Logged methods that are called on every loop iteration, and that are swapped for undecorated versions
+    # when DEBUG logging is off
+    fast_method_names = ('collectbusesToValues',
+                         'callFunction',
+                         'dealValuesTobuses',
+                         'checkTerminationbuses',
+                         'startSchedule',
+                         'stopSchedule',
+                         'timeUntilNextCycle',
+                         'waitForInputs')
+
+    # Returned in place of the function's output when a skip-if-unchanged node skips its call
+    unchanged = object()
+
+    # Seconds between checks of buses shared between processes while waiting in trigger mode (writes made in other
+    # processes do not wake the node)
+    trigger_poll_interval = 0.01
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create consumer-producer")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating consumer-producer")
+    @log_on_end(DEBUG, "{name:s}: Finished creating consumer-producer")
+    def __init__(self,
+                 consumer_producer_function,
+                 input_buses,
+                 output_buses,
+                 delay=0,
+                 termination_buses=placeholderBus(False, "Default consumer_producer termination bus"),
+                 name="Unnamed consumer_producer",
+                 fixed_rate=False,  # hold a fixed period instead of sleeping for delay after each cycle
+                 trigger=None,  # "any" or "all" to run when any or all of the input buses are written
+                 execution=None,  # "thread", "process" or "executive" to override the execution backend
+                 priority=None,  # scheduling priority (lower runs first); None ranks the node by its delay
+                 cpu_affinity=None,  # CPUs the node's thread or process may run on (None leaves them unchanged)
+                 nice=None,  # nice value for the node's thread or process (None leaves it unchanged)
+                 realtime_priority=None,  # SCHED_FIFO priority (1-99) to run the node at, where permitted
+                 skip_unchanged=None):  # "version" or "value" to skip cycles whose inputs have not changed
+
+        self.consumer_producer_function = consumer_producer_function
+        self.input_buses = ensureTuple(input_buses)
+        self.output_buses = ensureTuple(output_buses)
+        self.delay = delay
+        self.termination_buses = ensureTuple(termination_buses)
+        self.name = name
+
+        # Fixed-rate scheduling state: the monotonic time at which the next cycle is due, the number of
+        # cycles that finished after their deadline, and the number of whole periods that were dropped
+        # to get back on schedule
+        self.fixed_rate = fixed_rate
+        self.next_deadline = None
+        self.overruns = 0
+        self.skipped_cycles = 0
+
+        # Always-on runtime counters
+        self.metrics = NodeMetrics()
+
+        # Stamp of the input with the oldest source, which is passed on to the stamped output buses so that
+        # latency can be traced from the sources through the graph
+        self.input_origin = None
+
+        # Termination is signalled through an event, which the termination buses set as soon as they are written
+        # with a termination value. This makes checking for termination a single flag test, and lets the pause
+        # between cycles end immediately on shutdown. Termination callbacks are extra functions to call on
+        # shutdown, and the termination waiter is the asyncio backend's equivalent of the event. Writes made in
+        # other processes do not reach the listeners, so buses shared between processes are also read directly.
+        # Waking the event without setting it cuts the pause short (see wakeUp), as do the wake callbacks
+        self.termination_event = WakeableEvent()
+        self.termination_callbacks = []
+        self.wake_callbacks = []
+        self.termination_waiter = None
+        self.polled_termination_buses = tuple(bus for bus in self.termination_buses if bus.process_shared)
+        for bus in self.termination_buses:
+            if not bus.placeholder:
+                bus.add_listener(functools.partial(self.checkTerminationWrite, bus))
+
+        # Trigger mode: instead of polling on a fixed delay, wait for "any" or "all" of the input buses to be
+        # written, with the delay acting as a minimum period between cycles. The trigger signal is created when
+        # the node first waits, and the input versions record what the node has already seen
+        if trigger not in (None, 'any', 'all'):
+            raise ValueError("{0:s}: trigger must be None, 'any' or 'all', not {1!r}".format(name, trigger))
+        self.trigger = trigger
+        self.trigger_signal = None
+        self.input_versions = None
+
+        # Execution backend for this node; None uses the backend chosen for the whole graph in runConcurrently
+        # (under asyncio, "thread" and "process" instead choose an executor to run the function in)
+        if execution not in (None, 'thread', 'process', 'executive', 'pool'):
+            raise ValueError("{0:s}: execution must be None, 'thread', 'process', 'executive' or 'pool', not "
+                             "{1!r}".format(name, execution))
+        self.execution = execution
+
+        # Priority used by schedulers that share one thread between several nodes
+        self.priority = priority
+
+        # Operating-system scheduling settings, which runConcurrently applies to the thread or process that runs
+        # the node when it starts (see applySchedulingSettings)
+        if realtime_priority is not None and not 1 <= realtime_priority <= 99:
+            raise ValueError("{0:s}: realtime_priority must be between 1 and 99, not {1!r}".format(
+                name, realtime_priority))
+        self.cpu_affinity = None if cpu_affinity is None else frozenset(cpu_affinity)
+        self.nice = nice
+        self.realtime_priority = realtime_priority
+
+        # Skip-if-unchanged mode: compare the inputs of each cycle with those of the last call, by the versions of
+        # the input buses or by the values read from them, and skip the function call and the output write if
+        # nothing has changed. The versions are taken before the buses are read, so a write that lands in between
+        # can only cause an extra call, never a missed one
+        if skip_unchanged not in (None, 'version', 'value'):
+            raise ValueError("{0:s}: skip_unchanged must be None, 'version' or 'value', not {1!r}".format(
+                name, skip_unchanged))
+        self.skip_unchanged = skip_unchanged
+        self.cycle_versions = None
+        self.previous_inputs = None
+        self.skipped_calls = 0
+
+        # Supervision state (see Watchdog): the perf_counter time at which the node last called (or skipped) its
+        # function, the start of the call in progress, the crash count and last error, and the restart policy
+        # (how long to wait before restarting the node after a crash, or None to let the crash end the node)
+        self.heartbeat = None
+        self.busy_since = None
+        self.crashes = 0
+        self.last_error = None
+        self.restart_backoff = None
+        self.max_restart_backoff = None
+        self.last_backoff = None
+        self.restart_time = None
+
+        # Skip the logging decorators inside the loop if they would not log anything
+        installFastMethods(self, self.fast_method_names)
+
+    @log_on_start(DEBUG, "{self.name:s}: Starting consumer-producer service")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while executing consumer-producer")
+    @log_on_end(DEBUG, "{self.name:s}: Closing down consumer-producer service")
+    def __call__(self):
+
+        # Set the first deadline for fixed-rate operation
+        self.startSchedule()
+
+        try:
+            while True:
+
+                # Check if the loop should terminate
+                # termination_value = self.termination_buses[0].get_message(self.name)
+                if self.checkTerminationbuses():
+                    break
+
+                # Collect all of the values from the input buses into a list
+                input_values = self.collectbusesToValues(self.input_buses)
+
+                # Get the output value or tuple of values corresponding to the inputs
+                output_values = self.callFunction(input_values)
+
+                # Deal the values into the output buses
+                self.dealValuesTobuses(output_values, self.output_buses)
+
+                # Pause for set amount of time (or until the next deadline in fixed-rate mode), waking
+                # immediately if the node is told to shut down
+                self.termination_event.wait(self.timeUntilNextCycle())
+
+                # In trigger mode, wait for new data on the input buses
+                self.waitForInputs()
+
+        # Release whatever startSchedule set up, even if the loop stopped on an error
+        finally:
+            self.stopSchedule()
+
+    @log_on_start(DEBUG, "{self.name:s}: Starting schedule")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while starting schedule")
+    @log_on_end(DEBUG, "{self.name:s}: Finished starting schedule")
+    def startSchedule(self):
+
+        # The first cycle is due immediately
+        self.next_deadline = time.monotonic()
+
+        # The first cycle always calls the function
+        self.previous_inputs = None
+
+        # Re-arm the termination event (in case the node is being run again), and check whether any of the
+        # termination buses already hold a termination value
+        self.termination_event.clear()
+        if self.termination_waiter is not None:
+            self.termination_waiter.clear()
+        for bus in self.termination_buses:
+            self.checkTerminationWrite(bus)
+
+        # In trigger mode, the first cycle runs on the initial bus values
+        if self.trigger:
+            self.acknowledgeInputs()
+
+    # Subclasses that start background work in startSchedule stop it here. This is called when the loop ends,
+    # whether the node was told to shut down or its function raised an exception
+    @log_on_start(DEBUG, "{self.name:s}: Stopping schedule")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while stopping schedule")
+    @log_on_end(DEBUG, "{self.name:s}: Finished stopping schedule")
+    def stopSchedule(self):
+        pass
+
+    @log_on_start(DEBUG, "{self.name:s}: Starting to apply scheduling settings")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while applying scheduling settings")
+    @log_on_end(DEBUG, "{self.name:s}: Finished applying scheduling settings")
+    def applySchedulingSettings(self):
+
+        # Apply the CPU affinity, nice value and real-time priority to the calling thread (on Linux, each thread
+        # is scheduled on its own, so these settings do not affect the other nodes in the process). Settings that
+        # the platform does not support, or that need privileges the process does not have, are skipped with a
+        # warning, so that the node still runs
+        thread_id = threading.get_native_id()
+
+        if self.cpu_affinity is not None:
+            try:
+                os.sched_setaffinity(thread_id, self.cpu_affinity)
+            except (AttributeError, OSError) as error:
+                logging.warning("{0:s}: could not set CPU affinity ({1!s})".format(self.name, error))
+
+        if self.nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, thread_id, self.nice)
+            except (AttributeError, OSError) as error:
+                logging.warning("{0:s}: could not set nice value ({1!s})".format(self.name, error))
+
+        if self.realtime_priority is not None:
+            try:
+                os.sched_setscheduler(thread_id, os.SCHED_FIFO, os.sched_param(self.realtime_priority))
+            except (AttributeError, OSError) as error:
+                logging.warning("{0:s}: could not set real-time priority ({1!s})".format(self.name, error))
+
+    # Check whether the node has any operating-system scheduling settings to apply
+    def hasSchedulingSettings(self):
+        return self.cpu_affinity is not None or self.nice is not None or self.realtime_priority is not None
+
+    # Find the function the node was given, looking inside the wrapper that producers put around it
+    def userFunction(self):
+        function = self.consumer_producer_function
+        if isinstance(function, functools.partial) and function.func is callWithoutInput:
+            function = function.args[0]
+        return function
+
+    # Check whether the node runs one of its own methods (as timers, printers, watchdogs and the other built-in
+    # nodes do) rather than a function supplied by the user
+    def runsOwnMethod(self):
+        return getattr(self.userFunction(), '__self__', None) is self
+
+    # Work out how long to pause before the next cycle. By default this is the loop delay; in fixed-rate
+    # mode it is the time remaining until the next deadline, so that the time spent inside the cycle is
+    # taken out of the pause rather than added to the period
+    @log_on_start(DEBUG, "{self.name:s}: Computing time until next cycle")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while computing time until next cycle")
+    @log_on_end(DEBUG, "{self.name:s}: Finished computing time until next cycle")
+    def timeUntilNextCycle(self):
+
+        # In trigger mode, only pause for whatever is left of the minimum period
+        if self.trigger:
+            return max(0, self.next_deadline - time.monotonic())
+
+        # Without fixed-rate operation (or without a period to hold), just use the loop delay
+        if not self.fixed_rate or self.delay <= 0:
+            return self.delay
+
+        # Advance the deadline by one period from the previous deadline (not from the current time),
+        # so that timing errors do not accumulate
+        self.next_deadline += self.delay
+        now = time.monotonic()
+        remaining = self.next_deadline - now
+
+        if remaining >= 0:
+            return remaining
+
+        # The cycle ran past its deadline. Drop any whole periods that were missed so that the node
+        # runs once immediately and then falls back into phase, instead of bursting to catch up
+        self.overruns += 1
+        missed = int((now - self.next_deadline) // self.delay)
+        self.skipped_cycles += missed
+        self.next_deadline += missed * self.delay
+
+        return 0
+
+    # In trigger mode, block until any or all of the input buses have been written since the last cycle (or until
+    # one of the termination buses signals shutdown)
+    @log_on_start(DEBUG, "{self.name:s}: Starting to wait for input buses")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while waiting for input buses")
+    @log_on_end(DEBUG, "{self.name:s}: Finished waiting for input buses")
+    def waitForInputs(self):
+
+        # Outside of trigger mode, the loop runs on its delay alone
+        if not self.trigger:
+            return
+
+        # The first time through, ask the input and termination buses to wake this node whenever they are written
+        if self.trigger_signal is None:
+            self.trigger_signal = threading.Condition()
+            for bus in self.input_buses + self.termination_buses:
+                if not bus.placeholder:
+                    bus.add_listener(self.notifyTrigger)
+
+        # Writes to buses shared between processes may come from another process, which cannot notify this node,
+        # so with any such bus the wait times out regularly to look at the buses directly
+        timeout = None
+        if any(bus.process_shared for bus in self.input_buses + self.termination_buses):
+            timeout = self.trigger_poll_interval
+
+        with self.trigger_signal:
+            while not self.trigger_signal.wait_for(self.triggerReady, timeout):
+                pass
+
+        self.acknowledgeInputs()
+
+    def notifyTrigger(self):
+
+        # Called by the buses after every write
+        with self.trigger_signal:
+            self.trigger_signal.notify_all()
+
+    def triggerReady(self):
+
+        # Check which of the input buses have been written since the last cycle
+        changed = [bus.version != version for bus, version in zip(self.input_buses, self.input_versions)]
+
+        if self.trigger == 'all':
+            inputs_ready = all(changed)
+        else:
+            inputs_ready = any(changed)
+
+        # Also stop waiting if the node has been told to shut down
+        return inputs_ready or bool(self.checkTerminationbuses())
+
+    def acknowledgeInputs(self):
+
+        # Record the input bus versions that this cycle will read, and start the minimum period
+        self.input_versions = [bus.version for bus in self.input_buses]
+        self.next_deadline = time.monotonic() + self.delay
+
+    # Call the consumer-producer function on the input values, recording the cycle in the node metrics
+    @log_on_start(DEBUG, "{self.name:s}: Starting consumer-producer function")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error in consumer-producer function")
+    @log_on_end(DEBUG, "{self.name:s}: Finished consumer-producer function")
+    def callFunction(self, input_values):
+
+        # Beat the heartbeat, so that a watchdog can see that the node is cycling
+        cycle_start = time.perf_counter()
+        self.heartbeat = cycle_start
+
+        # In skip-if-unchanged mode, leave the outputs alone if the inputs are the same as last time
+        if self.skip_unchanged and self.inputsUnchanged(input_values):
+            return self.unchanged
+
+        # Note when the call started while it runs, so that a watchdog can tell if it hangs
+        self.busy_since = cycle_start
+        output_values = self.consumer_producer_function(*input_values)
+        self.busy_since = None
+        self.metrics.recordCycle(cycle_start, time.perf_counter() - cycle_start)
+
+        return output_values
+
+    def recordCrash(self, error):
+
+        # Count a crash (an exception that ended the node's loop), and work out how long to wait before
+        # restarting the node, or None if it should not be restarted
+        self.crashes += 1
+        self.last_error = error
+        self.busy_since = None
+        if self.restart_backoff is None or self.termination_event.is_set():
+            return None
+
+        # The wait doubles with each crash, up to the longest backoff, and starts again from the shortest once the
+        # node has stayed up for longer than that
+        now = time.perf_counter()
+        if self.restart_time is None or now - self.restart_time > self.max_restart_backoff:
+            backoff = self.restart_backoff
+        else:
+            backoff = min(self.last_backoff * 2, self.max_restart_backoff)
+        self.last_backoff = backoff
+        self.restart_time = now + backoff
+
+        logging.warning("{0:s}: crashed ({1!r}), restarting in {2:.3g} s".format(self.name, error, backoff))
+
+        return backoff
+
+    def inputsUnchanged(self, input_values):
+
+        # Compare this cycle's inputs with those of the last call, remembering them for the next cycle
+        if self.skip_unchanged == 'version':
+            current = self.cycle_versions
+            unchanged = current is not None and current == self.previous_inputs
+        else:
+            current = [copyMessage(value) for value in input_values]
+            unchanged = (self.previous_inputs is not None
+                         and all(sameMessage(old, new) for old, new in zip(self.previous_inputs, current)))
+
+        if unchanged:
+            self.skipped_calls += 1
+        else:
+            self.previous_inputs = current
+
+        return unchanged
+
+    @log_on_start(DEBUG, "{self.name:s}: Starting metrics snapshot")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while taking metrics snapshot")
+    @log_on_end(DEBUG, "{self.name:s}: Finished metrics snapshot")
+    def getMetrics(self):
+
+        # Combine the runtime counters with the scheduling counters
+        metrics = self.metrics.snapshot()
+        metrics['overruns'] = self.overruns
+        metrics['skipped_cycles'] = self.skipped_cycles
+        metrics['skipped_calls'] = self.skipped_calls
+
+        return metrics
+
+    # Take in a bus or a tuple of buses, and store their
+    # messages into a list
+    @log_on_start(DEBUG, "{self.name:s}: Starting collecting bus values into list")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while collecting bus values")
+    @log_on_end(DEBUG, "{self.name:s}: Finished collecting bus values")
+    def collectbusesToValues(self, buses):
+
+        # Wrap buses in a tuple if it isn't one already
+        buses = ensureTuple(buses)
+
+        # Create a list for storing the values in the buses
+        values = []
+
+        # In skip-if-unchanged mode, note which writes this cycle reads
+        if self.skip_unchanged == 'version':
+            self.cycle_versions = [p.version for p in buses]
+
+        # Loop over the buses, recording their values (and keeping track of the oldest source among the
+        # stamped ones). Buses that belong to a group are read from a single snapshot of the group, so that
+        # they all come from the same write
+        self.input_origin = None
+        snapshots = {}
+        for p in buses:
+            if p.group is not None:
+                if p.group not in snapshots:
+                    snapshots[p.group] = p.group.get_snapshot(self.name)
+                position = p.group.positions[p]
+                if p.stamped:
+                    self.input_origin = olderOrigin(self.input_origin, snapshots[p.group].stamps[position])
+                values.append(snapshots[p.group].messages[position])
+            elif p.stamped:
+                message, stamp = p.get_stamped_message(self.name)
+                self.input_origin = olderOrigin(self.input_origin, stamp)
+                values.append(message)
+            else:
+                values.append(p.get_message(self.name))
+            self.metrics.recordRead(p)
+
+        return values
+
+    # Take in  a tuple of values and a tuple of buses, and deal the values
+    # into the buses
+    @log_on_start(DEBUG, "{self.name:s}: Starting dealing values into buses")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while dealing values into buses")
+    @log_on_end(DEBUG, "{self.name:s}: Finished dealing values into buses")
+    def dealValuesTobuses(self, values, buses):
+
+        # Wrap buses in a tuple if it isn't one already
+        buses = ensureTuple(buses)
+
+        # Nothing to write if the function call was skipped
+        if values is self.unchanged:
+            return
+
+        # Handle different combinations of bus and value counts
+        values = spreadValues(values, len(buses))
+
+        # Buses that belong to a group are written together, in one update of the group
+        group_writes = {}
+        for idx, v in enumerate(values):
+            if buses[idx].group is not None:
+                group_writes.setdefault(buses[idx].group, {})[buses[idx]] = v
+            elif buses[idx].stamped:
+                buses[idx].set_message(v, self.name, self.input_origin)
+            else:
+                buses[idx].set_message(v, self.name)
+            self.metrics.recordWrite(buses[idx])
+
+        for group, writes in group_writes.items():
+            group.set_messages(writes, self.name, self.input_origin)
+
+    @log_on_start(DEBUG, "{self.name:s}: Starting to check termination buses")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while checking termination buses")
+    @log_on_end(DEBUG, "{self.name:s}: Finished checking termination buses")
+    def checkTerminationbuses(self):
+
+        # The termination buses set the termination event when they trigger (go true or non-negative)
+        if self.termination_event.is_set():
+            return True
+
+        # Buses shared between processes can be written without telling this process, so look at them directly
+        for bus in self.polled_termination_buses:
+            if isTerminationValue(bus.get_message(self.name)):
+                self.signalTermination()
+                return True
+
+        return False
+
+    def checkTerminationWrite(self, bus):
+
+        # Called by the termination buses after every write
+        if isTerminationValue(bus.get_message(self.name)):
+            self.signalTermination()
+
+    def signalTermination(self):
+
+        # Tell the loop (and anything else that is listening) to shut down
+        self.termination_event.set()
+        for callback in self.termination_callbacks:
+            callback()
+
+    def wakeUp(self):
+
+        # Start the next cycle straight away instead of waiting out the pause, so that the node works out its
+        # schedule again (for example, after a timer it runs has been restarted)
+        self.termination_event.wake()
+        for callback in self.wake_callbacks:
+            callback()
+
+
+def callWithoutInput(producer_function, _input_value):
+    """
+    Function that calls a producer function, discarding the input value that a consumer-producer passes it
+    """
+
+    return producer_function()
+
+
+class Producer(ConsumerProducer):
+    """
+    Special case of the consumer-producer class, that sends values to buses
+    but does not read them
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create producer")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating producer")
+    @log_on_end(DEBUG, "{name:s}: Finished creating producer")
+    def __init__(self,
+                 producer_function,
+                 output_buses,
+                 delay=0,
+                 termination_buses=placeholderBus(False, "Default producer termination bus"),
+                 name="Unnamed producer",
+                 fixed_rate=False,
+                 execution=None,
+                 priority=None,
+                 cpu_affinity=None,
+                 nice=None,
+                 realtime_priority=None):
+
+        # Producers don't use an input bus
+        input_buses = placeholderBus(0, "Default producer input bus")
+
+        # Match naming convention for this class with its parent class
+        # A wrapper is necessary because a producer function will not accept
+        # input values (partial is used instead of a nested def so that the
+        # wrapper can be pickled, e.g. to run it in a process pool)
+        consumer_producer_function = functools.partial(callWithoutInput, producer_function)
+
+        # Call the parent class init function
+        super().__init__(
+            consumer_producer_function,
+            input_buses,
+            output_buses,
+            delay,
+            termination_buses,
+            name,
+            fixed_rate,
+            execution=execution,
+            priority=priority,
+            cpu_affinity=cpu_affinity,
+            nice=nice,
+            realtime_priority=realtime_priority)
+
+
+class Consumer(ConsumerProducer):
+    """
+    Special case of the consumer-producer class, that reads values from buses
+    but does not send to them
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create consumer")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating consumer")
+    @log_on_end(DEBUG, "{name:s}: Finished creating consumer")
+    def __init__(self,
+                 consumer_function,
+                 input_buses,
+                 delay=0,
+                 termination_buses=placeholderBus(False, "Default consumer termination bus"),
+                 name="Unnamed consumer",
+                 fixed_rate=False,
+                 trigger=None,
+                 execution=None,
+                 priority=None,
+                 cpu_affinity=None,
+                 nice=None,
+                 realtime_priority=None,
+                 skip_unchanged=None):
+
+        # Match naming convention for this class with its parent class
+        consumer_producer_function = consumer_function
+
+        # Consumers don't use an output bus
+        output_buses = placeholderBus(0, "Default consumer output bus")
+
+        # Call the parent class init function
+        super().__init__(
+            consumer_producer_function,
+            input_buses,
+            output_buses,
+            delay,
+            termination_buses,
+            name,
+            fixed_rate,
+            trigger,
+            execution,
+            priority,
+            cpu_affinity,
+            nice,
+            realtime_priority,
+            skip_unchanged)
+
+
+class Timer(Producer):
+    """
+    Timer is a producer that keeps track of time since it was instantiated
+    Time is instantiated with a duration value, and writes a "countdown" value (time before or after the
+    specified duration) to its output bus. The output bus can be used as the termination bus for other
+    consumer-producers (and for the timer itself); these consumer producers will terminate when the timer reaches zero.
+    Time is measured on the monotonic clock, and instead of polling, the timer sleeps until its next write: every
+    "delay" seconds if the delay is non-zero, and in any case when it reaches zero. runConcurrently runs all of
+    the timers it is given together in a single TimerService, rather than giving each timer its own thread
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create timer")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating timer")
+    @log_on_end(DEBUG, "{name:s}: Finished creating timer")
+    def __init__(self,
+                 output_buses,  # buses that receive the countdown value
+                 duration=5,  # how many seconds the timer should run for (0 is forever)
+                 delay=0,  # how many seconds to wait between countdown writes (0 to only write when the timer fires)
+                 termination_buses=placeholderBus(False, "Default timer termination bus"),
+                 name="Unnamed termination timer"):
+
+        # Skip the logging decorators on the timer function if they would not log anything (this has to
+        # happen before the timer function is handed to the parent class)
+        installFastMethods(self, ('timer',))
+
+        super().__init__(
+            self.timer,  # Timer class defines its own producer function
+            output_buses,
+            delay,
+            termination_buses,
+            name)
+
+        self.duration = duration
+        self.t_start = time.monotonic()
+
+        # Whether the timer has written a countdown of zero or more (it then has nothing more to write), and the
+        # timer service running it, if any
+        self.fired = False
+        self.service = None
+
+    def restart(self):
+
+        # Start counting down again from the full duration
+        self.t_start = time.monotonic()
+        self.fired = False
+
+        # A timer that shut itself down by firing on its own buses runs again (a termination value on any of its
+        # other termination buses still stops it)
+        if (self.termination_event.is_set()
+                and any(bus in self.output_buses for bus in self.termination_buses)
+                and not any(isTerminationValue(bus.get_message(self.name))
+                            for bus in self.termination_buses if bus not in self.output_buses)):
+            self.termination_event.clear()
+
+        # Have the timer's service (or its own loop) schedule the next write
+        if self.service is not None:
+            self.service.rescheduleTimer(self)
+        else:
+            self.wakeUp()
+
+    @log_on_start(DEBUG, "{self.name:s}: Checking current time against starting time")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while checking current time against starting time")
+    @log_on_end(DEBUG, "{self.name:s}: Finished checking current time against starting time")
+    def timer(self):
+
+        # Trigger the timer if the duration is non-zero and the time elapsed
+        # since instantiation is longer than the duration
+        if self.duration:
+            time_relative_to_end_time = time.monotonic() - self.t_start - self.duration
+            if time_relative_to_end_time >= 0:
+                self.fired = True
+            return time_relative_to_end_time
+        else:
+            return False
+
+    def nextWriteTime(self, now):
+
+        # Timers that run forever or have already fired have nothing more to write. A timer whose duration ran
+        # out before it could write (for example, while a large graph was being built) fires straight away
+        if not self.duration or self.fired:
+            return None
+        end_time = self.t_start + self.duration
+        if now >= end_time:
+            return now
+
+        # Otherwise, write at the next multiple of the delay after the start, or when the timer fires
+        if self.delay > 0:
+            return min(self.t_start + (int((now - self.t_start) / self.delay) + 1) * self.delay, end_time)
+        else:
+            return end_time
+
+    def timeUntilNextCycle(self):
+
+        # Sleep until the next countdown write (once there is nothing left to write, fall back on the delay)
+        now = time.monotonic()
+        next_write = self.nextWriteTime(now)
+        if next_write is None:
+            return self.delay
+        else:
+            return max(0.0, next_write - now)
+
+
+class TimerService(ConsumerProducer):
+    """
+    Consumer-producer that runs any number of timers in one loop, instead of each timer running as a node of
+    its own. The service keeps a heap of the times at which the timers next need to write their countdowns, and
+    sleeps until the earliest one. Each timer stops being scheduled when it fires, or when its own termination
+    buses trigger; the service shuts down when all of its timers have terminated (or when its own termination
+    buses trigger). Timers should be added before the service starts, but can be restarted while it runs
+    """
+
+    # How long the service sleeps when none of its timers has a write coming up
+    idle_delay = 1.0
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create timer service")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating timer service")
+    @log_on_end(DEBUG, "{name:s}: Finished creating timer service")
+    def __init__(self,
+                 timers=(),  # timer or tuple of timers to run
+                 termination_buses=placeholderBus(False, "Default timer service termination bus"),
+                 name="Timer service",
+                 execution=None,
+                 priority=None):
+
+        super().__init__(
+            self.fireTimers,  # TimerService class defines its own timing function
+            (),
+            (),
+            0,
+            termination_buses,
+            name,
+            False,
+            None,
+            execution,
+            priority)
+
+        # Heap of (time of next write, timer index) entries, with a lock so that timers can be restarted from
+        # other threads. Next writes holds the time of each timer's current entry: restarting a timer leaves its
+        # old entry on the heap, and the old entry is skipped when it comes up
+        self.timers = []
+        self.schedule = []
+        self.next_writes = {}
+        self.schedule_lock = threading.Lock()
+        for timer in ensureTuple(timers):
+            self.addTimer(timer)
+
+    def addTimer(self, timer):
+
+        # Run the timer in this service, which shuts down once all of its timers have terminated
+        self.timers.append(timer)
+        self.output_buses = self.output_buses + tuple(bus for bus in timer.output_buses
+                                                      if bus not in self.output_buses)
+        timer.termination_callbacks.append(self.checkTimersTerminated)
+        timer.service = self
+
+    def rescheduleTimer(self, timer):
+
+        # Schedule the next write of a restarted timer, and wake the service so that it sleeps until the new
+        # schedule's earliest write
+        idx = self.timers.index(timer)
+        next_write = timer.nextWriteTime(time.monotonic())
+        if next_write is not None:
+            with self.schedule_lock:
+                self.next_writes[idx] = next_write
+                heapq.heappush(self.schedule, (next_write, idx))
+            self.wakeUp()
+
+    def checkTimersTerminated(self):
+
+        # Called when one of the timers is told to shut down
+        if all(timer.termination_event.is_set() for timer in self.timers):
+            self.signalTermination()
+
+    def startSchedule(self):
+
+        # Start each timer's own termination tracking, and schedule its first write
+        now = time.monotonic()
+        with self.schedule_lock:
+            self.schedule = []
+            self.next_writes = {}
+            for idx, timer in enumerate(self.timers):
+                timer.startSchedule()
+                next_write = timer.nextWriteTime(now)
+                if next_write is not None:
+                    self.next_writes[idx] = next_write
+                    heapq.heappush(self.schedule, (next_write, idx))
+
+        super().startSchedule()
+        self.checkTimersTerminated()
+
+    def checkTerminationbuses(self):
+
+        if super().checkTerminationbuses():
+            return True
+
+        # Timers with termination buses shared between processes have to look at them directly
+        for timer in self.timers:
+            if timer.polled_termination_buses:
+                timer.checkTerminationbuses()
+
+        return all(timer.termination_event.is_set() for timer in self.timers)
+
+    def fireTimers(self):
+
+        # Collect the countdown writes of all of the timers that are due
+        now = time.monotonic()
+        writes = []
+        with self.schedule_lock:
+            while self.schedule and self.schedule[0][0] <= now:
+                write_time, idx = heapq.heappop(self.schedule)
+                timer = self.timers[idx]
+                if self.next_writes.get(idx) != write_time:
+                    continue
+                del self.next_writes[idx]
+                if timer.termination_event.is_set():
+                    continue
+
+                # Write the countdown if the timer has fired, or if it is set to write its countdown regularly
+                countdown = timer.timer()
+                if countdown >= 0 or timer.delay > 0:
+                    writes.append((timer, countdown))
+
+                next_write = timer.nextWriteTime(now)
+                if next_write is not None:
+                    self.next_writes[idx] = next_write
+                    heapq.heappush(self.schedule, (next_write, idx))
+
+        return writes
+
+    # Write each countdown to the buses of its timer
+    @log_on_start(DEBUG, "{self.name:s}: Starting dealing countdowns into buses")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while dealing countdowns into buses")
+    @log_on_end(DEBUG, "{self.name:s}: Finished dealing countdowns into buses")
+    def dealValuesTobuses(self, values, buses):
+
+        for timer, countdown in values:
+            for bus in timer.output_buses:
+                bus.set_message(countdown, timer.name)
+                self.metrics.recordWrite(bus)
+
+    def timeUntilNextCycle(self):
+
+        # Sleep until the next timer write is due
+        with self.schedule_lock:
+            if self.schedule:
+                return max(0.0, self.schedule[0][0] - time.monotonic())
+            else:
+                return self.idle_delay
+
+
+def groupTimers(producer_consumer_list, service_class):
+    """
+    Function that replaces the Timers in a list of consumer-producers with a single service (of the given
+    TimerService class) running all of them
+    """
+
+    timers = [cp for cp in producer_consumer_list if isinstance(cp, Timer)]
+    if not timers:
+        return list(producer_consumer_list)
+
+    others = [cp for cp in producer_consumer_list if not isinstance(cp, Timer)]
+    return others + [service_class(tuple(timers))]
+
+
+class Printer(Consumer):
+    """
+    Printer is a consumer that reads a value stored in a bus and prints it out at specified intervals. Lines are
+    handed to a background thread through a short queue, so that a slow terminal does not hold up the printer's
+    loop; if the terminal falls behind and the queue fills up, the oldest waiting line is replaced by the new
+    one ("coalesce", so that the terminal always catches up to the latest values) or the new line is discarded
+    ("drop")
+    """
+
+    # Width of each output column
+    column_width = 11
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create printer")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating printer")
+    @log_on_end(DEBUG, "{name:s}: Finished creating printer")
+    def __init__(self,
+                 printer_bus,  # bus or tuple of buses that should be printed to the terminal
+                 delay=0,  # how many seconds to sleep for between printing data
+                 termination_buses=placeholderBus(False, "Default printer termination bus"),
+                 name="Unnamed termination timer",  # name of this printer
+                 print_prefix="Unspecified printer: ",  # prefix for output
+                 queue_size=16,  # number of lines that can wait for the terminal
+                 overflow="coalesce",  # "coalesce" or "drop": what to do with a new line when the queue is full
+                 sink=None):  # file-like object to write to (None for standard output)
+
+        if overflow not in ('coalesce', 'drop'):
+            raise ValueError("{0:s}: overflow must be 'coalesce' or 'drop', not {1!r}".format(name, overflow))
+
+        super().__init__(
+            self.print_bus,  # Printer class defines its own printing function
+            printer_bus,
+            delay,
+            termination_buses,
+            name)
+
+        self.print_prefix = print_prefix
+
+        # Template for an output line: the prefix, followed by one left-aligned column per bus
+        self.line_template = (print_prefix.replace('{', '{{').replace('}', '}}')
+                              + " {{:<{0:d}s}}".format(self.column_width) * len(self.input_buses))
+
+        # Queue of lines waiting to be written, and the background thread that writes them. Lines that are
+        # discarded because the queue is full are counted in dropped_lines
+        self.sink = sink
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.lines = collections.deque()
+        self.lines_condition = threading.Condition()
+        self.dropped_lines = 0
+        self.writer_thread = None
+        self.stopping = False
+
+    @staticmethod
+    def formatMessage(msg):
+
+        if isinstance(msg, str):                           # If the message is a string, leave it as it is
+            return msg
+        elif isinstance(msg, dict):                        # Dictionaries (e.g., metrics) are shown as they are
+            return str(msg)
+        else:                                              # If it's not a string, assume it's a number, and show it
+            return format(msg, " .4g")                     # with 4 significant figures (and a space for the sign
+                                                           # of non-negative values)
+
+    def print_bus(self, *messages):
+
+        # Fill in the output template, and queue the line for the background thread
+        self.queueLine(self.line_template.format(*[self.formatMessage(msg) for msg in messages]))
+
+    def queueLine(self, line):
+
+        with self.lines_condition:
+            if len(self.lines) >= self.queue_size:
+                self.dropped_lines += 1
+                if self.overflow == 'drop':
+                    return
+                self.lines.popleft()
+            self.lines.append(line)
+            self.lines_condition.notify()
+
+    def startSchedule(self):
+
+        # Start the background thread that writes the queued lines
+        self.stopping = False
+        self.writer_thread = threading.Thread(target=self.writeLines, name="{0:s} writer".format(self.name))
+        self.writer_thread.start()
+
+        super().startSchedule()
+
+    def stopSchedule(self):
+
+        # When the printer shuts down (or its loop fails), wait for the queued lines to be written out
+        self.close()
+
+        super().stopSchedule()
+
+    def close(self):
+
+        if self.writer_thread is not None:
+            with self.lines_condition:
+                self.stopping = True
+                self.lines_condition.notify()
+            self.writer_thread.join()
+            self.writer_thread = None
+
+    def writeLines(self):
+
+        while True:
+
+            # Wait for lines to write, taking all of the waiting lines at once
+            with self.lines_condition:
+                self.lines_condition.wait_for(lambda: self.lines or self.stopping)
+                lines = list(self.lines)
+                self.lines.clear()
+                stopping = self.stopping
+
+            if lines:
+                sink = self.sink or sys.stdout
+                sink.write("\n".join(lines) + "\n")
+                sink.flush()
+
+            if stopping:
+                break
+
+
+class BatchConsumerProducer(ConsumerProducer):
+    """
+    Consumer-producer that processes the samples that arrived since its last cycle as a batch, instead of
+    one latest value per bus. Each HistoryBus input is drained into a NumPy array of all its unread samples
+    (other buses give a one-sample array holding their latest value), and the function is called once with
+    these arrays. The function returns an array (or a tuple of arrays, one per output bus): each element is
+    written to a HistoryBus output as a separate sample, while other buses receive the last element. A result
+    of None writes nothing
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create batch consumer-producer")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating batch consumer-producer")
+    @log_on_end(DEBUG, "{name:s}: Finished creating batch consumer-producer")
+    def __init__(self,
+                 consumer_producer_function,
+                 input_buses,
+                 output_buses,
+                 delay=0,
+                 termination_buses=placeholderBus(False, "Default consumer_producer termination bus"),
+                 name="Unnamed batch consumer_producer",
+                 fixed_rate=False,
+                 trigger=None,
+                 execution=None,
+                 priority=None):
+
+        if np is None:
+            raise ImportError("{0:s}: BatchConsumerProducer requires NumPy".format(name))
+
+        super().__init__(
+            consumer_producer_function,
+            input_buses,
+            output_buses,
+            delay,
+            termination_buses,
+            name,
+            fixed_rate,
+            trigger,
+            execution,
+            priority)
+
+        # Register with the history buses straight away, so that samples written before the first cycle are kept
+        self.registerReader()
+
+    def registerReader(self):
+
+        for bus in self.input_buses:
+            if isinstance(bus, HistoryBus):
+                bus.register_reader(self.name, self)
+
+    def startSchedule(self):
+
+        # Register again in case the node is being run again after stopping
+        self.registerReader()
+
+        super().startSchedule()
+
+    def stopSchedule(self):
+
+        # Once the node has stopped draining the history buses, it should no longer hold up their writers
+        for bus in self.input_buses:
+            if isinstance(bus, HistoryBus):
+                bus.unregister_reader(self.name, self)
+
+        super().stopSchedule()
+
+    # Drain the input buses into arrays of samples
+    @log_on_start(DEBUG, "{self.name:s}: Starting collecting bus samples into arrays")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while collecting bus samples")
+    @log_on_end(DEBUG, "{self.name:s}: Finished collecting bus samples")
+    def collectbusesToValues(self, buses):
+
+        # Wrap buses in a tuple if it isn't one already
+        buses = ensureTuple(buses)
+
+        # Create a list for storing the sample arrays
+        values = []
+
+        # Loop over the buses, draining history buses and sampling the others (and keeping track of the
+        # oldest source among the stamped samples)
+        self.input_origin = None
+        for p in buses:
+            if isinstance(p, HistoryBus):
+                samples, stamps = p.drain_stamped(self.name, self)
+                for stamp in stamps:
+                    self.input_origin = olderOrigin(self.input_origin, stamp)
+                values.append(np.asarray(samples))
+            elif p.stamped:
+                message, stamp = p.get_stamped_message(self.name)
+                self.input_origin = olderOrigin(self.input_origin, stamp)
+                values.append(np.asarray([message]))
+            else:
+                values.append(np.asarray([p.get_message(self.name)]))
+            self.metrics.recordRead(p)
+
+        return values
+
+    # Deal arrays of output samples into the output buses
+    @log_on_start(DEBUG, "{self.name:s}: Starting dealing sample arrays into buses")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while dealing sample arrays into buses")
+    @log_on_end(DEBUG, "{self.name:s}: Finished dealing sample arrays into buses")
+    def dealValuesTobuses(self, values, buses):
+
+        # Wrap buses in a tuple if it isn't one already
+        buses = ensureTuple(buses)
+
+        # Match the batches to the buses in the same way as the parent class matches values to buses
+        values = spreadValues(values, len(buses))
+
+        # Buses that belong to a group are written together, in one update of the group
+        group_writes = {}
+        for bus, batch in zip(buses, values):
+
+            # Nothing to write for this bus
+            if batch is None:
+                continue
+
+            # A single value (a Python or NumPy scalar) is a batch of one sample
+            batch = np.atleast_1d(batch)
+            if len(batch) == 0:
+                continue
+
+            # History buses receive every sample; other buses only hold the latest one
+            if isinstance(bus, HistoryBus):
+                samples = batch
+            else:
+                samples = batch[-1:]
+            for sample in samples:
+                if bus.group is not None:
+                    group_writes.setdefault(bus.group, {})[bus] = sample
+                elif bus.stamped:
+                    bus.set_message(sample, self.name, self.input_origin)
+                else:
+                    bus.set_message(sample, self.name)
+                self.metrics.recordWrite(bus)
+
+        for group, writes in group_writes.items():
+            group.set_messages(writes, self.name, self.input_origin)
+
+
+class LatencyTracer(ConsumerProducer):
+    """
+    LatencyTracer is a consumer that measures end-to-end latency through a running graph. It watches a set of
+    stamped buses, and for each new message it sees, records how long the message took to get there from the
+    source write it derives from (for example, from a sensor reading to the motor command computed from it).
+    Latencies are grouped by path (the source writer and the traced bus), and getLatencies() returns their
+    percentiles over the most recent samples. The percentiles are also written to the report buses, if any
+    """
+
+    # Percentiles reported for each path
+    percentiles = (50, 90, 99)
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create latency tracer")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating latency tracer")
+    @log_on_end(DEBUG, "{name:s}: Finished creating latency tracer")
+    def __init__(self,
+                 traced_buses,  # stamped bus or tuple of stamped buses to trace
+                 delay=0,  # how many seconds to sleep for between checking the buses
+                 termination_buses=placeholderBus(False, "Default latency tracer termination bus"),
+                 name="Unnamed latency tracer",
+                 report_buses=None,  # buses that receive the latency percentiles on every cycle
+                 window=1000,  # number of recent samples per path that the percentiles cover
+                 trigger='any',  # by default, check the buses whenever one of them is written
+                 execution=None,
+                 priority=None):
+
+        for bus in ensureTuple(traced_buses):
+            if not bus.stamped:
+                raise ValueError("{0:s}: traced bus {1:s} is not stamped".format(name, bus.name))
+
+        # Tracers without report buses write to a placeholder, like consumers
+        if report_buses is None:
+            report_buses = placeholderBus(0, "Default latency tracer report bus")
+
+        super().__init__(
+            self.trace,  # LatencyTracer class defines its own tracing function
+            traced_buses,
+            report_buses,
+            delay,
+            termination_buses,
+            name,
+            False,
+            trigger,
+            execution,
+            priority)
+
+        # Recent latencies for each path, and the sequence number of the last message seen on each bus
+        self.window = window
+        self.latencies = {}
+        self.last_sequences = [None] * len(self.input_buses)
+
+    # Read the stamps, rather than the messages, from the traced buses
+    @log_on_start(DEBUG, "{self.name:s}: Starting collecting bus stamps into list")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while collecting bus stamps")
+    @log_on_end(DEBUG, "{self.name:s}: Finished collecting bus stamps")
+    def collectbusesToValues(self, buses):
+
+        # Wrap buses in a tuple if it isn't one already
+        buses = ensureTuple(buses)
+
+        # Create a list for storing the stamps of the buses
+        stamps = []
+
+        # Loop over the buses, recording their stamps
+        for p in buses:
+            stamps.append(p.get_stamped_message(self.name)[1])
+            self.metrics.recordRead(p)
+
+        return stamps
+
+    def trace(self, *stamps):
+
+        # Record the latency of each message that has not been seen before
+        for idx, stamp in enumerate(stamps):
+            if stamp is None or stamp.sequence == self.last_sequences[idx]:
+                continue
+            self.last_sequences[idx] = stamp.sequence
+
+            path = "{0:s} -> {1:s}".format(stamp.origin_writer, self.input_buses[idx].name)
+            if path not in self.latencies:
+                self.latencies[path] = collections.deque(maxlen=self.window)
+            self.latencies[path].append(stamp.timestamp - stamp.origin_time)
+
+        return self.getLatencies()
+
+    def getLatencies(self):
+
+        # Summarize the recent latencies on each path (in seconds)
+        report = {}
+        for path, latencies in list(self.latencies.items()):
+            ordered = sorted(latencies)
+            summary = {'count': len(ordered)}
+            for percentile in self.percentiles:
+                idx = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+                summary['p{0:d}'.format(percentile)] = ordered[idx]
+            summary['max'] = ordered[-1]
+            report[path] = summary
+
+        return report
+
+
+class Watchdog(ConsumerProducer):
+    """
+    Watchdog is a consumer-producer that supervises a set of nodes running in its own process. Every cycle it
+    checks each node's heartbeat (the time at which the node last reached its function) and reports:
+
+    - stalls: a node that has been inside one function call for longer than the stall timeout, or (for a polling
+      node) has not reached its function for that long beyond its delay
+    - missed deadlines: a fixed-rate node that has overrun its period since the last check
+    - crashes: a node whose loop ended with an exception
+
+    Changes of state are logged as warnings as they happen, and the state of every node is written to the
+    status buses. When any node not listed as degradable misses a deadline, the system is taken to be
+    overloaded, and the periods of the degradable (low-priority) nodes are doubled, up to max_stretch times their
+    original delay, so that the critical loops get the processor time they need (nodes whose delay is shorter
+    than min_period are stretched as if it were min_period); once nothing has missed a deadline for
+    recovery_time seconds, the periods are halved again, step by step. If a restart backoff is
+    given, crashed nodes running in their own threads or processes (or under asyncio) are restarted after
+    waiting that long, with the wait doubling on each further crash up to max_restart_backoff
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create watchdog")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating watchdog")
+    @log_on_end(DEBUG, "{name:s}: Finished creating watchdog")
+    def __init__(self,
+                 nodes,  # consumer-producer or tuple of consumer-producers to supervise
+                 status_buses=(),  # buses that receive a dictionary of the state of each node on every check
+                 delay=0.1,  # how many seconds to wait between checks
+                 termination_buses=placeholderBus(False, "Default watchdog termination bus"),
+                 name="Watchdog",
+                 stall_timeout=1.0,  # how many seconds a node can go without reaching its function before it stalls
+                 degradable=(),  # low-priority nodes whose periods are stretched while the system is overloaded
+                 max_stretch=4.0,  # largest factor by which the period of a degradable node is stretched
+                 min_period=0.01,  # period that degradable nodes with a shorter (or no) delay are stretched from
+                 recovery_time=2.0,  # how many seconds without missed deadlines before the periods shrink again
+                 restart_backoff=None,  # seconds to wait before restarting a crashed node, or None to not restart
+                 max_restart_backoff=10.0,  # longest wait before restarting a crashed node
+                 execution=None,
+                 priority=None):
+
+        super().__init__(
+            self.check,  # Watchdog class defines its own checking function
+            (),
+            status_buses,
+            delay,
+            termination_buses,
+            name,
+            False,
+            None,
+            execution,
+            priority)
+
+        self.nodes = ensureTuple(nodes)
+        self.stall_timeout = stall_timeout
+        self.degradable = ensureTuple(degradable)
+        self.max_stretch = max_stretch
+        self.min_period = min_period
+        self.recovery_time = recovery_time
+
+        for node in self.degradable:
+            if node not in self.nodes:
+                raise ValueError("{0:s}: degradable node {1:s} is not supervised".format(name, node.name))
+
+        # Give the nodes their restart policy
+        if restart_backoff is not None:
+            for node in self.nodes:
+                node.restart_backoff = restart_backoff
+                node.max_restart_backoff = max(restart_backoff, max_restart_backoff)
+
+        # The state of each node at the last check, the overrun and crash counts seen so far, and the original
+        # delays of the degradable nodes
+        self.states = {}
+        self.seen_overruns = {node: node.overruns for node in self.nodes}
+        self.seen_crashes = {node: node.crashes for node in self.nodes}
+        self.base_delays = {node: node.delay for node in self.degradable}
+
+        # Whether the system is overloaded, and the time of the last missed deadline of a critical node
+        self.overloaded = False
+        self.last_overload = None
+
+    def check(self):
+
+        now = time.perf_counter()
+        overloaded = False
+
+        for node in self.nodes:
+            state = self.nodeState(node, now)
+
+            # Missed deadlines of the critical nodes mean the system is overloaded
+            if state == 'late' and node not in self.base_delays:
+                overloaded = True
+
+            if state != self.states.get(node):
+                self.reportState(node, state)
+            self.states[node] = state
+
+        self.adjustPeriods(overloaded, now)
+
+        return {node.name: state for node, state in self.states.items()}
+
+    def nodeState(self, node, now):
+
+        # Crashes and missed deadlines since the last check take precedence, so that they are always reported
+        if node.crashes != self.seen_crashes[node]:
+            self.seen_crashes[node] = node.crashes
+            return 'crashed'
+        if node.restart_time is not None and now < node.restart_time:
+            return 'restarting'
+        if node.crashes and node.restart_backoff is None:
+            return 'crashed'
+        if node.termination_event.is_set():
+            return 'stopped'
+        if node.overruns != self.seen_overruns[node]:
+            self.seen_overruns[node] = node.overruns
+            return 'late'
+
+        # A node is stalled if it has been inside one function call for too long, or (unless it waits for its
+        # inputs) has gone too long beyond its delay without reaching its function
+        busy_since = node.busy_since
+        if busy_since is not None:
+            if now - busy_since > self.stall_timeout:
+                return 'stalled'
+        elif node.heartbeat is not None and not node.trigger:
+            if now - node.heartbeat > node.delay + self.stall_timeout:
+                return 'stalled'
+
+        if node in self.base_delays and node.delay > self.base_delays[node]:
+            return 'degraded'
+
+        return 'ok'
+
+    def reportState(self, node, state):
+
+        if state == 'crashed':
+            logging.warning("{0:s}: {1:s} crashed ({2!r})".format(self.name, node.name, node.last_error))
+        elif state == 'stalled':
+            logging.warning("{0:s}: {1:s} has stalled".format(self.name, node.name))
+        elif state == 'late':
+            logging.warning("{0:s}: {1:s} missed its deadline".format(self.name, node.name))
+        elif self.states.get(node) in ('stalled', 'late', 'restarting') and state == 'ok':
+            logging.info("{0:s}: {1:s} has recovered".format(self.name, node.name))
+
+    def adjustPeriods(self, overloaded, now):
+
+        if overloaded:
+            if not self.overloaded:
+                logging.warning("{0:s}: overloaded, stretching the periods of the degradable nodes".format(
+                    self.name))
+            self.overloaded = True
+            self.last_overload = now
+
+            # Stretch the degradable nodes, each check, up to their limit. Nodes that run with little or no delay
+            # are stretched from the minimum period, as doubling a zero delay would leave them running flat out
+            for node, base_delay in self.base_delays.items():
+                node.delay = min(max(node.delay, self.min_period) * 2,
+                                 max(base_delay, self.min_period) * self.max_stretch)
+
+        elif self.last_overload is not None and now - self.last_overload >= self.recovery_time:
+
+            # Shrink the stretched nodes back one step at a time, waiting recovery_time between steps
+            self.overloaded = False
+            self.last_overload = now
+            for node, base_delay in self.base_delays.items():
+                shrunk_delay = node.delay / 2
+                if shrunk_delay < max(base_delay, self.min_period):
+                    shrunk_delay = base_delay
+                node.delay = shrunk_delay
+            if all(node.delay == base_delay for node, base_delay in self.base_delays.items()):
+                logging.info("{0:s}: degradable nodes are back at their full rate".format(self.name))
+                self.last_overload = None
+
+
+def encodeValue(value, parts):
+    """
+    Function that appends the compact binary encoding of a value to a list of byte strings. Supported values are
+    None, booleans, 64-bit integers, floats, strings, bytes, NumPy arrays and scalars, and tuples, lists and
+    dictionaries of these. Each value is a one-byte type tag followed by its data in network byte order
+    """
+
+    if value is None:
+        parts.append(b'N')
+    elif value is True:
+        parts.append(b'T')
+    elif value is False:
+        parts.append(b'F')
+    elif isinstance(value, int):
+        if not -2 ** 63 <= value < 2 ** 63:
+            raise ValueError("Integer {0:d} is too large to send over a bridge".format(value))
+        parts.append(b'i' + struct.pack('!q', value))
+    elif isinstance(value, float):
+        parts.append(b'f' + struct.pack('!d', value))
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        parts.append(b's' + struct.pack('!I', len(data)))
+        parts.append(data)
+    elif isinstance(value, (bytes, bytearray)):
+        parts.append(b'b' + struct.pack('!I', len(value)))
+        parts.append(bytes(value))
+    elif np is not None and isinstance(value, np.generic):
+        encodeValue(value.item(), parts)
+    elif np is not None and isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            raise ValueError("Arrays of Python objects cannot be sent over a bridge")
+        dtype = value.dtype.str.encode('ascii')
+        parts.append(b'a' + struct.pack('!B', len(dtype)) + dtype
+                     + struct.pack('!B{0:d}I'.format(value.ndim), value.ndim, *value.shape))
+        parts.append(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (tuple, list)):
+        parts.append((b't' if isinstance(value, tuple) else b'l') + struct.pack('!I', len(value)))
+        for item in value:
+            encodeValue(item, parts)
+    elif isinstance(value, dict):
+        parts.append(b'd' + struct.pack('!I', len(value)))
+        for key, item in value.items():
+            encodeValue(key, parts)
+            encodeValue(item, parts)
+    else:
+        raise ValueError("Values of type {0:s} cannot be sent over a bridge".format(type(value).__name__))
+
+
+def decodeValue(data, offset=0):
+    """
+    Function that decodes one value encoded by encodeValue, starting at the given offset into the data, and
+    returns the value and the offset just past it
+    """
+
+    tag = data[offset:offset + 1]
+    offset += 1
+
+    if tag == b'N':
+        return None, offset
+    elif tag == b'T':
+        return True, offset
+    elif tag == b'F':
+        return False, offset
+    elif tag == b'i':
+        return struct.unpack_from('!q', data, offset)[0], offset + 8
+    elif tag == b'f':
+        return struct.unpack_from('!d', data, offset)[0], offset + 8
+    elif tag in (b's', b'b'):
+        length = struct.unpack_from('!I', data, offset)[0]
+        offset += 4
+        value = bytes(data[offset:offset + length])
+        if tag == b's':
+            value = value.decode('utf-8')
+        return value, offset + length
+    elif tag == b'a':
+        if np is None:
+            raise ImportError("Receiving arrays over a bridge requires NumPy")
+        dtype_length = data[offset]
+        dtype = np.dtype(bytes(data[offset + 1:offset + 1 + dtype_length]).decode('ascii'))
+        offset += 1 + dtype_length
+        ndim = data[offset]
+        shape = struct.unpack_from('!{0:d}I'.format(ndim), data, offset + 1)
+        offset += 1 + 4 * ndim
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        value = np.frombuffer(data, dtype, int(np.prod(shape)), offset).reshape(shape).copy()
+        return value, offset + nbytes
+    elif tag in (b't', b'l'):
+        count = struct.unpack_from('!I', data, offset)[0]
+        offset += 4
+        items = []
+        for _ in range(count):
+            item, offset = decodeValue(data, offset)
+            items.append(item)
+        return (tuple(items) if tag == b't' else items), offset
+    elif tag == b'd':
+        count = struct.unpack_from('!I', data, offset)[0]
+        offset += 4
+        value = {}
+        for _ in range(count):
+            key, offset = decodeValue(data, offset)
+            value[key], offset = decodeValue(data, offset)
+        return value, offset
+    else:
+        raise ValueError("Unknown type tag {0!r} in bridge data".format(tag))
+
+
+def encodeMessage(message):
+    """
+    Function that encodes a message for sending over a bridge
+    """
+
+    parts = []
+    encodeValue(message, parts)
+    return b''.join(parts)
+
+
+def decodeMessage(data):
+    """
+    Function that decodes a message received over a bridge
+    """
+
+    return decodeValue(data)[0]
+
+
+def ensureAddressList(addresses):
+    """
+    Function that wraps a single (host, port) address in a list, leaving lists of addresses as they are
+    """
+
+    if isinstance(addresses, list):
+        return [tuple(address) for address in addresses]
+    else:
+        return [tuple(addresses)]
+
+
+class BridgeSender(Consumer):
+    """
+    BridgeSender mirrors a set of local buses to peers in other processes or on other hosts, over UDP or TCP.
+    On each cycle it sends the latest message of every bus that has been written since its last send (so that
+    updates that arrive faster than the sender runs are coalesced, and only the latest value goes out), tagged
+    with the name of the bus. The delay is the rate limit: messages on each bus go out at most once per delay
+    (with trigger="any", they go out as soon as the bus is written, but no more often than that). Messages that
+    have not changed are sent again every keepalive seconds, so that peers that start late, or that lose a UDP
+    packet, still catch up. Messages are encoded compactly by encodeMessage; see encodeValue for the types
+    that can be sent
+    """
+
+    # Largest payload that fits in a UDP datagram
+    max_datagram = 65507
+
+    # How long to wait when connecting to a TCP peer
+    connect_timeout = 1.0
+
+    # Length prefix of each message on a TCP stream
+    frame_header = struct.Struct('!I')
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create bridge sender")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating bridge sender")
+    @log_on_end(DEBUG, "{name:s}: Finished creating bridge sender")
+    def __init__(self,
+                 buses,  # bus or tuple of buses to mirror
+                 peers,  # (host, port) address of the receiving bridge, or a list of addresses
+                 delay=0.05,  # minimum time between sends of each bus, in seconds
+                 termination_buses=placeholderBus(False, "Default bridge sender termination bus"),
+                 name="Unnamed bridge sender",
+                 protocol="udp",  # "udp" or "tcp"
+                 keepalive=1.0,  # how many seconds to wait before sending an unchanged message again
+                 trigger=None,
+                 execution=None,
+                 priority=None):
+
+        if protocol not in ('udp', 'tcp'):
+            raise ValueError("{0:s}: protocol must be 'udp' or 'tcp', not {1!r}".format(name, protocol))
+
+        super().__init__(
+            self.send,  # BridgeSender class defines its own sending function
+            buses,
+            delay,
+            termination_buses,
+            name,
+            False,
+            trigger,
+            execution,
+            priority)
+
+        self.peers = ensureAddressList(peers)
+        self.protocol = protocol
+        self.keepalive = keepalive
+
+        # Each sender has a random identity, so that receivers can tell when a sender has restarted (and its bus
+        # versions have started again from zero)
+        self.sender_id = int.from_bytes(os.urandom(4), 'big')
+
+        # The version of each bus that was last sent, and when it was sent
+        self.sent_versions = [None] * len(self.input_buses)
+        self.send_times = [0.0] * len(self.input_buses)
+
+        # Sockets are opened on the first send (in the process that runs the sender). TCP peers that cannot be
+        # reached are retried every keepalive seconds
+        self.sockets = None
+        self.retry_times = {}
+
+    # Read the versions along with the messages, so that unchanged buses are not sent again
+    @log_on_start(DEBUG, "{self.name:s}: Starting collecting bus versions and values into list")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while collecting bus versions and values")
+    @log_on_end(DEBUG, "{self.name:s}: Finished collecting bus versions and values")
+    def collectbusesToValues(self, buses):
+
+        # Wrap buses in a tuple if it isn't one already
+        buses = ensureTuple(buses)
+
+        # Create a list for storing the versions and values of the buses
+        values = []
+
+        # Loop over the buses, reading each version before the message (so that the message is never older than
+        # the version recorded for it)
+        for p in buses:
+            version = p.version
+            values.append((version, p.get_message(self.name)))
+            self.metrics.recordRead(p)
+
+        return values
+
+    def openSockets(self):
+
+        # UDP uses one socket for all of the peers, while TCP has a connection (or None) for each peer
+        if self.protocol == 'udp':
+            self.sockets = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self.sockets = dict.fromkeys(self.peers)
+        weakref.finalize(self, BridgeSender.closeSockets, self.sockets)
+
+    @staticmethod
+    def closeSockets(sockets):
+
+        if isinstance(sockets, dict):
+            for sock in sockets.values():
+                if sock is not None:
+                    sock.close()
+        else:
+            sockets.close()
+
+    def connectPeer(self, peer, now):
+
+        # Try to connect to a TCP peer, unless the last attempt was too recent. A new connection gets every
+        # message again, as the peer may have missed some
+        if now < self.retry_times.get(peer, 0.0):
+            return None
+        try:
+            sock = socket.create_connection(peer, self.connect_timeout)
+        except OSError:
+            self.retry_times[peer] = now + self.keepalive
+            return None
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sockets[peer] = sock
+        self.sent_versions = [None] * len(self.input_buses)
+        return sock
+
+    def sendPacket(self, packet, now):
+
+        if self.protocol == 'udp':
+            for peer in self.peers:
+                try:
+                    self.sockets.sendto(packet, peer)
+                except OSError:
+                    # Datagrams to peers that are not listening are simply lost
+                    pass
+        else:
+            frame = self.frame_header.pack(len(packet)) + packet
+            for peer in self.peers:
+                sock = self.sockets[peer] or self.connectPeer(peer, now)
+                if sock is None:
+                    continue
+                try:
+                    sock.sendall(frame)
+                except OSError:
+                    # Drop the connection, and reconnect on a later send
+                    sock.close()
+                    self.sockets[peer] = None
+
+    def send(self, *updates):
+
+        if self.sockets is None:
+            self.openSockets()
+
+        now = time.monotonic()
+        for idx, (version, message) in enumerate(updates):
+
+            # Only send buses that have changed since their last send, or that are due for a keepalive
+            if version == self.sent_versions[idx] and now - self.send_times[idx] < self.keepalive:
+                continue
+
+            packet = encodeMessage((self.sender_id, self.input_buses[idx].name, version, message))
+            if self.protocol == 'udp' and len(packet) > self.max_datagram:
+                raise ValueError("{0:s}: message on {1:s} needs {2:d} bytes, but a UDP datagram only holds "
+                                 "{3:d}".format(self.name, self.input_buses[idx].name, len(packet), self.max_datagram))
+            self.sendPacket(packet, now)
+
+            self.sent_versions[idx] = version
+            self.send_times[idx] = now
+
+
+class BridgeReceiver(Producer):
+    """
+    BridgeReceiver is the other end of a BridgeSender: it listens on a local address, and writes each message
+    it receives to the local bus with the same name as the bus it was sent from. Each cycle waits up to
+    "timeout" seconds for data, and then writes only the latest message received for each bus (older or
+    repeated messages are discarded). Because waiting for data blocks, the rossros_asyncio receiver does not
+    wait by default, and polls for data every delay seconds instead
+    """
+
+    # Marker for the buses that have not received a new message in a cycle
+    no_update = object()
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create bridge receiver")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating bridge receiver")
+    @log_on_end(DEBUG, "{name:s}: Finished creating bridge receiver")
+    def __init__(self,
+                 buses,  # bus or tuple of buses that receive the mirrored messages (matched by name)
+                 address,  # local (host, port) address to listen on
+                 delay=0,  # how many seconds to sleep for between checking for data
+                 termination_buses=placeholderBus(False, "Default bridge receiver termination bus"),
+                 name="Unnamed bridge receiver",
+                 protocol="udp",  # "udp" or "tcp"
+                 timeout=0.1,  # how many seconds each cycle waits for data
+                 execution=None,
+                 priority=None):
+
+        if protocol not in ('udp', 'tcp'):
+            raise ValueError("{0:s}: protocol must be 'udp' or 'tcp', not {1!r}".format(name, protocol))
+
+        super().__init__(
+            self.receive,  # BridgeReceiver class defines its own receiving function
+            buses,
+            delay,
+            termination_buses,
+            name,
+            False,
+            execution,
+            priority)
+
+        self.protocol = protocol
+        self.timeout = timeout
+
+        # Route incoming messages to the buses by name, and keep the last version received from each sender
+        # for each bus
+        self.bus_indices = {bus.name: idx for idx, bus in enumerate(self.output_buses)}
+        self.received_versions = {}
+
+        # Bind the socket straight away, so that senders can reach the receiver as soon as it is created. For
+        # TCP, the selector also watches the connections accepted from senders, each with a buffer of the
+        # partial message received so far
+        if protocol == 'udp':
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(tuple(address))
+        if protocol == 'tcp':
+            self.socket.listen()
+        self.socket.setblocking(False)
+        self.address = self.socket.getsockname()
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ)
+        weakref.finalize(self, BridgeReceiver.closeSelector, self.selector)
+
+    @staticmethod
+    def closeSelector(selector):
+
+        # Close the listening socket and any connections along with the selector
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+    def readPackets(self):
+
+        # Wait for data, then keep reading until nothing more is waiting (or a burst limit is reached, so that a
+        # flood of packets cannot keep the cycle from finishing)
+        packets = []
+        timeout = self.timeout
+        for _ in range(256):
+            events = self.selector.select(timeout)
+            if not events:
+                break
+            timeout = 0
+
+            for key, _mask in events:
+                sock = key.fileobj
+                if self.protocol == 'udp':
+                    packets.append(sock.recv(65535))
+                elif sock is self.socket:
+                    connection, _peer = sock.accept()
+                    connection.setblocking(False)
+                    self.selector.register(connection, selectors.EVENT_READ, bytearray())
+                else:
+                    packets.extend(self.readFrames(key))
+
+        return packets
+
+    def readFrames(self, key):
+
+        # Add the new data to the connection's buffer, and split off the complete messages
+        try:
+            data = key.fileobj.recv(65536)
+        except OSError:
+            data = b''
+        if not data:
+            self.selector.unregister(key.fileobj)
+            key.fileobj.close()
+            return []
+
+        buffer = key.data
+        buffer.extend(data)
+        frames = []
+        header_size = BridgeSender.frame_header.size
+        while len(buffer) >= header_size:
+            length = BridgeSender.frame_header.unpack_from(buffer)[0]
+            if len(buffer) < header_size + length:
+                break
+            frames.append(bytes(buffer[header_size:header_size + length]))
+            del buffer[:header_size + length]
+
+        return frames
+
+    def receive(self):
+
+        # Keep only the newest message for each bus
+        updates = [self.no_update] * len(self.output_buses)
+        for packet in self.readPackets():
+            try:
+                sender_id, bus_name, version, message = decodeMessage(packet)
+            except (ValueError, TypeError, IndexError, struct.error, UnicodeDecodeError):
+                logging.warning("{0:s}: discarding a malformed bridge message".format(self.name))
+                continue
+
+            idx = self.bus_indices.get(bus_name)
+            if idx is None:
+                continue
+
+            # Discard messages that are older than (or the same as) one already received from the same sender
+            last_version = self.received_versions.get((sender_id, bus_name))
+            if last_version is not None and version <= last_version:
+                continue
+            self.received_versions[(sender_id, bus_name)] = version
+            updates[idx] = message
+
+        return tuple(updates)
+
+    # Only write the buses that have received new messages
+    @log_on_start(DEBUG, "{self.name:s}: Starting dealing received messages into buses")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while dealing received messages into buses")
+    @log_on_end(DEBUG, "{self.name:s}: Finished dealing received messages into buses")
+    def dealValuesTobuses(self, values, buses):
+
+        # Wrap buses in a tuple if it isn't one already
+        buses = ensureTuple(buses)
+
+        for bus, value in zip(buses, values):
+            if value is not self.no_update:
+                bus.set_message(value, self.name)
+                self.metrics.recordWrite(bus)
+
+
+class BusLog:
+    """
+    Reader for the bus logs written by Recorder. A log starts with a header (a magic string, the wall-clock
+    time at which recording started, and the names of the recorded buses), followed by one record per bus
+    write: the time of the write in seconds since recording started, the index of the bus, and the length of
+    the message, followed by the message in the encoding used by the bridges (see encodeMessage). The file is
+    memory-mapped, and records are only decoded when they are read, so large logs can be indexed and played
+    back without loading them into memory
+    """
+
+    magic = b'RRBAG01\n'
+    header = struct.Struct('!dI')
+    record_header = struct.Struct('!dHI')
+
+    def __init__(self, filename):
+
+        self.filename = filename
+
+        with open(filename, 'rb') as log_file:
+            if os.fstat(log_file.fileno()).st_size > 0:
+                self.data = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = b''
+
+        if self.data[:len(self.magic)] != self.magic:
+            raise ValueError("{0:s} is not a RossROS bus log".format(filename))
+
+        # Read the header
+        offset = len(self.magic)
+        self.start_time, n_buses = self.header.unpack_from(self.data, offset)
+        offset += self.header.size
+        self.bus_names = []
+        for _ in range(n_buses):
+            bus_name, offset = decodeValue(self.data, offset)
+            self.bus_names.append(bus_name)
+
+        # Index the records by scanning their headers (ignoring a final record that was only partly written)
+        self.offsets = []
+        while offset + self.record_header.size <= len(self.data):
+            length = self.record_header.unpack_from(self.data, offset)[2]
+            if offset + self.record_header.size + length > len(self.data):
+                break
+            self.offsets.append(offset)
+            offset += self.record_header.size + length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, idx):
+
+        # Return the time, bus name and message of a record
+        timestamp, bus_idx, message = self.readRecord(idx)
+
+        return timestamp, self.bus_names[bus_idx], message
+
+    def readRecord(self, idx):
+
+        # Return the time, bus index and message of a record
+        offset = self.offsets[idx]
+        timestamp, bus_idx, _length = self.record_header.unpack_from(self.data, offset)
+        message = decodeValue(self.data, offset + self.record_header.size)[0]
+
+        return timestamp, bus_idx, message
+
+    def timestamp(self, idx):
+
+        # Return the time of a record without decoding its message
+        return self.record_header.unpack_from(self.data, self.offsets[idx])[0]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+class Recorder(Consumer):
+    """
+    Recorder is a consumer that logs every write to a set of buses to a file that can be read with BusLog and
+    played back with Replayer. Writes are captured by listeners on the buses, which only add the message and
+    the time to a queue, so recording costs the writers very little; a background thread encodes the queued
+    writes and appends them to the file. The recorder's own loop wakes the background thread every "delay"
+    seconds, and waits for it to write out the remaining messages when the recorder shuts down. Only writes
+    made in the recorder's own process are captured
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create recorder")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating recorder")
+    @log_on_end(DEBUG, "{name:s}: Finished creating recorder")
+    def __init__(self,
+                 buses,  # bus or tuple of buses to record
+                 filename,  # file to write the log to (any existing file is replaced)
+                 delay=0.1,  # how many seconds to wait between writes to the file
+                 termination_buses=placeholderBus(False, "Default recorder termination bus"),
+                 name="Unnamed recorder"):
+
+        super().__init__(
+            self.record,  # Recorder class defines its own recording function
+            buses,
+            delay,
+            termination_buses,
+            name)
+
+        self.filename = filename
+
+        # Writes captured by the listeners, as (time, bus index, message) entries, and the number recorded
+        self.pending = collections.deque()
+        self.record_count = 0
+
+        # The listeners only queue writes while the recorder is running
+        self.recording = False
+        self.recording_start = None
+        for idx, bus in enumerate(self.input_buses):
+            bus.add_write_listener(functools.partial(self.captureWrite, idx))
+
+        # Background thread that writes the queued messages to the file, and the events used to wake it and to
+        # tell it to finish
+        self.writer_thread = None
+        self.flush_request = threading.Event()
+        self.stop_request = threading.Event()
+
+    def captureWrite(self, idx, message):
+
+        # Called by a recorded bus with every message written to it. Views of ArrayBus buffers are copied, because
+        # the buffer can be reused before the background thread encodes it
+        if self.recording:
+            if isinstance(self.input_buses[idx], ArrayBus):
+                message = np.array(message)
+            self.pending.append((time.monotonic() - self.recording_start, idx, message))
+
+    # The recorder does not read the buses in its loop, as the listeners capture every write
+    def collectbusesToValues(self, buses):
+        return []
+
+    def startSchedule(self):
+
+        # Start a new log, and start capturing writes
+        self.stop_request.clear()
+        self.flush_request.clear()
+        self.pending.clear()
+        self.record_count = 0
+        self.recording_start = time.monotonic()
+
+        log_file = open(self.filename, 'wb')
+        log_file.write(BusLog.magic)
+        log_file.write(BusLog.header.pack(time.time(), len(self.input_buses)))
+        for bus in self.input_buses:
+            log_file.write(encodeMessage(bus.name))
+
+        self.writer_thread = threading.Thread(target=self.writeLog, args=(log_file,),
+                                              name="{0:s} writer".format(self.name))
+        self.writer_thread.start()
+        self.recording = True
+
+        super().startSchedule()
+
+    def record(self):
+
+        # Have the background thread write out the queued messages
+        self.flush_request.set()
+
+    def stopSchedule(self):
+
+        # When the recorder shuts down (or its loop fails), stop capturing writes and wait for the queue to be
+        # written out
+        self.close()
+
+        super().stopSchedule()
+
+    def close(self):
+
+        self.recording = False
+        if self.writer_thread is not None:
+            self.stop_request.set()
+            self.flush_request.set()
+            self.writer_thread.join()
+            self.writer_thread = None
+
+    def writeLog(self, log_file):
+
+        with log_file:
+            while True:
+                self.flush_request.wait()
+                self.flush_request.clear()
+                stopping = self.stop_request.is_set()
+
+                # Encode the queued writes in a single batch
+                parts = []
+                while self.pending:
+                    timestamp, idx, message = self.pending.popleft()
+                    try:
+                        data = encodeMessage(message)
+                    except ValueError as error:
+                        logging.warning("{0:s}: not recording a message on {1:s} ({2!s})".format(
+                            self.name, self.input_buses[idx].name, error))
+                        continue
+                    parts.append(BusLog.record_header.pack(timestamp, idx, len(data)))
+                    parts.append(data)
+                    self.record_count += 1
+
+                log_file.write(b''.join(parts))
+                log_file.flush()
+
+                if stopping:
+                    break
+
+
+class Replayer(Producer):
+    """
+    Replayer is a producer that plays a log written by Recorder back into a set of buses, matching the buses by
+    name. With speed=1 (the default) the writes are replayed in real time, with the same spacing as when they
+    were recorded (other speeds scale the playback rate); with speed=None they are replayed as fast as possible,
+    one write per cycle, for offline regression runs. When the whole log has been played, the replayer writes
+    True to its end buses (which can be the termination bus, to shut the system down)
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create replayer")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating replayer")
+    @log_on_end(DEBUG, "{name:s}: Finished creating replayer")
+    def __init__(self,
+                 buses,  # bus or tuple of buses to play the log into (buses not in the log are left alone)
+                 filename,  # log file written by a Recorder
+                 termination_buses=placeholderBus(False, "Default replayer termination bus"),
+                 name="Unnamed replayer",
+                 speed=1.0,  # playback speed relative to real time, or None to play as fast as possible
+                 end_buses=(),  # buses to write True to when the log has been played
+                 execution=None,
+                 priority=None):
+
+        if speed is not None and speed <= 0:
+            raise ValueError("{0:s}: speed must be positive (or None to play as fast as possible)".format(name))
+
+        super().__init__(
+            self.replay,  # Replayer class defines its own replaying function
+            buses,
+            0,
+            termination_buses,
+            name,
+            False,
+            execution,
+            priority)
+
+        self.log = BusLog(filename)
+        self.speed = speed
+        self.end_buses = ensureTuple(end_buses)
+
+        # Map the buses in the log to the buses to play them into
+        bus_indices = {bus.name: idx for idx, bus in enumerate(self.output_buses)}
+        self.log_bus_indices = [bus_indices.get(bus_name) for bus_name in self.log.bus_names]
+
+        # Position of the next record to play, and the monotonic time at which playback started
+        self.position = 0
+        self.playback_start = None
+
+    def startSchedule(self):
+
+        # Start playing from the beginning of the log
+        self.position = 0
+        self.playback_start = time.monotonic()
+
+        super().startSchedule()
+
+    def recordDueTime(self, idx):
+
+        # Monotonic time at which a record should be played
+        return self.playback_start + self.log.timestamp(idx) / self.speed
+
+    def replay(self):
+
+        # Collect the records that are due (just the next one when playing as fast as possible)
+        if self.speed is None:
+            end = min(self.position + 1, len(self.log))
+        else:
+            now = time.monotonic()
+            end = self.position
+            while end < len(self.log) and self.recordDueTime(end) <= now:
+                end += 1
+
+        writes = []
+        for idx in range(self.position, end):
+            _timestamp, log_bus_idx, message = self.log.readRecord(idx)
+            bus_idx = self.log_bus_indices[log_bus_idx]
+            if bus_idx is not None:
+                writes.append((bus_idx, message))
+        self.position = end
+
+        return writes
+
+    # Write each replayed message to its bus, in the order they were recorded
+    @log_on_start(DEBUG, "{self.name:s}: Starting dealing replayed messages into buses")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while dealing replayed messages into buses")
+    @log_on_end(DEBUG, "{self.name:s}: Finished dealing replayed messages into buses")
+    def dealValuesTobuses(self, values, buses):
+
+        # Wrap buses in a tuple if it isn't one already
+        buses = ensureTuple(buses)
+
+        for bus_idx, message in values:
+            buses[bus_idx].set_message(message, self.name)
+            self.metrics.recordWrite(buses[bus_idx])
+
+        # Signal the end of the log once
+        if self.position == len(self.log) and self.playback_start is not None:
+            self.playback_start = None
+            for bus in self.end_buses:
+                bus.set_message(True, self.name)
+
+    def timeUntilNextCycle(self):
+
+        # Sleep until the next record is due (or, once the log is finished, until the replayer is shut down)
+        if self.playback_start is None:
+            return 0.1
+        elif self.speed is None or self.position >= len(self.log):
+            return 0
+        else:
+            return max(0.0, self.recordDueTime(self.position) - time.monotonic())
+
+
+class CyclicExecutive:
+    """
+    Class that runs a set of ConsumerProducers in a single thread, instead of giving each one its own
+    thread. Each node's next cycle is kept in a heap of deadlines, and the executive sleeps until the
+    earliest one. When several nodes are due at once, they run in rate-monotonic order: by priority
+    if the node has one, and otherwise by delay, so that faster loops go first. Nodes run their usual
+    cycle (termination check, input collection, function call and output dealing), so their functions
+    do not need to change, but a cycle that takes a long time delays every other node
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create cyclic executive")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating cyclic executive")
+    @log_on_end(DEBUG, "{name:s}: Finished creating cyclic executive")
+    def __init__(self,
+                 producer_consumer_list,
+                 name="Cyclic executive"):
+
+        self.producer_consumer_list = list(producer_consumer_list)
+        self.name = name
+
+        # Rank the nodes: explicit priorities first, then by delay, then in list order
+        self.ranks = []
+        for idx, cp in enumerate(self.producer_consumer_list):
+            if cp.priority is None:
+                self.ranks.append((1, cp.delay, idx))
+            else:
+                self.ranks.append((0, cp.priority, idx))
+
+        # Writes to the buses watched by triggered nodes, and termination of any node, wake the executive early.
+        # Woken nodes holds the indices of the nodes asked to start their next cycle straight away (see wakeUp)
+        self.wakeup = threading.Condition()
+        self.woken = False
+        self.woken_nodes = set()
+
+    def notifyWakeup(self):
+
+        # Called by the buses after every write
+        with self.wakeup:
+            self.woken = True
+            self.wakeup.notify_all()
+
+    def notifyNodeWakeup(self, idx):
+
+        # Called when a node is woken early
+        with self.wakeup:
+            self.woken_nodes.add(idx)
+            self.woken = True
+            self.wakeup.notify_all()
+
+    def sleep(self, timeout):
+
+        # Sleep until the timeout runs out (or forever, if it is None), or until a watched bus is written
+        with self.wakeup:
+            if not self.woken:
+                self.wakeup.wait(timeout)
+            self.woken = False
+
+    def startNodes(self):
+
+        nodes = self.producer_consumer_list
+
+        # Every node is due straight away. Deadlines holds (deadline, index) for the nodes that are sleeping,
+        # ready holds (rank, index) for the nodes that are due, and waiting holds the indices of triggered nodes
+        # that are waiting for new input data
+        self.deadlines = []
+        self.ready = []
+        self.waiting = set()
+        for idx, cp in enumerate(nodes):
+            cp.startSchedule()
+            heapq.heappush(self.ready, (self.ranks[idx], idx))
+
+            if cp.trigger:
+                for bus in cp.input_buses:
+                    bus.add_listener(self.notifyWakeup)
+
+            # Termination wakes the executive, so that sleeping nodes shut down straight away, and so does waking
+            # a node early
+            cp.termination_callbacks.append(self.notifyWakeup)
+            cp.wake_callbacks.append(functools.partial(self.notifyNodeWakeup, idx))
+
+    def stopNodes(self):
+
+        # Release whatever the nodes set up in startSchedule, once they have all finished (or one has failed)
+        for cp in self.producer_consumer_list:
+            cp.stopSchedule()
+
+    def takeReadyNode(self):
+
+        nodes = self.producer_consumer_list
+        now = time.monotonic()
+
+        # Nodes that have been told to shut down become due straight away, without waiting for their
+        # deadlines, so that they see the termination and leave the schedule
+        if any(nodes[idx].termination_event.is_set() for _deadline, idx in self.deadlines):
+            for deadline, idx in self.deadlines:
+                if nodes[idx].termination_event.is_set():
+                    heapq.heappush(self.ready, (self.ranks[idx], idx))
+            self.deadlines = [(deadline, idx) for deadline, idx in self.deadlines
+                              if not nodes[idx].termination_event.is_set()]
+            heapq.heapify(self.deadlines)
+
+        # Nodes that have been woken early become due straight away too (a node that is running or waiting for
+        # its inputs works out its schedule when it next leaves the schedule anyway)
+        with self.wakeup:
+            woken_nodes, self.woken_nodes = self.woken_nodes, set()
+        if woken_nodes:
+            for deadline, idx in self.deadlines:
+                if idx in woken_nodes:
+                    heapq.heappush(self.ready, (self.ranks[idx], idx))
+            self.deadlines = [(deadline, idx) for deadline, idx in self.deadlines if idx not in woken_nodes]
+            heapq.heapify(self.deadlines)
+
+        # Triggered nodes whose inputs have been written (or that have been told to shut down) become due
+        for idx in list(self.waiting):
+            if nodes[idx].triggerReady():
+                nodes[idx].acknowledgeInputs()
+                self.waiting.discard(idx)
+                heapq.heappush(self.ready, (self.ranks[idx], idx))
+
+        # Nodes whose deadlines have passed become due
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _deadline, idx = heapq.heappop(self.deadlines)
+
+            # A triggered node that has finished its minimum period still has to wait for its inputs
+            if nodes[idx].trigger and not nodes[idx].triggerReady():
+                self.waiting.add(idx)
+            else:
+                if nodes[idx].trigger:
+                    nodes[idx].acknowledgeInputs()
+                heapq.heappush(self.ready, (self.ranks[idx], idx))
+
+        # If nothing is due, sleep until the next deadline (or until a watched bus is written)
+        if not self.ready:
+            if self.deadlines:
+                self.sleep(self.deadlines[0][0] - now)
+            else:
+                self.sleep(None)
+            return None
+
+        # Hand out the highest-priority node that is due
+        return heapq.heappop(self.ready)[1]
+
+    @staticmethod
+    def runCycle(cp):
+
+        # Check if the node should terminate (it is then dropped from the schedule, which is shown by returning
+        # None instead of the time of its next cycle)
+        if cp.checkTerminationbuses():
+            return None
+
+        # Collect all of the values from the input buses into a list
+        input_values = cp.collectbusesToValues(cp.input_buses)
+
+        # Get the output value or tuple of values corresponding to the inputs
+        output_values = cp.callFunction(input_values)
+
+        # Deal the values into the output buses
+        cp.dealValuesTobuses(output_values, cp.output_buses)
+
+        # The next cycle is due when the node would have finished its pause
+        return time.monotonic() + cp.timeUntilNextCycle()
+
+    @log_on_start(DEBUG, "{self.name:s}: Starting cyclic executive")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while executing cyclic executive")
+    @log_on_end(DEBUG, "{self.name:s}: Closing down cyclic executive")
+    def __call__(self):
+
+        self.startNodes()
+
+        try:
+            while self.deadlines or self.ready or self.waiting:
+
+                # Run one cycle of the highest-priority node that is due, and schedule its next cycle
+                idx = self.takeReadyNode()
+                if idx is None:
+                    continue
+
+                next_cycle = self.runCycle(self.producer_consumer_list[idx])
+                if next_cycle is not None:
+                    heapq.heappush(self.deadlines, (next_cycle, idx))
+        finally:
+            self.stopNodes()
+
+
+class WorkerPool(CyclicExecutive):
+    """
+    Class that multiplexes a set of ConsumerProducers onto a small, fixed pool of worker threads, so that a
+    graph with many (mostly sleeping) nodes does not need a thread for each one. The nodes are scheduled as in
+    CyclicExecutive, but the deadlines and the queue of due nodes are shared by all of the workers: each worker
+    takes the highest-priority node that is due, runs one cycle of it, and puts it back into the schedule. A node
+    is never run by two workers at once, so node functions see the same one-cycle-at-a-time behavior as under the
+    other backends. If a node raises an exception, the whole pool stops and the exception is re-raised
+    """
+
+    @log_on_start(DEBUG, "{name:s}: Starting to create worker pool")
+    @log_on_error(DEBUG, "{name:s}: Encountered an error while creating worker pool")
+    @log_on_end(DEBUG, "{name:s}: Finished creating worker pool")
+    def __init__(self,
+                 producer_consumer_list,
+                 workers=4,  # number of worker threads
+                 name="Worker pool"):
+
+        if workers < 1:
+            raise ValueError("{0:s}: a worker pool needs at least one worker, not {1:d}".format(name, workers))
+
+        super().__init__(producer_consumer_list, name)
+
+        # The wakeup condition doubles as the lock on the schedule. Running counts the nodes that workers are in
+        # the middle of, and error holds the first exception raised by a node
+        self.workers = workers
+        self.running = 0
+        self.error = None
+
+        # Profiler for the worker threads, if the pool is being profiled (see Profiler)
+        self.profiler = None
+
+    def workerLoop(self):
+
+        nodes = self.producer_consumer_list
+
+        while True:
+
+            # Take the next node that is due, sleeping until there is one. Once no node is scheduled or running,
+            # the work is done
+            with self.wakeup:
+                idx = None
+                while idx is None:
+                    if self.error is not None or not (self.deadlines or self.ready or self.waiting or self.running):
+                        self.wakeup.notify_all()
+                        return
+                    idx = self.takeReadyNode()
+                self.running += 1
+
+                # Let another worker pick up any other node that is due
+                if self.ready:
+                    self.wakeup.notify()
+
+            # Run the cycle outside the lock, so that the other workers can run other nodes at the same time
+            try:
+                next_cycle = self.runCycle(nodes[idx])
+            except BaseException as error:
+                next_cycle = None
+                with self.wakeup:
+                    if self.error is None:
+                        self.error = error
+
+            # Put the node back into the schedule, and wake the sleeping workers, as its deadline may be earlier
+            # than the one they are waiting for
+            with self.wakeup:
+                self.running -= 1
+                if next_cycle is not None:
+                    heapq.heappush(self.deadlines, (next_cycle, idx))
+                self.woken = True
+                self.wakeup.notify_all()
+
+    @log_on_start(DEBUG, "{self.name:s}: Starting worker pool")
+    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while executing worker pool")
+    @log_on_end(DEBUG, "{self.name:s}: Closing down worker pool")
+    def __call__(self):
+
+        self.running = 0
+        self.error = None
+        with self.wakeup:
+            self.startNodes()
+
+        # Run the workers (each profiled on its own, if the pool is being profiled), and wait for them to run out
+        # of nodes
+        worker_threads = []
+        for idx in range(min(self.workers, len(self.producer_consumer_list))):
+            worker_name = "{0:s} worker {1:d}".format(self.name, idx)
+            if self.profiler is None:
+                worker_loop = self.workerLoop
+            else:
+                worker_loop = functools.partial(self.profiler.profileCall, self.workerLoop,
+                                                self.profiler.label(worker_name))
+            worker_threads.append(threading.Thread(target=worker_loop, name=worker_name))
+        try:
+            for worker_thread in worker_threads:
+                worker_thread.start()
+            for worker_thread in worker_threads:
+                worker_thread.join()
+        finally:
+            self.stopNodes()
+
+        if self.error is not None:
+            raise self.error
+
+
+class FusedChain(ConsumerProducer):
+    """
+    Consumer-producer that runs a chain of consumer-producers as a single node (see DataflowGraph). Each cycle
+    reads the input buses of the first stage, calls the stage functions in turn, handing each stage the values
+    that the stage before it would have written to the buses between them, and writes the output buses of the
+    last stage. The buses between the stages are not written. The fused node takes its timing, termination
+    buses and execution settings from the first stage, and each stage's metrics still count its own function
+    calls
+    """
+
+    @log_on_start(DEBUG, "Starting to create fused chain")
+    @log_on_error(DEBUG, "Encountered an error while creating fused chain")
+    @log_on_end(DEBUG, "Finished creating fused chain")
+    def __init__(self,
+                 stages,  # consumer-producers to run, in order; each reads exactly the buses the one before writes
+                 name=None):  # name of the fused node (None joins the names of the stages)
+
+        stages = tuple(stages)
+        head = stages[0]
+        tail = stages[-1]
+
+        if name is None:
+            name = " -> ".join(stage.name for stage in stages)
+
+        super().__init__(
+            self.runChain,  # FusedChain class defines its own chain function
+            head.input_buses,
+            tail.output_buses,
+            head.delay,
+            head.termination_buses,
+            name,
+            head.fixed_rate,
+            head.trigger,
+            head.execution,
+            head.priority,
+            head.cpu_affinity,
+            head.nice,
+            head.realtime_priority,
+            head.skip_unchanged)
+
+        self.stages = stages
+
+        # For each stage after the first, the positions of its input buses among the output buses of the stage
+        # before it
+        self.input_positions = [tuple(previous.output_buses.index(bus) for bus in stage.input_buses)
+                                for previous, stage in zip(stages, stages[1:])]
+
+    def runChain(self, *input_values):
+
+        values = input_values
+        for idx, stage in enumerate(self.stages):
+
+            # Pick out the outputs of the previous stage that this stage reads
+            if idx > 0:
+                values = [outputs[position] for position in self.input_positions[idx - 1]]
+
+            cycle_start = time.perf_counter()
+            output_values = stage.consumer_producer_function(*values)
+            stage.metrics.recordCycle(cycle_start, time.perf_counter() - cycle_start)
+
+            # Spread the outputs over the stage's output buses, as dealValuesTobuses would
+            outputs = spreadValues(output_values, len(stage.output_buses))
+
+        # The last stage's outputs are dealt into its buses as usual
+        return output_values
+
+
+class DataflowGraph:
+    """
+    Dataflow view of a list of consumer-producers, built from the buses that each node reads and writes. It
+    finds buses that are written but never read (or read but never written), cycles of nodes that feed each
+    other, and chains of nodes that can be fused into a single FusedChain node, so that values pass directly
+    from stage to stage instead of through a bus write, a pause and a thread switch at every step. compile()
+    returns a node list for runConcurrently in which each such chain is replaced by its fused node.
+
+    A node can be fused onto the node before it when every bus the earlier node writes is read only by the later
+    one, every bus the later node reads is written only by the earlier one, and the later node runs whenever
+    the earlier one does (it is triggered, with a minimum period no longer than the earlier node's delay, or both
+    nodes poll with the same delay). The two nodes must also have the same termination buses, execution backend,
+    scheduling settings and skip-if-unchanged mode, must not customise the consumer-producer loop, and must not
+    have coroutine functions. Buses read as termination buses count as read, so a bus that anything watches is
+    never skipped
+    """
+
+    # Class used to build the fused nodes
+    chain_class = FusedChain
+
+    def __init__(self, producer_consumer_list):
+
+        self.nodes = list(producer_consumer_list)
+
+        # The nodes that write each bus, read it as an input, and watch it as a termination bus
+        self.writers = {}
+        self.readers = {}
+        self.watchers = {}
+        for cp in self.nodes:
+            for bus in dict.fromkeys(self.nodeOutputs(cp)):
+                self.writers.setdefault(bus, []).append(cp)
+            for bus in dict.fromkeys(self.nodeInputs(cp)):
+                self.readers.setdefault(bus, []).append(cp)
+            for bus in dict.fromkeys(cp.termination_buses):
+                self.watchers.setdefault(bus, []).append(cp)
+
+        # The nodes that read each node's outputs, and the nodes whose outputs each node reads
+        self.downstream = {cp: [] for cp in self.nodes}
+        self.upstream = {cp: [] for cp in self.nodes}
+        for bus, writers in self.writers.items():
+            for writer in writers:
+                for reader in self.readers.get(bus, ()):
+                    if reader not in self.downstream[writer]:
+                        self.downstream[writer].append(reader)
+                        self.upstream[reader].append(writer)
+
+    @staticmethod
+    def nodeInputs(cp):
+
+        # Producers only have a placeholder input bus
+        if isinstance(cp, Producer):
+            return ()
+        return cp.input_buses
+
+    @staticmethod
+    def nodeOutputs(cp):
+
+        # Consumers only have a placeholder output bus
+        if isinstance(cp, Consumer):
+            return ()
+        return cp.output_buses
+
+    def findDeadBuses(self):
+
+        # Buses that some node writes but no node reads or watches, and buses that some node reads but no node
+        # writes (so that their readers only ever see the initial message). Placeholders for bus arguments that
+        # were not given are left out, as nothing is meant to use them
+        unread = [bus for bus in self.writers
+                  if bus not in self.readers and bus not in self.watchers and not bus.placeholder]
+        unwritten = [bus for bus in self.readers if bus not in self.writers and not bus.placeholder]
+
+        return unread, unwritten
+
+    def findCycles(self):
+
+        # Find the strongly connected components of the node graph (with Tarjan's algorithm, iteratively), keeping
+        # those in which the nodes feed each other, or a node feeds itself
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        cycles = []
+
+        for root in self.nodes:
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                cp, child_idx = work.pop()
+                if child_idx == 0:
+                    index[cp] = lowlink[cp] = len(index)
+                    stack.append(cp)
+                    on_stack.add(cp)
+                children = self.downstream[cp]
+                if child_idx < len(children):
+                    work.append((cp, child_idx + 1))
+                    child = children[child_idx]
+                    if child not in index:
+                        work.append((child, 0))
+                    elif child in on_stack:
+                        lowlink[cp] = min(lowlink[cp], index[child])
+                    continue
+
+                # All of the node's children have been visited
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[cp])
+                if lowlink[cp] == index[cp]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member is cp:
+                            break
+                    if len(component) > 1 or cp in self.downstream[cp]:
+                        cycles.append([member for member in self.nodes if member in component])
+
+        return cycles
+
+    def isFusable(self, cp):
+
+        # Only nodes that run the standard consumer-producer loop on an ordinary function can be fused
+        if not isinstance(cp, ConsumerProducer):
+            return False
+        for method_name in ConsumerProducer.fast_method_names:
+            if getattr(type(cp), method_name) is not getattr(ConsumerProducer, method_name):
+                return False
+
+        return not inspect.iscoroutinefunction(cp.userFunction())
+
+    def canFuse(self, first, second):
+
+        # The two nodes must only talk to each other
+        if self.downstream[first] != [second] or self.upstream[second] != [first]:
+            return False
+        if set(first.output_buses) != set(second.input_buses):
+            return False
+        for bus in first.output_buses:
+            if self.readers[bus] != [second] or self.writers[bus] != [first] or bus in self.watchers:
+                return False
+
+        if not (self.isFusable(first) and self.isFusable(second)):
+            return False
+
+        # The second node must run once for every cycle of the first
+        if second.trigger:
+            if second.delay > first.delay:
+                return False
+        elif first.trigger or second.delay != first.delay:
+            return False
+
+        # And the nodes must stop, and be run, in the same way
+        return (set(first.termination_buses) == set(second.termination_buses)
+                and first.execution == second.execution
+                and first.cpu_affinity == second.cpu_affinity
+                and first.nice == second.nice
+                and first.realtime_priority == second.realtime_priority
+                and first.skip_unchanged == second.skip_unchanged)
+
+    def findChains(self):
+
+        # Start a chain at each node that cannot be fused onto the node before it, and extend it as far as the
+        # nodes after it can be fused on
+        chains = []
+        for cp in self.nodes:
+            if len(self.upstream[cp]) == 1 and self.canFuse(self.upstream[cp][0], cp):
+                continue
+            chain = [cp]
+            while len(self.downstream[chain[-1]]) == 1 and self.canFuse(chain[-1], self.downstream[chain[-1]][0]):
+                chain.append(self.downstream[chain[-1]][0])
+            if len(chain) > 1:
+                chains.append(chain)
+
+        return chains
+
+    def compile(self):
+
+        # Replace each fusable chain by its fused node, placed where the chain's first node was
+        fused = {}
+        for chain in self.findChains():
+            fused_node = self.chain_class(chain)
+            for cp in chain:
+                fused[cp] = fused_node
+
+        producer_consumer_list = []
+        for cp in self.nodes:
+            if cp not in fused:
+                producer_consumer_list.append(cp)
+            elif fused[cp].stages[0] is cp:
+                producer_consumer_list.append(fused[cp])
+
+        return producer_consumer_list
+
+    def report(self):
+
+        # Describe the fusable chains, cycles and dead buses, one per line
+        lines = []
+        for chain in self.findChains():
+            lines.append("Fusable chain: {0:s}".format(" -> ".join(cp.name for cp in chain)))
+        for cycle in self.findCycles():
+            lines.append("Cycle: {0:s}".format(", ".join(cp.name for cp in cycle)))
+        unread, unwritten = self.findDeadBuses()
+        for bus in unread:
+            lines.append("Dead bus: {0:s} is written by {1:s} but never read".format(
+                bus.name, ", ".join(cp.name for cp in self.writers[bus])))
+        for bus in unwritten:
+            lines.append("Dead bus: {0:s} is read by {1:s} but never written".format(
+                bus.name, ", ".join(cp.name for cp in self.readers[bus])))
+
+        return "\n".join(lines)
+
+
+class ProfileSession:
+    """
+    Profile of one node (see Profiler). The node is profiled while the session is resumed: for a node with its
+    own thread, for the whole of its run, and for an asyncio task, for each step of the task. close() writes the
+    profile to the node's file
+    """
+
+    def __init__(self, profiler, label, path):
+
+        self.profiler = profiler
+        self.label = label
+        self.path = path
+
+        # Deterministic sessions use cProfile; sampling sessions count the stacks seen by the profiler's sampler
+        self.thread_id = None
+        self.samples = collections.Counter()
+        if profiler.mode == 'trace':
+            self.profile = cProfile.Profile()
+        else:
+            self.profile = None
+
+    def resume(self):
+
+        if self.profiler.mode == 'sample':
+            self.thread_id = threading.get_ident()
+            self.profiler.startSampling(self)
+        elif self.profile is not None:
+            # Only one cProfile profiler can be active at a time in some Python versions
+            try:
+                self.profile.enable()
+            except ValueError as error:
+                logging.warning("{0:s}: could not profile this node ({1!s}); try profile='sample'".format(
+                    self.label, error))
+                self.profile = None
+
+    def pause(self):
+
+        if self.profiler.mode == 'sample':
+            self.profiler.stopSampling(self)
+        elif self.profile is not None:
+            self.profile.disable()
+
+    def close(self):
+
+        if self.profiler.mode == 'sample':
+            with self.profiler.sampling_lock:
+                samples = sorted(self.samples.items())
+            with open(self.path, 'w') as profile_file:
+                for stack, count in samples:
+                    profile_file.write("{0:s} {1:d}\n".format(stack, count))
+        elif self.profile is not None:
+            self.profile.dump_stats(self.path)
+
+
+class Profiler:
+    """
+    Class that profiles each of the nodes run by runConcurrently separately, covering everything done in the
+    node's thread (or in its asyncio task): the node function, and RossROS's own work such as bus locking and
+    logging decorators. In "trace" mode, each node is profiled with cProfile, and its statistics are written to
+    "<node name>.prof" in the profile directory (readable with pstats or snakeviz). In "sample" mode, which costs
+    far less and suits long field runs, a background thread records the stack of each node every sample_interval
+    seconds, and the counts of each stack are written to "<node name>.folded" (the collapsed-stack format read by
+    flame graph tools). The sampler needs the GIL to take a sample, so calls much shorter than the interpreter's
+    switch interval are under-counted. summarize() merges the profiles of all of the nodes into summary files.
+    From Python 3.12, cProfile can no longer trace threads separately, so runConcurrently samples instead of
+    tracing when more than one thread would be profiled
+    """
+
+    # Whether cProfile can trace each thread on its own. From Python 3.12 it is built on sys.monitoring, which
+    # covers the whole interpreter: only one profiler can be enabled at a time, and it sees every thread
+    per_thread_traces = sys.version_info < (3, 12)
+
+    @log_on_start(DEBUG, "Starting to create profiler")
+    @log_on_error(DEBUG, "Encountered an error while creating profiler")
+    @log_on_end(DEBUG, "Finished creating profiler")
+    def __init__(self,
+                 mode='trace',  # "trace" for cProfile, or "sample" for the sampling profiler
+                 directory='profiles',  # directory to write the profiles to
+                 sample_interval=0.005):  # seconds between samples in "sample" mode
+
+        if mode not in ('trace', 'sample'):
+            raise ValueError("Profiler: mode must be 'trace' or 'sample', not {0!r}".format(mode))
+
+        self.mode = mode
+        self.directory = directory
+        self.sample_interval = sample_interval
+        os.makedirs(directory, exist_ok=True)
+
+        # Labels of the profiled nodes (their names, made unique), and the file each one is written to
+        self.paths = {}
+
+        # Sessions being sampled, and the sampler thread (started when a session is first sampled in a process)
+        self.sampling = set()
+        self.sampling_lock = threading.Lock()
+        self.sampler_thread = None
+        self.sampler_stop = threading.Event()
+
+    def label(self, name):
+
+        # Reserve a profile file for a node, numbering nodes that share a name
+        label = name
+        count = 1
+        while label in self.paths:
+            count += 1
+            label = "{0:s} ({1:d})".format(name, count)
+
+        extension = '.prof' if self.mode == 'trace' else '.folded'
+        self.paths[label] = os.path.join(self.directory, re.sub(r'[^\w.-]+', '_', label) + extension)
+
+        return label
+
+    def openSession(self, label):
+        return ProfileSession(self, label, self.paths[label])
+
+    def profileCall(self, function, label):
+
+        # Profile a whole call in the current thread, and write out its profile
+        session = self.openSession(label)
+        session.resume()
+        try:
+            return function()
+        finally:
+            session.pause()
+            session.close()
+
+    def startSampling(self, session):
+
+        with self.sampling_lock:
+            self.sampling.add(session)
+
+            # Threads do not survive a fork, so each process starts its own sampler
+            if self.sampler_thread is None or not self.sampler_thread.is_alive():
+                self.sampler_thread = threading.Thread(target=self.sampleLoop, name="Profiler sampler",
+                                                       daemon=True)
+                self.sampler_thread.start()
+
+    def stopSampling(self, session):
+
+        with self.sampling_lock:
+            self.sampling.discard(session)
+
+    def sampleLoop(self):
+
+        while not self.sampler_stop.wait(self.sample_interval):
+            frames = sys._current_frames()
+
+            # Record the stack of each session's thread, from the outermost call inwards
+            with self.sampling_lock:
+                for session in self.sampling:
+                    frame = frames.get(session.thread_id)
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append("{0:s} ({1:s}:{2:d})".format(
+                            code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                        frame = frame.f_back
+                    if stack:
+                        session.samples[";".join(reversed(stack))] += 1
+
+    @log_on_start(DEBUG, "Starting to summarize profiles")
+    @log_on_error(DEBUG, "Encountered an error while summarizing profiles")
+    @log_on_end(DEBUG, "Finished summarizing profiles")
+    def summarize(self):
+
+        # Merge the profiles of the nodes that ran, returning the name of the summary text file
+        self.sampler_stop.set()
+        profiles = [(label, path) for label, path in self.paths.items() if os.path.exists(path)]
+        summary_path = os.path.join(self.directory, 'summary.txt')
+
+        with open(summary_path, 'w') as summary_file:
+            if self.mode == 'trace':
+                self.summarizeTraces(profiles, summary_file)
+            else:
+                self.summarizeSamples(profiles, summary_file)
+
+        return summary_path
+
+    def summarizeTraces(self, profiles, summary_file):
+
+        summary_file.write("{0:<40s}{1:>12s}{2:>12s}\n".format("node", "time (s)", "calls"))
+        for label, path in profiles:
+            stats = pstats.Stats(path)
+            summary_file.write("{0:<40s}{1:>12.3f}{2:>12d}\n".format(label[:39], stats.total_tt, stats.total_calls))
+        summary_file.write("\n")
+
+        if profiles:
+            stats = pstats.Stats(*[path for _label, path in profiles], stream=summary_file)
+            stats.dump_stats(os.path.join(self.directory, 'summary.prof'))
+            stats.sort_stats('cumulative').print_stats(30)
+
+    def summarizeSamples(self, profiles, summary_file):
+
+        # Read back the stack counts of each node, and add them up
+        merged = collections.Counter()
+        summary_file.write("{0:<40s}{1:>12s}{2:>12s}\n".format("node", "samples", "time (s)"))
+        for label, path in profiles:
+            node_samples = 0
+            with open(path) as profile_file:
+                for line in profile_file:
+                    stack, count = line.rstrip("\n").rsplit(" ", 1)
+                    merged[stack] += int(count)
+                    node_samples += int(count)
+            summary_file.write("{0:<40s}{1:>12d}{2:>12.3f}\n".format(
+                label[:39], node_samples, node_samples * self.sample_interval))
+
+        with open(os.path.join(self.directory, 'summary.folded'), 'w') as merged_file:
+            for stack, count in sorted(merged.items()):
+                merged_file.write("{0:s} {1:d}\n".format(stack, count))
+
+        # Count the samples in which each function was running (self) or on the stack (total)
+        self_counts = collections.Counter()
+        total_counts = collections.Counter()
+        for stack, count in merged.items():
+            functions = stack.split(";")
+            self_counts[functions[-1]] += count
+            for function in set(functions):
+                total_counts[function] += count
+
+        summary_file.write("\n{0:>10s}{1:>10s}  {2:s}\n".format("self", "total", "function"))
+        for function, count in self_counts.most_common(30):
+            summary_file.write("{0:>10d}{1:>10d}  {2:s}\n".format(count, total_counts[function], function))
+
+
+def collectMetrics(producer_consumer_list):
+    """
+    Function that gathers a metrics snapshot from each of a list of ConsumerProducers, keyed by
+    node name
+    """
+
+    return {cp.name: cp.getMetrics() for cp in producer_consumer_list}
+
+
+def runNode(consumer_producer, profiler=None, profile_label=None):
+    """
+    Function that applies a ConsumerProducer's scheduling settings to the thread or process it is
+    called in, and then runs the node, restarting it if it crashes and has a restart policy. If a
+    profiler is given, the whole run is profiled under the given label
+    """
+
+    if profiler is not None:
+        return profiler.profileCall(functools.partial(runNode, consumer_producer), profile_label)
+
+    # Executives and worker pools apply no settings of their own, and are not restarted
+    if not isinstance(consumer_producer, ConsumerProducer):
+        return consumer_producer()
+
+    consumer_producer.applySchedulingSettings()
+
+    # Run the node, restarting it after a pause if it crashes and has a restart policy (see Watchdog)
+    while True:
+        try:
+            return consumer_producer()
+        except Exception as error:
+            backoff = consumer_producer.recordCrash(error)
+            if backoff is None:
+                raise
+
+        # Give up on the restart if the node is told to shut down while it waits
+        if consumer_producer.termination_event.wait(backoff):
+            return None
+
+
+@log_on_start(DEBUG, "runConcurrently: Starting concurrent execution")
+@log_on_error(DEBUG, "runConcurrently: Encountered an error during concurrent execution")
+@log_on_end(DEBUG, "runConcurrently: Finished concurrent execution")
+def runConcurrently(producer_consumer_list,
+                    execution="thread",  # "thread", "process", "executive" or "pool": default execution backend
+                    metrics_bus=None,  # bus to publish a snapshot of the node metrics to
+                    metrics_delay=1.0,  # how many seconds to wait between metrics snapshots
+                    workers=4,  # number of worker threads shared by the "pool" nodes
+                    profile=False,  # True (or "trace") or "sample" to profile each node separately (see Profiler)
+                    profile_directory="profiles",  # directory to write the profiles to
+                    sample_interval=0.005):  # seconds between samples when profile="sample"
+    """
+    runConcurrently is aFunction that uses a concurrent.futures ThreadPoolExecutor to concurrently
+    execute a set of ConsumerProducer functions. Nodes whose execution backend is "process" (either
+    their own setting, or the graph-wide one passed here) are instead each run in a separate process,
+    so that CPU-heavy nodes do not compete for the GIL; these nodes must exchange data through
+    ProcessBuses. Nodes whose execution backend is "executive" all share a single thread, run by a
+    CyclicExecutive, and nodes whose execution backend is "pool" share a fixed number of worker threads,
+    run by a WorkerPool. If a metrics bus is given, a snapshot of the metrics of the thread, executive
+    and pool nodes (see collectMetrics) is written to it every metrics_delay seconds until all of the
+    nodes have finished (the metrics of process nodes stay in their own processes, and are not
+    published). If profiling is turned on, each thread or process node (and the executive thread, and
+    each pool worker) is profiled separately, and a merged summary is written once all of the nodes
+    have finished
+    """
+
+    if execution not in ('thread', 'process', 'executive', 'pool'):
+        raise ValueError("runConcurrently: execution must be 'thread', 'process', 'executive' or 'pool', not "
+                         "{0!r}".format(execution))
+
+    # The timers all share one timer service
+    producer_consumer_list = groupTimers(producer_consumer_list, TimerService)
+
+    # Sort the nodes by execution backend
+    thread_list = []
+    process_list = []
+    executive_list = []
+    pool_list = []
+    for cp in producer_consumer_list:
+        if (cp.execution or execution) == 'process':
+            process_list.append(cp)
+        elif (cp.execution or execution) == 'executive':
+            executive_list.append(cp)
+        elif (cp.execution or execution) == 'pool':
+            pool_list.append(cp)
+        else:
+            thread_list.append(cp)
+
+    # Scheduling settings are applied to the thread or process that runs a node, so they cannot be applied to
+    # nodes that share their threads
+    for cp in executive_list + pool_list:
+        if cp.hasSchedulingSettings():
+            logging.warning("runConcurrently: {0:s} shares its thread with other nodes, so its CPU affinity, "
+                            "nice value and real-time priority are not applied".format(cp.name))
+
+    # The executive nodes run together in one thread, and the pool nodes share the pool's workers (the pool
+    # itself waits for its workers in one more thread)
+    metrics_list = thread_list + executive_list + pool_list
+    if executive_list:
+        thread_list.append(CyclicExecutive(executive_list))
+    if pool_list:
+        thread_list.append(WorkerPool(pool_list, workers))
+
+    # Set up the profiler, reserving a profile for each node before any of them start. A worker pool profiles
+    # each of its workers instead of the thread that waits for them
+    profiler = None
+    profile_labels = {}
+    if profile:
+        profile_mode = 'trace' if profile is True else profile
+
+        # A trace that cannot be kept to its own thread would mix the work of every node into one profile, so
+        # sample the nodes instead if several threads are to be profiled
+        profiled_threads = sum(cp.workers if isinstance(cp, WorkerPool) else 1 for cp in thread_list)
+        if profile_mode == 'trace' and not Profiler.per_thread_traces and profiled_threads > 1:
+            logging.warning("runConcurrently: this version of Python cannot trace {0:d} threads separately, so "
+                            "the nodes are profiled by sampling instead".format(profiled_threads))
+            profile_mode = 'sample'
+
+        profiler = Profiler(profile_mode, profile_directory, sample_interval)
+        for cp in process_list + thread_list:
+            if isinstance(cp, WorkerPool):
+                cp.profiler = profiler
+            else:
+                profile_labels[cp] = profiler.label(cp.name)
+
+    # A regular bus is copied into each child process, so writes to it are not seen on the other side. Warn
+    # about any bus without process sharing that a process node shares with another node, and that some node
+    # writes to
+    written_buses = set()
+    for cp in producer_consumer_list:
+        written_buses.update(cp.output_buses)
+    for cp in process_list:
+        for bus in set(cp.input_buses + cp.output_buses + cp.termination_buses):
+            if bus.process_shared or bus not in written_buses:
+                continue
+            for other_cp in producer_consumer_list:
+                other_buses = other_cp.input_buses + other_cp.output_buses + other_cp.termination_buses
+                if other_cp is not cp and bus in other_buses:
+                    logging.warning("runConcurrently: {0:s} runs in its own process and shares {1:s} with {2:s}, "
+                                    "but {1:s} is not shared between processes".format(cp.name, bus.name,
+                                                                                       other_cp.name))
+                    break
+
+    # The metrics of a process node are kept in its own process, so they cannot be published from here
+    if metrics_bus is not None and process_list:
+        logging.warning("runConcurrently: {0:s} run in their own processes, so their metrics are not published "
+                        "to {1:s}".format(", ".join(cp.name for cp in process_list), metrics_bus.name))
+
+    # Start the process nodes first, so that they are not forked while the thread nodes are running
+    process_handles = []
+    for cp in process_list:
+        process_handle = process_context.Process(target=runNode, args=(cp, profiler, profile_labels.get(cp)),
+                                                 name=cp.name)
+        process_handle.start()
+        process_handles.append(process_handle)
+
+    # Create a list to hold the executors created from the provided functions
+    executor_list = []
+
+    if thread_list:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(thread_list) + 1) as executor:
+
+            # Loop over the list of provided functions, turning each into an executor for the thread pool
+            for cp in thread_list:
+                if cp in profile_labels:
+                    executor_list.append(executor.submit(runNode, cp, profiler, profile_labels[cp]))
+                else:
+                    executor_list.append(executor.submit(runNode, cp))
+
+            # Publish the metrics of the thread and executive nodes until they have all finished
+            if metrics_bus is not None:
+                metrics_termination_bus = Bus(False, "Metrics publisher termination bus")
+                metrics_publisher = Producer(
+                    lambda: collectMetrics(metrics_list),
+                    metrics_bus,
+                    metrics_delay,
+                    metrics_termination_bus,
+                    "Metrics publisher")
+                metrics_executor = executor.submit(metrics_publisher)
+
+                concurrent.futures.wait(executor_list)
+                metrics_termination_bus.set_message(True, "runConcurrently")
+                metrics_executor.result()
+
+    # Wait for the processes to finish
+    for process_handle in process_handles:
+        process_handle.join()
+
+    # Merge the node profiles
+    if profiler is not None:
+        logging.info("runConcurrently: wrote profile summary to {0:s}".format(profiler.summarize()))
+
+    # Loop over the executors that were created above, running their result methods
+    for e in executor_list:
+        e.result()
+
+    # Report any process that did not shut down cleanly (its traceback is printed by the process itself)
+    for cp, process_handle in zip(process_list, process_handles):
+        if process_handle.exitcode:
+            raise RuntimeError("{0:s}: process exited with code {1:d}".format(cp.name, process_handle.exitcode))
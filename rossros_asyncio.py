@@ -17,9 +17,14 @@ import rossros_asyncio
 and expect your code to run as before (assuming that you haven't incorporated any extra dependencies on
 the threading architecture from concurrent.futures).
 
-While running RossROS AsyncIO, you can include calls to "await.sleep" within the consumer and producer functions
-(but note that any such calls will stack with the loop delay time, so that you should decrease the loop delay
-to keep the same overall execution frequency).
+Consumer and producer functions can be ordinary functions or "async def" coroutine functions. Coroutine
+functions are awaited, so they can include calls to "await asyncio.sleep" (or await other asyncio operations)
+to let other consumer-producers run while they wait (but note that any such calls will stack with the loop delay
+time, so that you should decrease the loop delay to keep the same overall execution frequency). Ordinary
+functions that block for a long time (such as slow sensor reads) would freeze every other consumer-producer
+while they run; setting the execution backend of such a node (or of the whole graph, in runConcurrently) to
+"thread" or "process" runs its function in a thread or process pool instead, so that the event loop stays
+responsive.
 
 --
 
@@ -36,6 +41,10 @@ Third, it replaces the runConcurrently function with a version that uses the asy
 
 from rossros import *
 import asyncio
+import concurrent.futures
+import functools
+import inspect
+import logging
 
 
 """ First Change: For asyncio, locking is handled manually, so the Bus class does not the the RWLock code"""
@@ -46,10 +55,36 @@ class Bus:
     Redefined bus class that removes the RW lock code
     """
 
-    def __init__(self, initial_message=0, name="Unnamed Bus"):
+    # Logged methods that are swapped for undecorated versions when DEBUG logging is off
+    fast_method_names = ('get_message', 'set_message', 'get_stamped_message')
+
+    # Asyncio buses only carry messages within one event loop
+    process_shared = False
+
+    # Group that the bus belongs to, if any (see BusGroup)
+    group = None
+
+    # Whether the bus is a placeholder for a bus argument that was not given (see placeholderBus)
+    placeholder = False
+
+    def __init__(self, initial_message=0, name="Unnamed Bus", stamped=False):
         self.message = initial_message
         self.name = name
 
+        # The stamp of the latest write (None until the bus is first written, or if stamping is off)
+        self.stamped = stamped
+        self.stamp = None
+
+        # Count the writes to the bus, and set up an event that is pulsed on every write so that readers can
+        # wait for the message to change. Listeners are functions called after every write
+        self.version = 0
+        self.changed = asyncio.Event()
+        self.listeners = []
+        self.write_listeners = []
+
+        # Skip the logging decorators on reads and writes if they would not log anything
+        installFastMethods(self, self.fast_method_names)
+
     @log_on_start(DEBUG, "{self.name:s}: Initiating read by {_name:s}")
     @log_on_error(DEBUG, "{self.name:s}: Error on read by {_name:s}")
     @log_on_end(DEBUG, "{self.name:s}: Finished read by {_name:s}")
@@ -60,8 +95,119 @@ class Bus:
     @log_on_start(DEBUG, "{self.name:s}: Initiating write by {_name:s}")
     @log_on_error(DEBUG, "{self.name:s}: Error on write by {_name:s}")
     @log_on_end(DEBUG, "{self.name:s}: Finished write by {_name:s}")
-    def set_message(self, message, _name):
+    def set_message(self, message, _name, _origin=None):
         self.message = message
+        self.version += 1
+        if self.stamped:
+            self.stamp = makeStamp(self.version, _name, _origin)
+        for write_listener in self.write_listeners:
+            write_listener(message)
+
+        # Wake up anything waiting for the message to change (setting the event releases all of the current
+        # waiters, so it can be cleared again straight away)
+        self.changed.set()
+        self.changed.clear()
+        for listener in self.listeners:
+            listener()
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating wait for change by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on wait for change by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished wait for change by {_name:s}")
+    async def wait_for_change(self, version, timeout=None, _name='Unspecified function'):
+
+        # Wait until the bus has been written since it was at the given version (or until the timeout
+        # runs out), and return the current version
+        try:
+            await asyncio.wait_for(self._wait_for_version(version), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+        return self.version
+
+    async def _wait_for_version(self, version):
+        while self.version == version:
+            await self.changed.wait()
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating stamped read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on stamped read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished stamped read by {_name:s}")
+    def get_stamped_message(self, _name='Unspecified function'):
+        return self.message, self.stamp
+
+    def add_listener(self, listener):
+
+        # Register a function to be called after every write to the bus
+        self.listeners.append(listener)
+
+    def add_write_listener(self, write_listener):
+
+        # Register a function to be called with every message written to the bus
+        self.write_listeners.append(write_listener)
+
+
+class SingleWriterBus(Bus):
+    """
+    Asyncio buses never take a lock, so the single-writer bus is the same as the regular bus (this
+    definition keeps code written for rossros.SingleWriterBus working after switching imports)
+    """
+
+
+class HistoryBus(HistoryBus):
+    """
+    History bus for asyncio. Waiting for a reader inside set_message would stall the whole event loop
+    (including the reader), so the "block" overflow policy is not available
+    """
+
+    def __init__(self, initial_message=0, name="Unnamed Bus", capacity=64, overflow="drop_oldest", stamped=False):
+
+        if overflow == 'block':
+            raise ValueError("{0:s}: the 'block' overflow policy is not available under asyncio".format(name))
+
+        super().__init__(initial_message, name, capacity, overflow, stamped)
+
+
+class BusGroup(BusGroup):
+    """
+    Bus group for asyncio. Group reads and writes never yield to the event loop, so they are atomic
+    without a lock
+    """
+
+    bus_class = Bus
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating snapshot by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on snapshot by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished snapshot by {_name:s}")
+    def get_snapshot(self, _name='Unspecified function'):
+        versions = tuple(bus.version for bus in self.buses)
+        return BusSnapshot(tuple(bus.message for bus in self.buses), tuple(bus.stamp for bus in self.buses),
+                           versions, sum(versions))
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating read by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on read by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished read by {_name:s}")
+    def get_messages(self, _name='Unspecified function'):
+        return tuple(bus.message for bus in self.buses)
+
+    @log_on_start(DEBUG, "{self.name:s}: Initiating write by {_name:s}")
+    @log_on_error(DEBUG, "{self.name:s}: Error on write by {_name:s}")
+    @log_on_end(DEBUG, "{self.name:s}: Finished write by {_name:s}")
+    def set_messages(self, messages, _name='Unspecified function', _origin=None):
+        writes = self.matchMessages(messages)
+
+        for bus, message in writes:
+            bus.message = message
+            bus.version += 1
+            if bus.stamped:
+                bus.stamp = makeStamp(bus.version, _name, _origin)
+            for write_listener in bus.write_listeners:
+                write_listener(message)
+
+        # Wake up anything waiting for the messages to change, once all of them have been written
+        for bus, _message in writes:
+            bus.changed.set()
+            bus.changed.clear()
+            for listener in bus.listeners:
+                listener()
 
 
 """"
@@ -70,143 +216,301 @@ and have an "await asyncio.sleep" call instead of time.sleep.
 
 The "from rossros import *" call at the beginning of the file brings all items in the rossros namespace into the
 rossros_asyncio namespace. Declaring classes in rossros_asyncio that inherit from their same-named classes in rossros
-then allows us to redefine the __call__ method to be asyncio-aware.
+(with the AsyncLoop mixin ahead of them) then allows us to redefine the __call__ method to be asyncio-aware.
 """
 
 
-class ConsumerProducer(ConsumerProducer):
+class AsyncLoop:
+    """
+    Mixin that supplies the asyncio-aware __call__ method. It goes ahead of the RossROS class in the bases of each
+    redefined consumer-producer class, so that its __call__ replaces the threaded one
+    """
+
+    # Executor that runs the node's function (set by gather; None runs it on the event loop)
+    function_executor = None
 
     @log_on_start(DEBUG, "{self.name:s}: Starting consumer-producer service")
     @log_on_error(DEBUG, "{self.name:s}: Encountered an error while closing down consumer-producer")
     @log_on_end(DEBUG, "{self.name:s}: Closing down consumer-producer service")
     async def __call__(self):
 
-        while True:
+        # Set the first deadline for fixed-rate operation
+        self.startSchedule()
 
-            # Check if the loop should terminate
-            # termination_value = self.termination_buses[0].get_message(self.name)
-            if self.checkTerminationbuses():
-                break
+        try:
+            while True:
 
-            # Collect all of the values from the input buses into a list
-            input_values = self.collectbusesToValues(self.input_buses)
+                # Check if the loop should terminate
+                # termination_value = self.termination_buses[0].get_message(self.name)
+                if self.checkTerminationbuses():
+                    break
 
-            # Get the output value or tuple of values corresponding to the inputs
-            output_values = self.consumer_producer_function(*input_values)
+                # Collect all of the values from the input buses into a list
+                input_values = self.collectbusesToValues(self.input_buses)
 
-            # Deal the values into the output buses
-            self.dealValuesTobuses(output_values, self.output_buses)
+                # Get the output value or tuple of values corresponding to the inputs
+                output_values = await callFunction(self, input_values)
 
-            # Pause for set amount of time
-            await asyncio.sleep(self.delay)
+                # Deal the values into the output buses
+                self.dealValuesTobuses(output_values, self.output_buses)
 
+                # Pause for set amount of time (or until the next deadline in fixed-rate mode), waking
+                # immediately if the node is told to shut down
+                await sleepUnlessTerminated(self, self.timeUntilNextCycle())
 
-class Producer(Producer):
+                # In trigger mode, wait for new data on the input buses
+                await waitForInputs(self)
 
-    @log_on_start(DEBUG, "{self.name:s}: Starting consumer-producer service")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while closing down consumer-producer")
-    @log_on_end(DEBUG, "{self.name:s}: Closing down consumer-producer service")
-    async def __call__(self):
+        # Release whatever startSchedule set up, even if the loop stopped on an error
+        finally:
+            self.stopSchedule()
 
-        while True:
 
-            # Check if the loop should terminate
-            # termination_value = self.termination_buses[0].get_message(self.name)
-            if self.checkTerminationbuses():
-                break
+class ConsumerProducer(AsyncLoop, ConsumerProducer):
+    pass
 
-            # Collect all of the values from the input buses into a list
-            input_values = self.collectbusesToValues(self.input_buses)
 
-            # Get the output value or tuple of values corresponding to the inputs
-            output_values = self.consumer_producer_function(*input_values)
+class Producer(AsyncLoop, Producer):
+    pass
 
-            # Deal the values into the output buses
-            self.dealValuesTobuses(output_values, self.output_buses)
 
-            # Pause for set amount of time
-            await asyncio.sleep(self.delay)
+class Consumer(AsyncLoop, Consumer):
+    pass
 
 
-class Consumer(Consumer):
+class Printer(AsyncLoop, Printer):
+    pass
 
-    @log_on_start(DEBUG, "{self.name:s}: Starting consumer-producer service")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while closing down consumer-producer")
-    @log_on_end(DEBUG, "{self.name:s}: Closing down consumer-producer service")
-    async def __call__(self):
 
-        while True:
+class Timer(AsyncLoop, Timer):
+    pass
 
-            # Check if the loop should terminate
-            # termination_value = self.termination_buses[0].get_message(self.name)
-            if self.checkTerminationbuses():
-                break
 
-            # Collect all of the values from the input buses into a list
-            input_values = self.collectbusesToValues(self.input_buses)
+class TimerService(AsyncLoop, TimerService):
+    pass
 
-            # Get the output value or tuple of values corresponding to the inputs
-            output_values = self.consumer_producer_function(*input_values)
 
-            # Deal the values into the output buses
-            self.dealValuesTobuses(output_values, self.output_buses)
+class BatchConsumerProducer(AsyncLoop, BatchConsumerProducer):
+    pass
 
-            # Pause for set amount of time
-            await asyncio.sleep(self.delay)
 
+class LatencyTracer(AsyncLoop, LatencyTracer):
+    pass
 
-class Printer(Printer):
 
-    @log_on_start(DEBUG, "{self.name:s}: Starting consumer-producer service")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while closing down consumer-producer")
-    @log_on_end(DEBUG, "{self.name:s}: Closing down consumer-producer service")
-    async def __call__(self):
+class Watchdog(AsyncLoop, Watchdog):
+    pass
 
-        while True:
 
-            # Check if the loop should terminate
-            # termination_value = self.termination_buses[0].get_message(self.name)
-            if self.checkTerminationbuses():
-                break
+class BridgeSender(AsyncLoop, BridgeSender):
+    pass
 
-            # Collect all of the values from the input buses into a list
-            input_values = self.collectbusesToValues(self.input_buses)
 
-            # Get the output value or tuple of values corresponding to the inputs
-            output_values = self.consumer_producer_function(*input_values)
+class BridgeReceiver(AsyncLoop, BridgeReceiver):
+    """
+    Bridge receiver that does not wait for data by default, so that it does not block the event loop, and
+    instead polls for data every delay seconds (a receiver run with execution="thread" can be given a timeout)
+    """
 
-            # Deal the values into the output buses
-            self.dealValuesTobuses(output_values, self.output_buses)
+    def __init__(self,
+                 buses,
+                 address,
+                 delay=0.01,  # how many seconds to sleep for between checking for data
+                 termination_buses=placeholderBus(False, "Default bridge receiver termination bus"),
+                 name="Unnamed bridge receiver",
+                 protocol="udp",
+                 timeout=0,  # how many seconds each cycle waits for data
+                 execution=None,
+                 priority=None):
 
-            # Pause for set amount of time
-            await asyncio.sleep(self.delay)
+        super().__init__(buses, address, delay, termination_buses, name, protocol, timeout, execution, priority)
 
 
-class Timer(Timer):
+class Recorder(AsyncLoop, Recorder):
+    pass
 
-    @log_on_start(DEBUG, "{self.name:s}: Starting consumer-producer service")
-    @log_on_error(DEBUG, "{self.name:s}: Encountered an error while closing down consumer-producer")
-    @log_on_end(DEBUG, "{self.name:s}: Closing down consumer-producer service")
-    async def __call__(self):
+
+class Replayer(AsyncLoop, Replayer):
+    pass
+
+
+class FusedChain(AsyncLoop, FusedChain):
+    pass
+
+
+class DataflowGraph(DataflowGraph):
+    """
+    Dataflow graph that fuses chains into asyncio fused nodes
+    """
+
+    chain_class = FusedChain
+
+
+async def callFunction(consumer_producer, input_values):
+    """
+    Asyncio version of ConsumerProducer.callFunction, which awaits coroutine functions, and runs ordinary
+    functions in the node's function executor (if it has one) so that they do not block the event loop
+    """
+
+    # Beat the heartbeat, so that a watchdog can see that the node is cycling
+    cycle_start = time.perf_counter()
+    consumer_producer.heartbeat = cycle_start
+
+    # In skip-if-unchanged mode, leave the outputs alone if the inputs are the same as last time
+    if consumer_producer.skip_unchanged and consumer_producer.inputsUnchanged(input_values):
+        return consumer_producer.unchanged
+
+    function = consumer_producer.consumer_producer_function
+    consumer_producer.busy_since = cycle_start
+
+    # Run the function inline, or hand it to the executor (coroutine functions, including those wrapped by a
+    # Producer, always run on the event loop)
+    if (consumer_producer.function_executor is None
+            or inspect.iscoroutinefunction(consumer_producer.userFunction())):
+        output_values = function(*input_values)
+    else:
+        loop = asyncio.get_running_loop()
+        output_values = await loop.run_in_executor(consumer_producer.function_executor,
+                                                   functools.partial(function, *input_values))
+
+    # Await the result if the function was a coroutine function (including one wrapped by a Producer)
+    if inspect.isawaitable(output_values):
+        output_values = await output_values
+
+    consumer_producer.busy_since = None
+    consumer_producer.metrics.recordCycle(cycle_start, time.perf_counter() - cycle_start)
+
+    return output_values
+
+
+async def sleepUnlessTerminated(consumer_producer, delay):
+    """
+    Asyncio version of the pause at the end of each cycle, which ends early if the consumer-producer
+    is told to shut down
+    """
+
+    # A zero delay still yields to the other tasks
+    if delay <= 0 or consumer_producer.termination_event.is_set():
+        await asyncio.sleep(0)
+        return
+
+    # The first time through, have the termination signal (and waking the node early) set an asyncio event as well
+    if consumer_producer.termination_waiter is None:
+        consumer_producer.termination_waiter = asyncio.Event()
+        consumer_producer.termination_callbacks.append(consumer_producer.termination_waiter.set)
+        consumer_producer.wake_callbacks.append(consumer_producer.termination_waiter.set)
+
+    try:
+        await asyncio.wait_for(consumer_producer.termination_waiter.wait(), delay)
+    except asyncio.TimeoutError:
+        pass
+
+    # A wake-up only ends this pause
+    if not consumer_producer.termination_event.is_set():
+        consumer_producer.termination_waiter.clear()
+
+
+class ProfiledSteps:
+    """
+    Awaitable that runs a coroutine one step at a time, profiling each step in a profile session, so that
+    the profile covers only the work of that coroutine even though the event loop switches between tasks
+    """
+
+    def __init__(self, coroutine, session):
+        self.coroutine = coroutine
+        self.session = session
+
+    def __await__(self):
+
+        steps = self.coroutine.__await__()
+        value = None
+        error = None
 
         while True:
 
-            # Check if the loop should terminate
-            # termination_value = self.termination_buses[0].get_message(self.name)
-            if self.checkTerminationbuses():
-                break
+            # Run the coroutine up to its next suspension point, with profiling on
+            self.session.resume()
+            try:
+                if error is None:
+                    future = steps.send(value)
+                else:
+                    future = steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.session.pause()
+
+            # Hand whatever it is waiting for to the event loop, and pass the result back in
+            try:
+                value = yield future
+                error = None
+            except BaseException as exception:
+                value = None
+                error = exception
+
+
+async def runNode(consumer_producer, profiler=None, profile_label=None):
+    """
+    Asyncio version of runNode, which runs a ConsumerProducer, restarting it if it crashes and has a
+    restart policy (see Watchdog). If a profiler is given, each step of the node's task is profiled
+    under the given label
+    """
+
+    if profiler is not None:
+        session = profiler.openSession(profile_label)
+        try:
+            return await ProfiledSteps(runNode(consumer_producer), session)
+        finally:
+            session.close()
+
+    while True:
+        try:
+            return await consumer_producer()
+        except Exception as error:
+            backoff = consumer_producer.recordCrash(error)
+            if backoff is None:
+                raise
 
-            # Collect all of the values from the input buses into a list
-            input_values = self.collectbusesToValues(self.input_buses)
+        # Give up on the restart if the node is told to shut down while it waits
+        await sleepUnlessTerminated(consumer_producer, backoff)
+        if consumer_producer.termination_event.is_set():
+            return None
 
-            # Get the output value or tuple of values corresponding to the inputs
-            output_values = self.consumer_producer_function(*input_values)
 
-            # Deal the values into the output buses
-            self.dealValuesTobuses(output_values, self.output_buses)
+async def waitForInputs(consumer_producer):
+    """
+    Asyncio version of ConsumerProducer.waitForInputs, which waits on an asyncio Event instead of
+    a threading Condition so that other tasks can run in the meantime
+    """
+
+    # Outside of trigger mode, the loop runs on its delay alone
+    if not consumer_producer.trigger:
+        return
+
+    # The first time through, ask the input and termination buses to wake this node whenever they are written
+    if consumer_producer.trigger_signal is None:
+        consumer_producer.trigger_signal = asyncio.Event()
+        for bus in consumer_producer.input_buses + consumer_producer.termination_buses:
+            if not bus.placeholder:
+                bus.add_listener(consumer_producer.trigger_signal.set)
 
-            # Pause for set amount of time
-            await asyncio.sleep(self.delay)
+    # Writes to buses shared between processes may come from another process, which cannot set the event, so with
+    # any such bus the wait times out regularly to look at the buses directly
+    timeout = None
+    if any(bus.process_shared for bus in consumer_producer.input_buses + consumer_producer.termination_buses):
+        timeout = consumer_producer.trigger_poll_interval
+
+    # Clear the event before checking the buses, so that a write after the check is not missed
+    while True:
+        consumer_producer.trigger_signal.clear()
+        if consumer_producer.triggerReady():
+            break
+        try:
+            await asyncio.wait_for(consumer_producer.trigger_signal.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    consumer_producer.acknowledgeInputs()
 
 
 """
@@ -217,24 +521,119 @@ a helper function (gather) to set up the execution calls
 @log_on_start(DEBUG, "runConcurrently: Starting concurrent execution")
 @log_on_error(DEBUG, "runConcurrently: Encountered an error during concurrent execution")
 @log_on_end(DEBUG, "runConcurrently: Finished concurrent execution")
-async def gather(producer_consumer_list):
+async def gather(producer_consumer_list, metrics_bus=None, metrics_delay=1.0, execution=None, executors=None,
+                 profiler=None):
     """
     Function that uses asyncio.gather to concurrently
     execute a set of ConsumerProducer functions
     """
 
+    # The timers all share one timer service
+    producer_consumer_list = groupTimers(producer_consumer_list, TimerService)
+
+    # Give each consumer-producer the executor for its execution backend, or the graph-wide one if it does not
+    # choose its own (no executor runs its function on the event loop). The graph-wide backend only applies to
+    # functions supplied by the user: the built-in nodes run their own methods, which hold the node's locks and
+    # cannot be sent to another process, so they stay on the event loop unless they choose a backend themselves
+    executors = executors or {}
+    for pc in producer_consumer_list:
+        if pc.execution is None and pc.runsOwnMethod():
+            pc.function_executor = None
+        else:
+            pc.function_executor = executors.get(pc.execution or execution)
+
+    # All of the nodes share the event loop's thread, so operating-system scheduling settings are not applied
+    for pc in producer_consumer_list:
+        if pc.hasSchedulingSettings():
+            logging.warning("runConcurrently: {0:s} shares the event loop with other nodes, so its CPU affinity, "
+                            "nice value and real-time priority are not applied".format(pc.name))
+
     # Make a new list of producer_consumers by evaluating the input list
     # (this evaluation matches syntax with rossros.py)
     producer_consumer_list2 = []
     for pc in producer_consumer_list:
-        producer_consumer_list2.append(pc())
-
-    await asyncio.gather(*producer_consumer_list2)
-
-
-def runConcurrently(producer_consumer_list):
+        if profiler is None:
+            producer_consumer_list2.append(runNode(pc))
+        else:
+            producer_consumer_list2.append(runNode(pc, profiler, profiler.label(pc.name)))
+
+    # Without a metrics bus, just wait for the consumer-producers
+    if metrics_bus is None:
+        await asyncio.gather(*producer_consumer_list2)
+        return
+
+    # Otherwise, publish the node metrics until all of the consumer-producers have finished
+    metrics_termination_bus = Bus(False, "Metrics publisher termination bus")
+    metrics_publisher = Producer(
+        lambda: collectMetrics(producer_consumer_list),
+        metrics_bus,
+        metrics_delay,
+        metrics_termination_bus,
+        "Metrics publisher")
+    metrics_task = asyncio.ensure_future(metrics_publisher())
+
+    try:
+        await asyncio.gather(*producer_consumer_list2)
+    finally:
+        metrics_termination_bus.set_message(True, "runConcurrently")
+        await metrics_task
+
+
+def runConcurrently(producer_consumer_list,
+                    metrics_bus=None,  # bus to publish a snapshot of the node metrics to
+                    metrics_delay=1.0,  # how many seconds to wait between metrics snapshots
+                    execution=None,  # None, "thread" or "process": where to run functions of nodes without their own
+                    thread_executor=None,  # executor for "thread" nodes (default: a new ThreadPoolExecutor)
+                    process_executor=None,  # executor for "process" nodes (default: a new ProcessPoolExecutor)
+                    profile=False,  # True (or "trace") or "sample" to profile each node's task separately
+                    profile_directory="profiles",  # directory to write the profiles to
+                    sample_interval=0.005):  # seconds between samples when profile="sample"
     """
     Function that uses asyncio.run to tell asyncio.gather to run a list of
-    ConsumerProducers
+    ConsumerProducers, optionally publishing their metrics to a bus. Nodes whose
+    execution backend is "thread" or "process" (either their own setting, or the
+    graph-wide one passed here) run their functions in the matching executor; the
+    functions of "process" nodes, and their inputs and outputs, must be picklable.
+    The graph-wide backend only moves the functions supplied by the user, and the
+    built-in nodes (timers, printers, watchdogs and so on) stay on the event loop.
+    If profiling is turned on, the steps of each node's task are profiled
+    separately (functions run in an executor are not covered), and a merged
+    summary is written once all of the nodes have finished
     """
-    asyncio.run(gather(producer_consumer_list))
+
+    if execution not in (None, 'thread', 'process'):
+        raise ValueError("runConcurrently: execution must be None, 'thread' or 'process', not {0!r}".format(execution))
+
+    # Create the executors that are needed but were not provided, and shut them down afterwards
+    requested = {pc.execution or execution for pc in producer_consumer_list}
+    created = []
+    if 'thread' in requested and thread_executor is None:
+        thread_executor = concurrent.futures.ThreadPoolExecutor()
+        created.append(thread_executor)
+    if 'process' in requested and process_executor is None:
+        process_executor = concurrent.futures.ProcessPoolExecutor(mp_context=process_context)
+        created.append(process_executor)
+
+    profiler = None
+    if profile:
+        profile_mode = 'trace' if profile is True else profile
+
+        # A trace that cannot be kept to the event loop's thread would take in the functions running in the
+        # thread executor as well, so sample the nodes instead
+        if profile_mode == 'trace' and not Profiler.per_thread_traces and 'thread' in requested:
+            logging.warning("runConcurrently: this version of Python cannot trace the event loop separately from "
+                            "the thread executor, so the nodes are profiled by sampling instead")
+            profile_mode = 'sample'
+
+        profiler = Profiler(profile_mode, profile_directory, sample_interval)
+
+    try:
+        asyncio.run(gather(producer_consumer_list, metrics_bus, metrics_delay, execution,
+                           {'thread': thread_executor, 'process': process_executor}, profiler))
+    finally:
+        for executor in created:
+            executor.shutdown()
+
+        # Merge the node profiles
+        if profiler is not None:
+            logging.info("runConcurrently: wrote profile summary to {0:s}".format(profiler.summarize()))
@@ -0,0 +1,15 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# Run the tests against the modules in this checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(params=['rossros', 'rossros_asyncio'])
+def backend(request):
+
+    # Tests that take this fixture run once on the threaded backend and once on the asyncio backend
+    return importlib.import_module(request.param)
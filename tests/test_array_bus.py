@@ -0,0 +1,78 @@
+"""
+Tests of the zero-copy array bus
+"""
+
+import os
+
+import pytest
+
+import rossros as rr
+
+np = pytest.importorskip("numpy")
+
+
+def test_reads_are_read_only_views_of_the_published_buffer():
+
+    bus = rr.ArrayBus((4, 3), np.float32, 0, "Frames")
+    bus.set_message(np.ones((4, 3)), "writer")
+
+    frame = bus.get_message("reader")
+    assert frame.sum() == 12
+    assert bus.version == 1
+    assert np.shares_memory(frame, bus.buffers)
+    with pytest.raises(ValueError):
+        frame[0, 0] = 5
+
+
+def test_back_buffer_is_published_in_place():
+
+    bus = rr.ArrayBus(3, float, 0, "Frames")
+    held = bus.get_message("reader")
+    bus.get_back_buffer()[:] = 2
+    bus.publish("writer")
+
+    assert (bus.get_message("reader") == 2).all()
+
+    # A view that a reader is holding is not touched by the next frame
+    assert (held == 0).all()
+
+
+def test_stamped_read_and_origin():
+
+    bus = rr.ArrayBus(3, float, 1, "Frames")
+    bus.set_message(np.arange(3.0), "writer", _origin=None)
+
+    message, stamp = bus.get_stamped_message("reader")
+    assert (message == np.arange(3.0)).all()
+    assert stamp is None
+
+
+def test_shared_buffers_reach_other_processes():
+
+    termination_bus = rr.ProcessBus(False, "Termination", 64)
+    bus = rr.ArrayBus(100, np.float64, 0, "Shared frames", shared=True)
+
+    def fill():
+        bus.get_back_buffer()[:] = os.getpid()
+        bus.publish("writer")
+
+    seen = []
+    nodes = [rr.Producer(fill, rr.Bus(0, "Unused"), 0.01, termination_bus, "Writer", execution='process'),
+             rr.Consumer(lambda frame: seen.append(frame[0]), bus, 0.02, termination_bus, "Reader"),
+             rr.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")]
+    rr.runConcurrently(nodes)
+
+    assert seen[-1] not in (0, os.getpid())
+
+
+def test_array_bus_as_node_input(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    bus = rr.ArrayBus(3, float, 0, "Frames")
+    sums = []
+    nodes = [backend.Producer(lambda: np.full(3, 2.0), bus, 0.01, termination_bus, "Writer"),
+             backend.Consumer(lambda frame: sums.append(frame.sum()), bus, 0.01, termination_bus, "Reader"),
+             backend.Timer(termination_bus, 0.1, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes)
+
+    assert sums[-1] == 6
@@ -0,0 +1,117 @@
+"""
+Tests of the asyncio backend: coroutine node functions, executor offload, and nodes awaited directly
+"""
+
+import asyncio
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import rossros_asyncio as rra
+
+
+def test_coroutine_functions_and_offloaded_functions_share_the_loop():
+
+    async def sense():
+        await asyncio.sleep(0.01)
+        return 1
+
+    def block():
+        time.sleep(0.1)
+        return 2
+
+    termination_bus = rra.Bus(False, "Termination")
+    async_bus = rra.Bus(0, "Async")
+    thread_bus = rra.Bus(0, "Thread")
+    process_bus = rra.Bus(0, "Process")
+    ticks = []
+    nodes = [rra.Producer(lambda: ticks.append(time.monotonic()), rra.Bus(0, "Ticks"), 0.01, termination_bus,
+                          "Fast"),
+             rra.Producer(sense, async_bus, 0, termination_bus, "Async"),
+             rra.Producer(block, thread_bus, 0, termination_bus, "Blocking", execution='thread'),
+             rra.Producer(os.getpid, process_bus, 0.05, termination_bus, "Process", execution='process'),
+             rra.Timer(termination_bus, 0.4, 0.01, termination_bus, "Timer")]
+    rra.runConcurrently(nodes)
+
+    assert async_bus.get_message("test") == 1
+    assert thread_bus.get_message("test") == 2
+    assert process_bus.get_message("test") not in (0, os.getpid())
+
+    # The blocking function ran off the event loop, so the fast node kept its rate
+    assert max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < 0.08
+
+
+def test_node_can_be_awaited_directly():
+
+    termination_bus = rra.Bus(False, "Termination")
+    output_bus = rra.Bus(0, "Output")
+    producer = rra.Producer(lambda: 1, output_bus, 0.01, termination_bus, "Producer")
+
+    async def stop():
+        await asyncio.sleep(0.05)
+        termination_bus.set_message(True, "test")
+
+    async def main():
+        await asyncio.gather(producer(), stop())
+
+    asyncio.run(main())
+
+    assert output_bus.get_message("test") == 1
+
+
+def test_every_node_class_uses_the_asyncio_loop():
+
+    for node_class in (rra.ConsumerProducer, rra.Producer, rra.Consumer, rra.Printer, rra.Timer, rra.TimerService,
+                       rra.BatchConsumerProducer, rra.LatencyTracer, rra.Watchdog, rra.BridgeSender,
+                       rra.BridgeReceiver, rra.Recorder, rra.Replayer, rra.FusedChain):
+        assert node_class.__call__ is rra.AsyncLoop.__call__
+
+
+def test_unknown_execution_backend_is_rejected():
+
+    with pytest.raises(ValueError):
+        rra.runConcurrently([], execution='executive')
+
+
+def test_graph_wide_process_execution_keeps_built_in_nodes_on_the_loop():
+
+    async def sense():
+        await asyncio.sleep(0.01)
+        return 1
+
+    # The timer service, printer and coroutine producer cannot be sent to another process, so only the
+    # ordinary producer's function runs in the process pool
+    termination_bus = rra.Bus(False, "Termination")
+    process_bus = rra.Bus(0, "Process")
+    async_bus = rra.Bus(0, "Async")
+    nodes = [rra.Producer(os.getpid, process_bus, 0.05, termination_bus, "Process"),
+             rra.Producer(sense, async_bus, 0, termination_bus, "Async"),
+             rra.Printer(process_bus, 0.05, termination_bus, "Printer", sink=io.StringIO()),
+             rra.Timer(termination_bus, 0.4, 0.01, termination_bus, "Timer")]
+    rra.runConcurrently(nodes, execution='process')
+
+    assert process_bus.get_message("test") not in (0, os.getpid())
+    assert async_bus.get_message("test") == 1
+
+
+@pytest.mark.parametrize('execution', ['thread', 'process'])
+def test_coroutine_producers_run_on_the_loop(execution):
+
+    loop_threads = []
+
+    async def sense():
+        loop_threads.append(threading.get_ident())
+        await asyncio.sleep(0.01)
+        return 1
+
+    termination_bus = rra.Bus(False, "Termination")
+    output_bus = rra.Bus(0, "Output")
+    nodes = [rra.Producer(sense, output_bus, 0, termination_bus, "Async", execution=execution),
+             rra.Timer(termination_bus, 0.2, 0.01, termination_bus, "Timer")]
+    rra.runConcurrently(nodes)
+
+    assert output_bus.get_message("test") == 1
+    assert set(loop_threads) == {threading.get_ident()}
@@ -0,0 +1,66 @@
+"""
+Tests of batched consumer-producers, which process every sample that arrived since their last cycle at once
+"""
+
+import pytest
+
+import rossros as rr
+
+np = pytest.importorskip("numpy")
+
+
+def runBatch(node, input_bus, values):
+
+    # Write the samples, then run one cycle of the node by hand
+    for value in values:
+        input_bus.set_message(value, "writer")
+    node.dealValuesTobuses(node.callFunction(node.collectbusesToValues(node.input_buses)), node.output_buses)
+
+
+def test_every_sample_is_processed_once(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    input_bus = backend.HistoryBus(0, "Input", capacity=1000)
+    output_bus = backend.HistoryBus(0, "Output", capacity=1000)
+    latest_bus = backend.Bus(0, "Latest")
+    counter = [0]
+
+    def count():
+        counter[0] += 1
+        return counter[0]
+
+    nodes = [backend.Producer(count, input_bus, 0.002, termination_bus, "Producer"),
+             backend.BatchConsumerProducer(lambda samples: samples * 2, input_bus, (output_bus, latest_bus), 0.05,
+                                           termination_bus, "Batch"),
+             backend.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes)
+
+    doubled = output_bus.drain("test")
+    assert doubled == [2 * value for value in range(1, len(doubled) + 1)]
+    assert latest_bus.get_message("test") == doubled[-1]
+
+
+def test_scalar_results_are_single_samples():
+
+    input_bus = rr.HistoryBus(0, "Input")
+    output_bus = rr.HistoryBus(0, "Output")
+    node = rr.BatchConsumerProducer(lambda samples: samples.sum(), input_bus, output_bus, 0,
+                                    rr.Bus(False, "Termination"), "Batch")
+    runBatch(node, input_bus, [1, 2, 3])
+
+    assert output_bus.drain("test") == [6]
+
+
+def test_grouped_outputs_are_written_as_one_update():
+
+    first = rr.Bus(0, "First")
+    second = rr.Bus(0, "Second")
+    group = rr.BusGroup((first, second), "Group")
+    input_bus = rr.HistoryBus(0, "Input")
+    node = rr.BatchConsumerProducer(lambda samples: (samples.max(), samples * 10), input_bus, (first, second), 0,
+                                    rr.Bus(False, "Termination"), "Batch")
+    runBatch(node, input_bus, [1, 2, 3])
+
+    snapshot = group.get_snapshot()
+    assert snapshot.messages == (3, 30)
+    assert snapshot.version == 2
@@ -0,0 +1,52 @@
+"""
+Smoke tests of the benchmark suite, which run each benchmark briefly on each backend
+"""
+
+import importlib
+import json
+
+import pytest
+
+import benchmarks
+from benchmarks import __main__ as benchmark_main, bus_throughput
+
+
+@pytest.mark.parametrize('backend', sorted(benchmarks.backend_modules))
+@pytest.mark.parametrize('benchmark', benchmark_main.benchmark_names)
+def test_benchmark_runs(benchmark, backend):
+
+    module = importlib.import_module("benchmarks." + benchmark)
+    results = module.run(backend, 0.02)
+
+    assert results
+    for result in results:
+        assert result["benchmark"] == benchmark
+        assert result["backend"] == backend
+
+    # The results are written out as JSON
+    json.dumps(results)
+
+
+def test_percentiles():
+
+    summary = benchmarks.percentiles(list(range(1, 101)))
+
+    assert summary["p50"] == 50
+    assert summary["p99"] == 99
+    assert summary["max"] == 100
+    assert benchmarks.percentiles([]) == {}
+
+
+def test_unknown_backend_is_rejected():
+
+    with pytest.raises(ValueError):
+        benchmarks.getBackend("gpu")
+
+
+@pytest.mark.parametrize('backend', sorted(benchmarks.backend_modules))
+def test_short_throughput_runs_count_every_thread(backend):
+
+    # Even with many readers and a very short run, every writer gets to complete some writes
+    results = bus_throughput.run(backend, 0.001)
+
+    assert all(result["reads_per_s"] > 0 and result["writes_per_s"] > 0 for result in results)
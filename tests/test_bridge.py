@@ -0,0 +1,127 @@
+"""
+Tests of the socket bridge between buses, and of its message encoding
+"""
+
+import importlib
+import socket
+
+import pytest
+
+import rossros as rr
+
+
+def freePort():
+
+    # Ask the operating system for a port that nothing is listening on
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@pytest.mark.parametrize('message', [None, True, False, -5, 2 ** 40, 1.5, "text", b"bytes", (1, "a"), [1.0, None],
+                                     {"key": [1, 2], "nested": {"x": (True,)}}])
+def test_encoding_round_trip(message):
+
+    assert rr.decodeMessage(rr.encodeMessage(message)) == message
+
+
+def test_encoding_round_trip_of_arrays():
+
+    np = pytest.importorskip("numpy")
+    array = np.arange(6, dtype=np.float32).reshape(2, 3)
+
+    decoded = rr.decodeMessage(rr.encodeMessage(array))
+    assert decoded.dtype == array.dtype
+    assert (decoded == array).all()
+
+
+def test_unencodable_values_are_rejected():
+
+    with pytest.raises(ValueError):
+        rr.encodeMessage(2 ** 70)
+    with pytest.raises(ValueError):
+        rr.encodeMessage(object())
+
+
+@pytest.mark.parametrize('protocol', ['udp', 'tcp'])
+def test_buses_are_mirrored_by_name(backend, protocol):
+
+    port = freePort()
+    termination_bus = backend.Bus(False, "Termination")
+    counter = [0]
+
+    def count():
+        counter[0] += 1
+        return counter[0]
+
+    local_bus = backend.Bus(0, "counter")
+    remote_bus = backend.Bus(-1, "counter")
+    received = []
+    nodes = [backend.Producer(count, local_bus, 0.005, termination_bus, "Counter"),
+             backend.BridgeSender(local_bus, ('127.0.0.1', port), 0.02, termination_bus, "Sender", protocol=protocol),
+             backend.BridgeReceiver(remote_bus, ('127.0.0.1', port), termination_buses=termination_bus,
+                                    name="Receiver", protocol=protocol),
+             backend.Consumer(lambda value: received.append(value), remote_bus, 0, termination_bus, "Reader",
+                              trigger='any'),
+             backend.Timer(termination_bus, 0.5, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes)
+
+    values = [value for value in received if value >= 0]
+    assert values
+    assert values == sorted(values)
+    assert values[-1] <= counter[0]
+
+    # The sender coalesces the writes, sending at most one per delay
+    assert len(values) < counter[0]
+
+
+def runReceiver(backend_name, port, protocol, ready, results):
+
+    # Receiver side of the bridge, with its own buses and its own runConcurrently, which reports the values that
+    # it received back to the test process
+    backend = importlib.import_module(backend_name)
+    termination_bus = backend.Bus(False, "Termination")
+    remote_bus = backend.Bus(-1, "counter")
+    received = []
+    receiver = backend.BridgeReceiver(remote_bus, ('127.0.0.1', port), termination_buses=termination_bus,
+                                      name="Receiver", protocol=protocol)
+    ready.set()
+    backend.runConcurrently([receiver,
+                             backend.Consumer(lambda value: received.append(value), remote_bus, 0, termination_bus,
+                                              "Reader", trigger='any'),
+                             backend.Timer(termination_bus, 1.0, 0.01, termination_bus, "Timer")])
+    results.put(received)
+
+
+@pytest.mark.parametrize('protocol', ['udp', 'tcp'])
+def test_receiver_in_another_process(backend, protocol):
+
+    # Start the receiver in its own process, and wait until it is listening
+    port = freePort()
+    ready, results = rr.process_context.Event(), rr.process_context.Queue()
+    process = rr.process_context.Process(target=runReceiver, args=(backend.__name__, port, protocol, ready, results))
+    process.start()
+    try:
+        assert ready.wait(10)
+
+        # Send a count from this process for a shorter time than the receiver runs for
+        termination_bus = backend.Bus(False, "Termination")
+        counter = [0]
+
+        def count():
+            counter[0] += 1
+            return counter[0]
+
+        local_bus = backend.Bus(0, "counter")
+        backend.runConcurrently([backend.Producer(count, local_bus, 0.005, termination_bus, "Counter"),
+                                 backend.BridgeSender(local_bus, ('127.0.0.1', port), 0.02, termination_bus,
+                                                      "Sender", protocol=protocol),
+                                 backend.Timer(termination_bus, 0.5, 0.01, termination_bus, "Timer")])
+        received = results.get(timeout=10)
+    finally:
+        process.join(10)
+
+    values = [value for value in received if value >= 0]
+    assert values
+    assert values == sorted(values)
+    assert values[-1] <= counter[0]
@@ -0,0 +1,73 @@
+"""
+Tests of bus groups: consistent snapshots, atomic updates and grouped reads and writes in nodes
+"""
+
+import pytest
+
+import rossros as rr
+
+
+def test_snapshot_and_atomic_update():
+
+    x_bus, y_bus, theta_bus = rr.Bus(0, "x"), rr.Bus(0, "y"), rr.Bus(0, "theta", stamped=True)
+    group = rr.BusGroup((x_bus, y_bus, theta_bus), "Pose")
+
+    # A listener on one bus fires once for a group update
+    notifications = []
+    x_bus.add_listener(lambda: notifications.append(1))
+    group.set_messages((1, 2, 3), "writer")
+    assert notifications == [1]
+
+    snapshot = group.get_snapshot("reader")
+    assert snapshot.messages == (1, 2, 3)
+    assert snapshot.version == sum(snapshot.versions)
+    assert snapshot.stamps[0] is None
+    assert snapshot.stamps[2].writer == "writer"
+
+    # Updates can name a subset of the buses
+    group.set_messages({y_bus: -1}, "writer")
+    assert group.get_messages("reader") == (1, -1, 3)
+    assert y_bus.get_message("reader") == -1
+
+
+def test_invalid_groups_and_updates():
+
+    x_bus, y_bus = rr.Bus(0, "x"), rr.Bus(0, "y")
+    group = rr.BusGroup((x_bus, y_bus), "Pose")
+
+    # Wrong number of messages
+    with pytest.raises(ValueError):
+        group.set_messages((1, 2, 3), "writer")
+
+    # Only regular buses, and each bus only in one group
+    with pytest.raises(ValueError):
+        rr.BusGroup((rr.SingleWriterBus(0, "Single writer"),), "Other")
+    with pytest.raises(ValueError):
+        rr.BusGroup((x_bus,), "Other")
+
+
+def test_nodes_never_see_torn_updates(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    x_bus, y_bus, theta_bus = backend.Bus(0, "x"), backend.Bus(0, "y"), backend.Bus(0, "theta")
+    group = backend.BusGroup((x_bus, y_bus, theta_bus), "Pose")
+    counter = iter(range(10 ** 9))
+
+    torn = []
+
+    def check(x, y, theta):
+        if not x == y == theta:
+            torn.append((x, y, theta))
+
+    # The reader lists the grouped buses in a different order from the writer
+    reader = backend.Consumer(check, (theta_bus, x_bus, y_bus), 0.001, termination_bus, "Reader")
+    nodes = [backend.Producer(lambda: (next(counter),) * 3, (x_bus, y_bus, theta_bus), 0.001, termination_bus,
+                              "Writer"),
+             reader,
+             backend.Timer(termination_bus, 0.3, 0, termination_bus, "Timer")]
+    backend.runConcurrently(nodes)
+
+    assert not torn
+    assert reader.getMetrics()['iterations'] > 10
+    messages = group.get_messages("test")
+    assert messages[0] == messages[1] == messages[2] > 0
@@ -0,0 +1,87 @@
+"""
+Tests of the dataflow graph compiler: chain fusion, cycle detection and dead-bus reports
+"""
+
+import rossros as rr
+
+
+def buildPipeline(backend, output):
+
+    # Sensor -> filter -> controller -> motor, where the controller also reads a configuration bus that nothing
+    # writes, and writes a debug bus that nothing reads
+    termination_bus = backend.Bus(False, "Termination")
+    raw_bus, filtered_bus, command_bus, debug_bus, config_bus = (
+        backend.Bus(0, name) for name in ("raw", "filtered", "command", "debug", "config"))
+    counter = iter(range(10 ** 9))
+
+    return [backend.Producer(lambda: next(counter), raw_bus, 0.01, termination_bus, "Sensor"),
+            backend.ConsumerProducer(lambda value: value * 2, raw_bus, filtered_bus, 0, termination_bus, "Filter",
+                                     trigger='any'),
+            backend.ConsumerProducer(lambda value, config: (value + 1, value), (filtered_bus, config_bus),
+                                     (command_bus, debug_bus), 0, termination_bus, "Controller", trigger='any'),
+            backend.Consumer(output.append, command_bus, 0.01, termination_bus, "Motor"),
+            backend.Timer(termination_bus, 0.3, 0, termination_bus, "Timer")]
+
+
+def test_chains_are_fused_and_still_run(backend):
+
+    output = []
+    nodes = buildPipeline(backend, output)
+    graph = backend.DataflowGraph(nodes)
+
+    assert [[node.name for node in chain] for chain in graph.findChains()] == [["Sensor", "Filter"]]
+
+    compiled = graph.compile()
+    assert len(compiled) == 4
+    assert isinstance(compiled[0], backend.FusedChain)
+
+    backend.runConcurrently(compiled)
+    assert output and output[-1] % 2 == 1
+    assert nodes[1].getMetrics()['iterations'] > 5
+
+
+def test_dead_buses_are_reported():
+
+    graph = rr.DataflowGraph(buildPipeline(rr, []))
+    unread, unwritten = graph.findDeadBuses()
+
+    assert [bus.name for bus in unread] == ["debug"]
+    assert [bus.name for bus in unwritten] == ["config"]
+    assert "debug" in graph.report()
+
+
+def test_placeholder_buses_are_not_reported():
+
+    termination_bus = rr.Bus(False, "Termination")
+    traced_bus = rr.Bus(0, "Traced", stamped=True)
+    graph = rr.DataflowGraph([rr.Producer(lambda: 1, traced_bus, 0.01, termination_bus, "Producer"),
+                              rr.LatencyTracer(traced_bus, termination_buses=termination_bus, name="Tracer")])
+
+    assert graph.findDeadBuses() == ([], [])
+
+
+def test_cycles_are_found():
+
+    termination_bus = rr.Bus(False, "Termination")
+    bus_a, bus_b, bus_c = rr.Bus(1, "a"), rr.Bus(0, "b"), rr.Bus(0, "c")
+    first = rr.ConsumerProducer(lambda value: value + 1, bus_a, bus_b, 0.01, termination_bus, "First")
+    second = rr.ConsumerProducer(lambda value: (value, -value), bus_b, (bus_c, bus_a), 0.01, termination_bus,
+                                 "Second")
+    third = rr.Consumer(lambda value: None, bus_c, 0.02, termination_bus, "Third")
+    self_loop = rr.ConsumerProducer(lambda value: value, bus_a, bus_a, 0, termination_bus, "Self loop")
+
+    assert rr.DataflowGraph([first, second, third]).findCycles() == [[first, second]]
+    assert rr.DataflowGraph([self_loop]).findCycles() == [[self_loop]]
+
+
+def test_nodes_with_different_rates_are_not_fused():
+
+    termination_bus = rr.Bus(False, "Termination")
+    bus = rr.Bus(0, "Bus")
+    producer = rr.Producer(lambda: 1, bus, 0.01, termination_bus, "Producer")
+
+    slow = rr.Consumer(lambda value: None, bus, 0.02, termination_bus, "Slow")
+    assert rr.DataflowGraph([producer, slow]).findChains() == []
+
+    matching = rr.Consumer(lambda value: None, bus, 0.01, termination_bus, "Matching")
+    assert len(rr.DataflowGraph([producer, matching]).findChains()) == 1
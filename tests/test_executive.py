@@ -0,0 +1,65 @@
+"""
+Tests of the single-threaded cyclic executive backend
+"""
+
+import threading
+import time
+
+import rossros as rr
+
+
+def test_nodes_share_one_thread_and_keep_their_rates():
+
+    termination_bus = rr.Bus(False, "Termination")
+    data_bus = rr.Bus(0, "Data")
+    threads = set()
+    starts = []
+    triggered = []
+
+    def fast():
+        threads.add(threading.get_ident())
+        starts.append(time.monotonic())
+
+    def slow():
+        threads.add(threading.get_ident())
+        return time.monotonic()
+
+    nodes = [rr.Producer(fast, rr.Bus(0, "Fast"), 0.02, termination_bus, "Fast", fixed_rate=True),
+             rr.Producer(slow, data_bus, 0.1, termination_bus, "Slow"),
+             rr.Consumer(lambda value: triggered.append(value), data_bus, 0, termination_bus, "Triggered",
+                         trigger='any'),
+             rr.Timer(termination_bus, 0.5, 0.01, termination_bus, "Timer")]
+    rr.runConcurrently(nodes, execution='executive')
+
+    assert len(threads) == 1
+    periods = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert abs(sum(periods) / len(periods) - 0.02) < 0.004
+
+    # The triggered node ran once on the initial value and once for each write
+    assert 4 <= len(triggered) <= 7
+
+
+def test_priority_orders_nodes_that_are_due_together():
+
+    termination_bus = rr.Bus(False, "Termination")
+    order = []
+    nodes = [rr.Producer(lambda: order.append("low"), rr.Bus(0, "Low"), 0.05, termination_bus, "Low", priority=2),
+             rr.Producer(lambda: order.append("high"), rr.Bus(0, "High"), 0.05, termination_bus, "High",
+                         priority=1)]
+    executive = rr.CyclicExecutive(nodes)
+    threading.Timer(0.01, termination_bus.set_message, (True, "test")).start()
+    executive()
+
+    assert order[:2] == ["high", "low"]
+
+
+def test_shutdown_is_immediate():
+
+    termination_bus = rr.Bus(False, "Termination")
+    nodes = [rr.Producer(lambda: 1, rr.Bus(0, "Output"), 5.0, termination_bus, "Slow"),
+             rr.Timer(termination_bus, 0.2, 0, termination_bus, "Timer")]
+
+    started = time.monotonic()
+    rr.runConcurrently(nodes, execution='executive')
+
+    assert time.monotonic() - started < 1
@@ -0,0 +1,56 @@
+"""
+Tests of the undecorated fast methods that buses and consumer-producers install when DEBUG logging is off
+"""
+
+import logging
+
+import pytest
+
+import rossros as rr
+
+
+@pytest.fixture
+def fast_methods_mode():
+
+    # Put back automatic selection of the fast methods after each test
+    yield rr.setFastMethods
+    rr.setFastMethods(None)
+
+
+def test_fast_methods_skip_the_decorators(fast_methods_mode):
+
+    fast_methods_mode(True)
+    bus = rr.Bus(0, "Bus")
+    node = rr.ConsumerProducer(lambda x: x, bus, bus, 0, rr.Bus(False, "Termination"), "Node")
+
+    # The instance attributes shadow the logged methods on the class, and behave the same way
+    assert 'set_message' in vars(bus)
+    assert 'collectbusesToValues' in vars(node)
+    bus.set_message(5, "test")
+    assert bus.get_message("test") == 5
+    assert node.collectbusesToValues(node.input_buses) == [5]
+
+
+def test_logged_methods_still_log(fast_methods_mode, caplog):
+
+    fast_methods_mode(False)
+    bus = rr.Bus(0, "Logged bus")
+
+    assert 'set_message' not in vars(bus)
+    with caplog.at_level(logging.DEBUG):
+        bus.set_message(1, "test")
+    assert "Logged bus: Initiating write by test" in caplog.text
+
+
+def test_automatic_mode_follows_the_logging_level(fast_methods_mode):
+
+    fast_methods_mode(None)
+    logger = logging.getLogger(rr.__name__)
+    level = logger.level
+    try:
+        logger.setLevel(logging.DEBUG)
+        assert 'get_message' not in vars(rr.Bus(0, "Debug bus"))
+        logger.setLevel(logging.INFO)
+        assert 'get_message' in vars(rr.Bus(0, "Quiet bus"))
+    finally:
+        logger.setLevel(level)
@@ -0,0 +1,59 @@
+"""
+Tests of fixed-rate scheduling, where the time spent inside a cycle is taken out of the pause rather than added
+to the period
+"""
+
+import time
+
+import rossros as rr
+
+
+def runFor(backend, node, duration):
+
+    termination_bus = node.termination_buses[0]
+    timer = backend.Timer(termination_bus, duration, 0.01, termination_bus, "Timer")
+    backend.runConcurrently([node, timer])
+
+
+def test_fixed_rate_keeps_the_period(backend):
+
+    starts = []
+
+    def work():
+        starts.append(time.monotonic())
+        time.sleep(0.008)
+
+    node = backend.Producer(work, backend.Bus(0, "Output"), 0.02, backend.Bus(False, "Termination"), "Fixed",
+                            fixed_rate=True)
+    runFor(backend, node, 0.5)
+
+    periods = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert abs(sum(periods) / len(periods) - 0.02) < 0.004
+
+    # The work fits in the period, so overruns only come from the odd late wake-up on a busy machine
+    assert node.overruns <= len(periods) // 10
+
+
+def test_delay_adds_to_the_cycle_without_fixed_rate(backend):
+
+    starts = []
+
+    def work():
+        starts.append(time.monotonic())
+        time.sleep(0.008)
+
+    node = backend.Producer(work, backend.Bus(0, "Output"), 0.02, backend.Bus(False, "Termination"), "Polling")
+    runFor(backend, node, 0.5)
+
+    periods = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert sum(periods) / len(periods) > 0.026
+
+
+def test_overruns_skip_missed_periods():
+
+    node = rr.Producer(lambda: time.sleep(0.05), rr.Bus(0, "Output"), 0.02, rr.Bus(False, "Termination"),
+                       "Overrunning", fixed_rate=True)
+    runFor(rr, node, 0.3)
+
+    assert node.overruns > 0
+    assert node.skipped_cycles >= node.overruns
@@ -0,0 +1,134 @@
+"""
+Tests of the ring-buffer history bus and its overflow policies
+"""
+
+import threading
+import time
+
+import pytest
+
+import rossros as rr
+import rossros_asyncio as rra
+
+
+def test_drain_returns_each_sample_once():
+
+    bus = rr.HistoryBus(0, "History", capacity=4)
+    for value in range(3):
+        bus.set_message(value, "writer")
+
+    assert bus.drain("reader") == [0, 1, 2]
+    assert bus.drain("reader") == []
+    assert bus.get_message("reader") == 2
+
+
+def test_drop_oldest_keeps_the_newest_samples():
+
+    bus = rr.HistoryBus(0, "History", capacity=4)
+    bus.register_reader("reader")
+    for value in range(10):
+        bus.set_message(value, "writer")
+
+    assert bus.drain("reader") == [6, 7, 8, 9]
+    assert bus.dropped == 6
+
+
+def test_drop_newest_keeps_the_oldest_samples():
+
+    bus = rr.HistoryBus(0, "History", capacity=4, overflow='drop_newest')
+    bus.register_reader("reader")
+    for value in range(6):
+        bus.set_message(value, "writer")
+
+    assert bus.drain("reader") == [0, 1, 2, 3]
+    assert bus.get_message("reader") == 5
+    assert bus.dropped == 2
+
+
+def test_block_waits_for_the_reader():
+
+    bus = rr.HistoryBus(0, "History", capacity=2, overflow='block')
+    bus.register_reader("reader")
+    writer = threading.Thread(target=lambda: [bus.set_message(value, "writer") for value in range(6)])
+    writer.start()
+
+    samples = []
+    while len(samples) < 6:
+        samples += bus.drain("reader")
+        time.sleep(0.01)
+    writer.join()
+
+    assert samples == list(range(6))
+    assert bus.dropped == 0
+
+
+def test_block_gives_up_on_a_stalled_reader():
+
+    bus = rr.HistoryBus(0, "History", capacity=4, overflow='block', block_timeout=0.1)
+    bus.register_reader("reader")
+
+    started = time.monotonic()
+    for value in range(6):
+        bus.set_message(value, "writer")
+
+    assert time.monotonic() - started < 1
+    assert "reader" not in bus.read_counts
+
+    # The reader picks up from the oldest sample still in the ring when it comes back
+    assert bus.drain("reader") == [2, 3, 4, 5]
+
+
+def test_stopped_node_no_longer_blocks_the_writer():
+
+    pytest.importorskip("numpy")
+    bus = rr.HistoryBus(0, "History", capacity=4, overflow='block', block_timeout=30)
+    termination_bus = rr.Bus(False, "Termination")
+    node = rr.BatchConsumerProducer(lambda samples: None, bus, rr.Bus(0, "Output"), 0.01, termination_bus, "Batch")
+    assert node in bus.read_counts
+
+    termination_bus.set_message(True, "test")
+    node()
+
+    started = time.monotonic()
+    for value in range(10):
+        bus.set_message(value, "writer")
+    assert time.monotonic() - started < 1
+
+
+def test_asyncio_history_bus_cannot_block():
+
+    with pytest.raises(ValueError):
+        rra.HistoryBus(0, "History", overflow='block')
+
+
+def test_readers_with_the_same_name_are_kept_apart():
+
+    bus = rr.HistoryBus(0, "History", capacity=8)
+    first, second = object(), object()
+    bus.register_reader("Reader", first)
+    bus.register_reader("Reader", second)
+    for value in range(3):
+        bus.set_message(value, "writer")
+
+    assert bus.drain("Reader", first) == [0, 1, 2]
+    assert bus.drain("Reader", second) == [0, 1, 2]
+
+
+def test_batch_nodes_with_the_default_name_each_get_every_sample():
+
+    pytest.importorskip("numpy")
+    bus = rr.HistoryBus(0, "History", capacity=8)
+    termination_bus = rr.Bus(False, "Termination")
+    batches = [[], []]
+    nodes = [rr.BatchConsumerProducer(lambda samples, batch=batch: batch.extend(samples.tolist()), bus, (), 0,
+                                      termination_bus)
+             for batch in batches]
+    assert nodes[0].name == nodes[1].name
+
+    for value in range(3):
+        bus.set_message(value, "writer")
+    for node in nodes:
+        node.startSchedule()
+        node.callFunction(node.collectbusesToValues(node.input_buses))
+
+    assert batches == [[0, 1, 2], [0, 1, 2]]
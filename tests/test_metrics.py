@@ -0,0 +1,56 @@
+"""
+Tests of the per-node runtime metrics
+"""
+
+import time
+
+import rossros as rr
+
+
+def test_node_metrics_count_cycles_and_traffic(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    bus = backend.Bus(0, "Data")
+    producer = backend.Producer(lambda: time.sleep(0.002) or 1, bus, 0.02, termination_bus, "Producer",
+                                fixed_rate=True)
+    consumer = backend.Consumer(lambda value: None, bus, 0.02, termination_bus, "Consumer")
+    backend.runConcurrently([producer, consumer, backend.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")])
+
+    metrics = producer.getMetrics()
+    assert metrics['iterations'] >= 10
+    assert metrics['bus_writes']['Data'] == metrics['iterations']
+    assert 0.002 <= metrics['function_time_mean'] <= metrics['function_time_max']
+    assert abs(metrics['period_mean'] - 0.02) < 0.005
+    assert metrics['period_min'] <= metrics['period_mean'] <= metrics['period_max']
+    assert sum(metrics['function_time_histogram'].values()) == metrics['iterations']
+    assert consumer.getMetrics()['bus_reads']['Data'] == consumer.getMetrics()['iterations']
+
+
+def test_metrics_are_published_to_a_bus(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    metrics_bus = backend.Bus({}, "Metrics")
+    nodes = [backend.Producer(lambda: 1, backend.Bus(0, "Data"), 0.01, termination_bus, "Producer"),
+             backend.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes, metrics_bus=metrics_bus, metrics_delay=0.05)
+
+    snapshot = metrics_bus.get_message("test")
+    assert "Producer" in snapshot
+    assert snapshot["Producer"]['iterations'] > 0
+
+    table = rr.formatMetrics(snapshot).splitlines()
+    assert table[0].split()[:2] == ["node", "cycles"]
+    assert any(line.startswith("Producer") for line in table[1:])
+
+
+def test_metrics_of_process_nodes_are_not_published(caplog):
+
+    # Every node runs in its own process, so there are no metrics to publish
+    termination_bus = rr.ProcessBus(False, "Termination", 64)
+    metrics_bus = rr.Bus({}, "Metrics")
+    nodes = [rr.Producer(lambda: 1, rr.ProcessBus(0, "Data", 64), 0.01, termination_bus, "Producer"),
+             rr.Timer(termination_bus, 0.2, 0.01, termination_bus, "Timer")]
+    rr.runConcurrently(nodes, execution='process', metrics_bus=metrics_bus, metrics_delay=0.05)
+
+    assert metrics_bus.get_message("test") == {}
+    assert "their metrics are not published to Metrics" in caplog.text
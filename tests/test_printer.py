@@ -0,0 +1,74 @@
+"""
+Tests of the buffered printer
+"""
+
+import io
+import time
+
+import pytest
+
+import rossros as rr
+
+
+class SlowSink(io.StringIO):
+
+    # A terminal that takes a while to take each write
+    def write(self, text):
+        time.sleep(0.05)
+        return super().write(text)
+
+
+def test_lines_are_formatted_in_columns():
+
+    buses = (rr.Bus(0, "A"), rr.Bus(0, "B"), rr.Bus(0, "C"))
+    sink = io.StringIO()
+    printer = rr.Printer(buses, 0, name="Printer", print_prefix="Values {x}: ", sink=sink)
+    printer.startSchedule()
+    printer.print_bus(1, -2.5, "text")
+    printer.print_bus(123456789.0, {'k': 1}, True)
+    printer.close()
+
+    assert sink.getvalue().splitlines() == ["Values {x}:   1          -2.5        text       ",
+                                            "Values {x}:   1.235e+08  {'k': 1}     1         "]
+
+
+@pytest.mark.parametrize('overflow', ['coalesce', 'drop'])
+def test_slow_sink_does_not_hold_up_the_loop(backend, overflow):
+
+    termination_bus = backend.Bus(False, "Termination")
+    bus = backend.Bus(0, "Counter")
+    counter = [0]
+
+    def count():
+        counter[0] += 1
+        return counter[0]
+
+    sink = SlowSink()
+    printer = backend.Printer(bus, 0.001, termination_bus, "Printer", "Count: ", queue_size=4, overflow=overflow,
+                              sink=sink)
+    nodes = [backend.Producer(count, bus, 0.001, termination_bus, "Counter"), printer,
+             backend.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes)
+
+    lines = sink.getvalue().splitlines()
+    assert printer.metrics.iterations > 2 * len(lines)
+    assert printer.dropped_lines > 0
+    if overflow == 'coalesce':
+        assert int(lines[-1].split()[-1]) >= counter[0] - 5
+
+
+def test_failing_printer_does_not_leave_its_writer_running(backend):
+
+    printer = backend.Printer(backend.Bus(None, "Bus"), 0.01, backend.Bus(False, "Termination"), "Printer",
+                              sink=io.StringIO())
+
+    with pytest.raises(TypeError):
+        backend.runConcurrently([printer])
+
+    assert printer.writer_thread is None
+
+
+def test_unknown_overflow_policy_is_rejected():
+
+    with pytest.raises(ValueError):
+        rr.Printer(rr.Bus(0, "Bus"), overflow='block')
@@ -0,0 +1,54 @@
+"""
+Tests of the multiprocess execution backend and of process-shared buses
+"""
+
+import os
+
+import pytest
+
+import rossros as rr
+
+
+def test_process_nodes_exchange_data_through_process_buses():
+
+    termination_bus = rr.ProcessBus(False, "Termination", 64)
+    pid_bus = rr.ProcessBus(0, "Producer pid", 64)
+    result_bus = rr.ProcessBus(None, "Result", 256)
+    nodes = [rr.Producer(os.getpid, pid_bus, 0.01, termination_bus, "Producer"),
+             rr.ConsumerProducer(lambda pid: (pid, os.getpid()), pid_bus, result_bus, 0.01, termination_bus,
+                                 "Consumer", execution='thread'),
+             rr.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")]
+    rr.runConcurrently(nodes, execution='process')
+
+    producer_pid, consumer_pid = result_bus.get_message("test")
+    assert producer_pid not in (0, os.getpid())
+    assert consumer_pid == os.getpid()
+
+
+def test_failed_process_raises():
+
+    def fail():
+        raise RuntimeError("failed")
+
+    termination_bus = rr.ProcessBus(False, "Termination", 64)
+    with pytest.raises(RuntimeError, match="process exited"):
+        rr.runConcurrently([rr.Producer(fail, rr.Bus(0, "Output"), 0.01, termination_bus, "Failing",
+                                        execution='process')])
+
+
+def test_process_bus_round_trip_and_size_limit():
+
+    bus = rr.ProcessBus(0, "Bus", 128, stamped=True)
+    bus.set_message({'a': [1, 2]}, "writer")
+
+    assert bus.get_message("reader") == {'a': [1, 2]}
+    assert bus.version == 1
+    assert bus.stamp.writer == "writer"
+    with pytest.raises(ValueError):
+        bus.set_message(b'x' * 1000, "writer")
+
+
+def test_unknown_execution_backend_is_rejected():
+
+    with pytest.raises(ValueError):
+        rr.Producer(lambda: 0, rr.Bus(0, "Output"), execution='gpu')
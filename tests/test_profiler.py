@@ -0,0 +1,105 @@
+"""
+Tests of per-node profiling in trace and sample modes
+"""
+
+import pstats
+import time
+
+import pytest
+
+import rossros as rr
+import rossros_asyncio as rra
+
+
+def busy():
+    total = 0
+    for i in range(20000):
+        total += i
+    return total
+
+
+def spin():
+    start = time.perf_counter()
+    while time.perf_counter() - start < 0.03:
+        pass
+    return 1
+
+
+def runProfiled(backend, directory, profile, **kwargs):
+
+    # One node that adds up numbers and one that spins, so that each shows up in its own profile
+    if kwargs.get('execution') == 'process':
+        termination_bus = rr.ProcessBus(False, "Termination", 64)
+    else:
+        termination_bus = backend.Bus(False, "Termination")
+    nodes = [backend.Producer(busy, backend.Bus(0, "Busy"), 0.01, termination_bus, "busy node"),
+             backend.Producer(spin, backend.Bus(0, "Spin"), 0.01, termination_bus, "spin node"),
+             backend.Timer(termination_bus, 0.4, 0, termination_bus, "Timer")]
+    backend.runConcurrently(nodes, profile=profile, profile_directory=str(directory), **kwargs)
+
+    return sorted(path.name for path in directory.iterdir())
+
+
+def test_trace_profiles_each_node_separately(backend, tmp_path):
+
+    files = runProfiled(backend, tmp_path, True)
+    assert "summary.prof" in files
+    assert "summary.txt" in files
+
+    # The node profile only holds the functions the node ran
+    function_names = {function[2] for function in pstats.Stats(str(tmp_path / "busy_node.prof")).stats}
+    assert "busy" in function_names
+    assert "spin" not in function_names
+
+
+def test_sample_profiles_are_folded_stacks(backend, tmp_path):
+
+    files = runProfiled(backend, tmp_path, 'sample')
+    assert "summary.folded" in files
+    assert "spin (" in (tmp_path / "summary.folded").read_text()
+
+    node_stacks = (tmp_path / "spin_node.folded").read_text()
+    assert "spin (" in node_stacks
+    assert "busy (" not in node_stacks
+
+
+@pytest.mark.parametrize('execution', ['pool', 'process'])
+@pytest.mark.parametrize('profile', [True, 'sample'])
+def test_summaries_for_other_executions(tmp_path, profile, execution):
+
+    files = runProfiled(rr, tmp_path, profile, execution=execution)
+    assert "summary.txt" in files
+    if profile == 'sample':
+        assert "spin (" in (tmp_path / "summary.folded").read_text()
+    else:
+        assert "summary.prof" in files
+
+
+def test_trace_falls_back_to_sampling_without_per_thread_traces(tmp_path, monkeypatch, caplog):
+
+    # Pretend to be on a Python version whose cProfile traces every thread at once
+    monkeypatch.setattr(rr.Profiler, 'per_thread_traces', False)
+
+    files = runProfiled(rr, tmp_path, True)
+    assert "summary.folded" in files
+    assert not any(name.endswith(".prof") for name in files)
+    assert "profiled by sampling instead" in caplog.text
+
+
+def test_trace_of_a_single_thread_is_kept_without_per_thread_traces(tmp_path, monkeypatch):
+
+    # The executive runs every node in one thread, so it can still be traced
+    monkeypatch.setattr(rr.Profiler, 'per_thread_traces', False)
+
+    files = runProfiled(rr, tmp_path, True, execution='executive')
+    assert "summary.prof" in files
+
+
+def test_asyncio_trace_falls_back_to_sampling_with_thread_executors(tmp_path, monkeypatch, caplog):
+
+    # Functions in the thread executor would show up in the event loop's trace
+    monkeypatch.setattr(rr.Profiler, 'per_thread_traces', False)
+
+    files = runProfiled(rra, tmp_path, True, execution='thread')
+    assert "summary.folded" in files
+    assert "profiled by sampling instead" in caplog.text
@@ -0,0 +1,131 @@
+"""
+Tests of recording bus writes to a log and replaying them
+"""
+
+import threading
+import time
+
+import pytest
+
+import rossros as rr
+
+
+def recordRun(backend, path, **options):
+
+    # Record a fast counter and a slower structured message for a short while
+    termination_bus = backend.Bus(False, "Termination")
+    counter_bus = backend.Bus(0, "counter")
+    status_bus = backend.Bus("", "status")
+    counter = [0]
+
+    def count():
+        counter[0] += 1
+        return counter[0]
+
+    recorder = backend.Recorder((counter_bus, status_bus), str(path), 0.05, termination_bus, "Recorder")
+    nodes = [backend.Producer(count, counter_bus, 0.002, termination_bus, "Counter"),
+             backend.Producer(lambda: {'count': counter[0], 'ok': True}, status_bus, 0.02, termination_bus,
+                              "Status"),
+             recorder,
+             backend.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes, **options)
+
+    return recorder, counter[0]
+
+
+@pytest.mark.parametrize('execution', ['thread', 'executive'])
+def test_every_write_is_recorded(tmp_path, execution):
+
+    recorder, count = recordRun(rr, tmp_path / "run.log", execution=execution)
+    log = rr.BusLog(str(tmp_path / "run.log"))
+
+    counts = [message for _timestamp, name, message in log if name == "counter"]
+    assert len(log) == recorder.record_count
+
+    # Writes made while the recorder is running are all captured, in order (the counter may get a write in just
+    # before the recorder starts, or just after it stops)
+    assert counts == list(range(counts[0], counts[-1] + 1))
+    assert counts[0] <= 2 and counts[-1] >= count - 1
+    assert any(name == "status" and message['ok'] for _timestamp, name, message in log)
+
+
+def test_replay_in_real_time_and_as_fast_as_possible(backend, tmp_path):
+
+    path = tmp_path / "run.log"
+    recordRun(backend, path)
+    log = rr.BusLog(str(path))
+    span = log.timestamp(len(log) - 1)
+
+    for speed in (1.0, None):
+        termination_bus = backend.Bus(False, "Replay termination")
+        counter_bus = backend.Bus(0, "counter")
+        replayer = backend.Replayer(counter_bus, str(path), termination_bus, "Replayer", speed=speed,
+                                    end_buses=termination_bus)
+
+        started = time.monotonic()
+        backend.runConcurrently([replayer])
+        elapsed = time.monotonic() - started
+
+        assert counter_bus.get_message("test") == [message for _timestamp, name, message in log
+                                                    if name == "counter"][-1]
+        if speed is None:
+            assert elapsed < span
+        else:
+            assert elapsed >= span * 0.9
+
+
+def test_recorder_closes_its_log_when_it_fails(tmp_path):
+
+    class FailingRecorder(rr.Recorder):
+        def record(self):
+            raise RuntimeError("failed")
+
+    recorder = FailingRecorder(rr.Bus(0, "Bus"), str(tmp_path / "run.log"), 0.01, rr.Bus(False, "Termination"),
+                               "Recorder")
+    with pytest.raises(RuntimeError):
+        rr.runConcurrently([recorder])
+
+    assert recorder.writer_thread is None
+
+
+def test_concurrent_writers_are_recorded_exactly(tmp_path):
+
+    bus = rr.Bus(0, "Shared")
+    recorder = rr.Recorder(bus, str(tmp_path / "run.log"), 0.01, rr.Bus(False, "Termination"), "Recorder")
+    recorder.startSchedule()
+
+    # Two threads write to the same bus as fast as they can, so writes land between each other's listener calls
+    def write(writer):
+        for idx in range(20000):
+            bus.set_message((writer, idx), "Writer {0:d}".format(writer))
+
+    writers = [threading.Thread(target=write, args=(writer,)) for writer in range(2)]
+    for writer_thread in writers:
+        writer_thread.start()
+    for writer_thread in writers:
+        writer_thread.join()
+    recorder.stopSchedule()
+
+    # Every message written is in the log once, in the order each writer wrote it
+    messages = [message for _timestamp, _name, message in rr.BusLog(str(tmp_path / "run.log"))]
+    assert len(messages) == 40000
+    for writer in range(2):
+        assert [idx for message_writer, idx in messages if message_writer == writer] == list(range(20000))
+
+
+def test_grouped_and_array_writes_are_recorded(tmp_path):
+
+    x_bus, y_bus = rr.Bus(0, "x"), rr.Bus(0, "y")
+    group = rr.BusGroup((x_bus, y_bus), "Pose")
+    array_bus = rr.ArrayBus((2,), float, 0, "Array")
+    recorder = rr.Recorder((x_bus, y_bus, array_bus), str(tmp_path / "run.log"), 0.01,
+                           rr.Bus(False, "Termination"), "Recorder")
+    recorder.startSchedule()
+    group.set_messages((1, 2), "Writer")
+    array_bus.set_message(3.0, "Writer")
+    array_bus.set_message(4.0, "Writer")
+    recorder.stopSchedule()
+
+    log = [(name, message) for _timestamp, name, message in rr.BusLog(str(tmp_path / "run.log"))]
+    assert log[:2] == [("x", 1), ("y", 2)]
+    assert [list(message) for _name, message in log[2:]] == [[3.0, 3.0], [4.0, 4.0]]
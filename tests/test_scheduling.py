@@ -0,0 +1,107 @@
+"""
+Tests of the per-node CPU affinity, nice value and real-time priority settings. The settings are read back from
+inside the node functions, so these tests only run on Linux, where each thread is scheduled on its own
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+import rossros as rr
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="per-thread scheduling needs Linux")
+
+
+def readSettings():
+
+    # The affinity, nice value and scheduling policy of the calling thread
+    thread_id = threading.get_native_id()
+    return (os.sched_getaffinity(thread_id), os.getpriority(os.PRIO_PROCESS, thread_id),
+            os.sched_getscheduler(thread_id))
+
+
+def canUseRealtime():
+
+    # Try the real-time policy in a throwaway thread, as the process may not have the privileges for it
+    result = []
+
+    def probe():
+        try:
+            os.sched_setscheduler(threading.get_native_id(), os.SCHED_FIFO, os.sched_param(1))
+            result.append(True)
+        except OSError:
+            result.append(False)
+
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    probe_thread.join()
+
+    return result[0]
+
+
+def lastCpu():
+    return max(os.sched_getaffinity(0))
+
+
+def runWithProbe(execution, **settings):
+
+    # Run a node with the given settings next to one without, and return what each saw from inside its function
+    termination_bus = rr.ProcessBus(False, "Termination bus", 64)
+    result_bus = rr.ProcessBus(None, "Result bus", 4096)
+    other_settings = []
+
+    node = rr.Producer(lambda: result_bus.set_message(readSettings(), "node"), rr.Bus(0, "Node output"), 0.01,
+                       termination_bus, "Node", execution=execution, **settings)
+    other = rr.Producer(lambda: other_settings.append(readSettings()), rr.Bus(0, "Other output"), 0.01,
+                        termination_bus, "Other")
+    timer = rr.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")
+
+    rr.runConcurrently([node, other, timer])
+
+    return result_bus.get_message("test"), other_settings[-1]
+
+
+@pytest.mark.parametrize('execution', ['thread', 'process'])
+def test_affinity_and_nice_are_applied_to_the_node_only(execution):
+
+    node_settings, other_settings = runWithProbe(execution, cpu_affinity=[lastCpu()], nice=5)
+
+    assert node_settings[0] == {lastCpu()}
+    assert node_settings[1] == 5
+
+    # The node next to it keeps the settings of the process
+    assert other_settings[0] == os.sched_getaffinity(0)
+    assert other_settings[1] == os.getpriority(os.PRIO_PROCESS, 0)
+
+
+@pytest.mark.parametrize('execution', ['thread', 'process'])
+def test_realtime_priority_is_applied(execution):
+
+    if not canUseRealtime():
+        pytest.skip("the process cannot use the real-time scheduling policy")
+
+    node_settings, other_settings = runWithProbe(execution, realtime_priority=10)
+
+    assert node_settings[2] == os.SCHED_FIFO
+    assert other_settings[2] == os.sched_getscheduler(0)
+
+
+def test_missing_privileges_do_not_stop_the_node(caplog):
+
+    if canUseRealtime():
+        pytest.skip("the process can use the real-time scheduling policy")
+
+    node_settings, _other_settings = runWithProbe('thread', realtime_priority=10)
+
+    assert node_settings is not None
+    assert "could not set real-time priority" in caplog.text
+
+
+def test_realtime_priority_must_be_in_range():
+
+    with pytest.raises(ValueError):
+        rr.Producer(lambda: 0, rr.Bus(0, "Output"), realtime_priority=0)
+    with pytest.raises(ValueError):
+        rr.Producer(lambda: 0, rr.Bus(0, "Output"), realtime_priority=100)
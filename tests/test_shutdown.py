@@ -0,0 +1,60 @@
+"""
+Tests of event-based shutdown
+"""
+
+import gc
+import time
+import weakref
+
+import pytest
+
+import rossros as rr
+import rossros_asyncio as rra
+
+
+@pytest.mark.parametrize('execution', ['thread', 'executive', 'pool'])
+def test_sleeping_nodes_stop_straight_away(execution):
+
+    termination_bus = rr.Bus(False, "Termination")
+    nodes = [rr.Producer(lambda: 1, rr.Bus(0, "Output"), 5.0, termination_bus, "Slow"),
+             rr.Timer(termination_bus, 0.2, 0, termination_bus, "Timer")]
+
+    started = time.monotonic()
+    rr.runConcurrently(nodes, execution=execution)
+
+    assert time.monotonic() - started < 1
+
+
+def test_sleeping_tasks_stop_straight_away():
+
+    termination_bus = rra.Bus(False, "Termination")
+    nodes = [rra.Producer(lambda: 1, rra.Bus(0, "Output"), 5.0, termination_bus, "Slow"),
+             rra.Timer(termination_bus, 0.2, 0, termination_bus, "Timer")]
+
+    started = time.monotonic()
+    rra.runConcurrently(nodes)
+
+    assert time.monotonic() - started < 1
+
+
+def test_termination_value_before_start_stops_the_node():
+
+    termination_bus = rr.Bus(True, "Termination")
+    calls = []
+    rr.Producer(lambda: calls.append(1), rr.Bus(0, "Output"), 0.01, termination_bus, "Producer")()
+
+    assert not calls
+
+
+def test_nodes_on_the_default_termination_bus_can_be_freed():
+
+    node = rr.Producer(lambda: 1, rr.Bus(0, "Output"), 0.01, name="Producer")
+    default_bus = node.termination_buses[0]
+
+    reference = weakref.ref(node)
+    del node
+    gc.collect()
+
+    assert reference() is None
+    assert default_bus.placeholder
+    assert not default_bus.listeners
@@ -0,0 +1,54 @@
+"""
+Tests of the lock-free single-writer bus
+"""
+
+import threading
+
+import rossros as rr
+
+
+def test_reads_match_writes():
+
+    bus = rr.SingleWriterBus(0, "Bus")
+    bus.set_message(3, "writer")
+
+    assert bus.get_message("reader") == 3
+    assert bus.version == 1
+
+
+def test_reader_never_sees_a_torn_stamped_write():
+
+    bus = rr.SingleWriterBus(0, "Bus", stamped=True)
+    stop = threading.Event()
+    mismatches = []
+
+    def write():
+        for count in range(1, 20001):
+            bus.set_message(count, "writer")
+        stop.set()
+
+    def read():
+        while not stop.is_set():
+            message, stamp = bus.get_stamped_message("reader")
+            if stamp is not None and stamp.sequence != message:
+                mismatches.append((message, stamp))
+
+    threads = [threading.Thread(target=write), threading.Thread(target=read)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not mismatches
+    assert bus.get_stamped_message("reader")[1].sequence == bus.version == 20000
+
+
+def test_works_as_a_node_output(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    bus = backend.SingleWriterBus(0, "Output")
+    nodes = [backend.Producer(lambda: 7, bus, 0.01, termination_bus, "Writer"),
+             backend.Timer(termination_bus, 0.1, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes)
+
+    assert bus.get_message("test") == 7
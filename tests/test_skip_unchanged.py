@@ -0,0 +1,61 @@
+"""
+Tests of skipping node cycles whose inputs have not changed
+"""
+
+import numpy as np
+import pytest
+
+import rossros as rr
+
+
+@pytest.mark.parametrize('mode', ['version', 'value'])
+def test_unchanged_cycles_are_skipped(backend, mode):
+
+    termination_bus = backend.Bus(False, "Termination")
+    source_bus, output_bus = backend.Bus(0, "Source"), backend.Bus(None, "Output")
+
+    # The source writes every cycle, but only changes its value every fifth cycle
+    counter = iter(range(10 ** 9))
+    calls = []
+    writes = []
+
+    def scale(value):
+        calls.append(value)
+        return value * 10
+
+    node = backend.ConsumerProducer(scale, source_bus, output_bus, 0.003, termination_bus, "Scale",
+                                    skip_unchanged=mode)
+    output_bus.add_listener(lambda: writes.append(output_bus.get_message("test")))
+    backend.runConcurrently([backend.Producer(lambda: next(counter) // 5, source_bus, 0.01, termination_bus,
+                                              "Source"),
+                             node,
+                             backend.Timer(termination_bus, 0.3, 0, termination_bus, "Timer")])
+
+    # Skipped cycles neither call the function nor write the outputs
+    assert node.getMetrics()['skipped_calls'] > 0
+    assert len(writes) == len(calls)
+    if mode == 'value':
+        assert len(calls) <= len(set(calls)) + 1
+
+
+def test_value_mode_compares_arrays():
+
+    array_bus = rr.ArrayBus((3,), float, 0, "Array")
+    node = rr.ConsumerProducer(lambda array: array.sum(), array_bus, rr.Bus(0, "Sum"), 0,
+                               rr.Bus(False, "Termination"), "Sum", skip_unchanged='value')
+    node.startSchedule()
+
+    for value, skipped in ((1, False), (1, True), (2, False), (2, True)):
+        array_bus.set_message(value)
+        skipped_calls = node.skipped_calls
+        node.callFunction(node.collectbusesToValues(node.input_buses))
+        assert (node.skipped_calls > skipped_calls) == skipped
+
+    # Messages that cannot be compared count as changed
+    assert not rr.sameMessage([np.zeros(2)], [np.zeros(2)])
+
+
+def test_unknown_mode():
+
+    with pytest.raises(ValueError):
+        rr.ConsumerProducer(abs, rr.Bus(), rr.Bus(), skip_unchanged='hash')
@@ -0,0 +1,74 @@
+"""
+Tests of stamped messages and end-to-end latency tracing
+"""
+
+import time
+
+import pytest
+
+import rossros as rr
+
+
+def test_stamps_record_the_writer_and_sequence():
+
+    bus = rr.Bus(0, "Bus", stamped=True)
+    bus.set_message(1, "writer")
+    bus.set_message(2, "writer")
+
+    message, stamp = bus.get_stamped_message("reader")
+    assert message == 2
+    assert stamp.sequence == bus.version == 2
+    assert stamp.writer == stamp.origin_writer == "writer"
+    assert stamp.origin_time == stamp.timestamp
+
+
+def test_origin_is_carried_through_the_graph(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    sensor_bus = backend.Bus(0, "sensor", stamped=True)
+    filtered_bus = backend.SingleWriterBus(0, "filtered", stamped=True)
+    command_bus = backend.HistoryBus(0, "command", stamped=True)
+    report_bus = backend.Bus({}, "Report")
+
+    def control(value):
+        time.sleep(0.003)
+        return value + 1
+
+    tracer = backend.LatencyTracer((sensor_bus, filtered_bus, command_bus), 0, termination_bus, "Tracer",
+                                   report_buses=report_bus)
+    nodes = [backend.Producer(lambda: 1.0, sensor_bus, 0.01, termination_bus, "Sensor"),
+             backend.ConsumerProducer(lambda value: value * 2, sensor_bus, filtered_bus, 0, termination_bus,
+                                      "Filter", trigger='any'),
+             backend.ConsumerProducer(control, filtered_bus, command_bus, 0, termination_bus, "Control",
+                                      trigger='any'),
+             tracer,
+             backend.Timer(termination_bus, 0.3, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes)
+
+    _message, stamp = command_bus.get_stamped_message("test")
+    assert stamp.writer == "Control"
+    assert stamp.origin_writer == "Sensor"
+    _samples, stamps = command_bus.drain_stamped("test")
+    assert all(sample_stamp.writer == "Control" for sample_stamp in stamps)
+
+    latencies = tracer.getLatencies()
+    assert set(latencies) == {"Sensor -> sensor", "Sensor -> filtered", "Sensor -> command"}
+    assert latencies["Sensor -> command"]['p50'] >= 0.003
+    assert latencies["Sensor -> sensor"]['max'] == 0
+    assert set(report_bus.get_message("test")) == set(latencies)
+
+
+def test_latency_tracer_needs_stamped_buses():
+
+    with pytest.raises(ValueError):
+        rr.LatencyTracer(rr.Bus(0, "Plain"))
+
+
+def test_process_bus_stamps():
+
+    bus = rr.ProcessBus(0, "Process bus", 256, stamped=True)
+    bus.set_message(5, "writer")
+
+    assert bus.get_message("reader") == 5
+    assert bus.stamp.writer == "writer"
+    assert bus.stamp.sequence == bus.version == 1
@@ -0,0 +1,128 @@
+"""
+Tests of the timer service, which runs all of the timers in one loop
+"""
+
+import importlib
+import threading
+import time
+
+import pytest
+
+import rossros as rr
+
+
+def test_timers_are_grouped_into_one_service():
+
+    timers = [rr.Timer(rr.Bus(0, "Timer bus"), 1, 0, name="Timer {0:d}".format(idx)) for idx in range(3)]
+    producer = rr.Producer(lambda: 1, rr.Bus(0, "Output"), name="Producer")
+
+    grouped = rr.groupTimers(timers + [producer], rr.TimerService)
+
+    services = [node for node in grouped if isinstance(node, rr.TimerService)]
+    assert len(services) == 1
+    assert services[0].timers == timers
+    assert producer in grouped
+
+
+@pytest.mark.parametrize('execution', ['thread', 'executive', 'process'])
+def test_each_timer_fires_once_at_its_time(execution):
+
+    if execution == 'process':
+        termination_bus = rr.ProcessBus(False, "Termination", 64)
+    else:
+        termination_bus = rr.Bus(False, "Termination")
+    buses = [rr.Bus(0, "Timer bus {0:d}".format(idx)) for idx in range(20)]
+    writes = [0] * len(buses)
+    for idx, bus in enumerate(buses):
+        bus.add_listener(lambda idx=idx: writes.__setitem__(idx, writes[idx] + 1))
+    timers = [rr.Timer(bus, 0.05 + 0.01 * idx, 0, termination_bus, "Timer {0:d}".format(idx))
+              for idx, bus in enumerate(buses)]
+    timers.append(rr.Timer(termination_bus, 0.4, 0, termination_bus, "Main timer"))
+
+    rr.runConcurrently(timers, execution=execution)
+
+    if execution != 'process':
+        assert writes == [1] * len(buses)
+        assert all(0 <= bus.get_message("test") < 0.05 for bus in buses)
+
+
+def test_countdown_is_written_every_delay(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    countdown_bus = backend.Bus(0, "Countdown")
+    countdowns = []
+    countdown_bus.add_listener(lambda: countdowns.append(countdown_bus.message))
+    backend.runConcurrently([backend.Timer(countdown_bus, 0.3, 0.1, termination_bus, "Ticking"),
+                             backend.Timer(termination_bus, 0.35, 0, termination_bus, "Main timer")])
+
+    assert len(countdowns) == 3
+    assert [round(countdown, 1) for countdown in countdowns] == [-0.2, -0.1, 0.0]
+
+
+def test_timer_that_expired_before_starting_still_fires(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    timer = backend.Timer(termination_bus, 0.01, 0, termination_bus, "Timer")
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    backend.runConcurrently([backend.Producer(lambda: 1, backend.Bus(0, "Output"), 0.01, termination_bus,
+                                              "Producer"), timer])
+
+    assert time.monotonic() - started < 1
+
+
+def test_timers_do_not_need_a_thread_each():
+
+    termination_bus = rr.Bus(False, "Termination")
+    timers = [rr.Timer(rr.Bus(0, "Timer bus"), 0.2, 0, termination_bus, "Timer {0:d}".format(idx))
+              for idx in range(50)]
+    timers.append(rr.Timer(termination_bus, 0.3, 0, termination_bus, "Main timer"))
+    peak_threads = [threading.active_count()]
+    stop = threading.Event()
+
+    def sampleThreads():
+        while not stop.wait(0.01):
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+    sampler = threading.Thread(target=sampleThreads)
+    sampler.start()
+    rr.runConcurrently(timers)
+    stop.set()
+    sampler.join()
+
+    assert peak_threads[0] < 10
+
+
+@pytest.mark.parametrize('backend_name, execution', [('rossros', 'thread'), ('rossros', 'executive'),
+                                                     ('rossros', 'pool'), ('rossros_asyncio', None)])
+@pytest.mark.parametrize('fires_on_own_bus', [False, True])
+def test_timer_restarted_after_firing_fires_again(backend_name, execution, fires_on_own_bus):
+
+    backend = importlib.import_module(backend_name)
+    termination_bus = backend.Bus(False, "Termination")
+    alarm_bus = backend.Bus(-1, "Alarm")
+    started = time.monotonic()
+    writes = []
+    alarm_bus.add_listener(lambda: writes.append(time.monotonic() - started))
+
+    # The alarm fires at 0.1 s, and is restarted at 0.25 s, while the main timer keeps the service running
+    alarm = backend.Timer(alarm_bus, 0.1, 0, alarm_bus if fires_on_own_bus else termination_bus, "Alarm")
+    restarted = []
+
+    def restart():
+        if not restarted and time.monotonic() - started > 0.25:
+            restarted.append(True)
+            alarm.restart()
+
+    nodes = [alarm,
+             backend.Timer(termination_bus, 0.6, 0, termination_bus, "Main timer"),
+             backend.Producer(restart, backend.Bus(0, "Restarter"), 0.01, termination_bus, "Restarter")]
+    if execution is None:
+        backend.runConcurrently(nodes)
+    else:
+        backend.runConcurrently(nodes, execution=execution)
+
+    assert len(writes) == 2
+    assert 0.1 <= writes[0] < 0.2
+    assert 0.35 <= writes[1] < 0.45
@@ -0,0 +1,64 @@
+"""
+Tests of change notification on buses, and of consumer-producers that run when their inputs are written
+"""
+
+import threading
+import time
+
+import rossros as rr
+
+
+def test_wait_for_change_returns_the_new_version():
+
+    bus = rr.Bus(0, "Bus")
+    writer = threading.Timer(0.05, bus.set_message, (1, "writer"))
+    writer.start()
+
+    assert bus.wait_for_change(0, 2.0, "test") == 1
+    assert bus.wait_for_change(1, 0.01, "test") == 1
+    writer.join()
+
+
+def test_trigger_any_and_all(backend):
+
+    termination_bus = backend.Bus(False, "Termination")
+    bus_a = backend.Bus(0, "A")
+    bus_b = backend.Bus(0, "B")
+    counter = [0]
+
+    def count():
+        counter[0] += 1
+        return counter[0]
+
+    any_calls = []
+    all_calls = []
+    nodes = [backend.Producer(count, bus_a, 0.1, termination_bus, "Writer"),
+             backend.Consumer(lambda a, b: any_calls.append(a), (bus_a, bus_b), 0, termination_bus, "Any",
+                              trigger='any'),
+             backend.Consumer(lambda a, b: all_calls.append(a), (bus_a, bus_b), 0, termination_bus, "All",
+                              trigger='all'),
+             backend.Timer(termination_bus, 0.55, 0.01, termination_bus, "Timer")]
+    backend.runConcurrently(nodes)
+
+    # The "any" node runs once on the initial values and then once for each write, so it sees every value; the
+    # "all" node only runs on the initial values, as B is never written
+    assert any_calls[-counter[0]:] == list(range(1, counter[0] + 1))
+    assert len(any_calls) <= counter[0] + 1
+    assert len(all_calls) == 1
+
+
+def test_trigger_wakes_on_writes_from_another_process():
+
+    termination_bus = rr.ProcessBus(False, "Termination", 64)
+    source_bus = rr.ProcessBus(0.0, "Source", 64)
+    copy_bus = rr.ProcessBus(0.0, "Copy", 64)
+    nodes = [rr.Producer(time.monotonic, source_bus, 0.02, termination_bus, "Source", execution='process'),
+             rr.ConsumerProducer(lambda x: x, source_bus, copy_bus, 0, termination_bus, "Copier", trigger='any',
+                                 execution='process'),
+             rr.Timer(termination_bus, 0.5, 0.01, termination_bus, "Timer")]
+
+    started = time.monotonic()
+    rr.runConcurrently(nodes)
+
+    assert time.monotonic() - started < 5
+    assert copy_bus.get_message("test") > 0
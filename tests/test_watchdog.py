@@ -0,0 +1,141 @@
+"""
+Tests of the watchdog: stall and crash reports, restarts, and stretching the periods of degradable nodes
+"""
+
+import threading
+import time
+
+import pytest
+
+import rossros as rr
+import rossros_asyncio as ra
+
+
+def flakyFunction(crash_counts):
+
+    # Function that raises on the calls whose numbers are listed in crash_counts
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) in crash_counts:
+            raise RuntimeError("Flaky node crashed")
+        return len(calls)
+
+    return flaky, calls
+
+
+def test_stalls_and_crashes_are_reported():
+
+    termination_bus = rr.Bus(False, "Termination")
+    status_bus = rr.Bus({}, "Status")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        if len(calls) == 3:
+            time.sleep(0.6)
+        return 0
+
+    flaky, flaky_calls = flakyFunction((5, 6))
+    stalling_node = rr.Producer(slow, rr.Bus(0, "Slow"), 0.01, termination_bus, "Stalling")
+    flaky_node = rr.Producer(flaky, rr.Bus(0, "Flaky"), 0.01, termination_bus, "Flaky")
+    watchdog = rr.Watchdog((stalling_node, flaky_node), status_bus, 0.02, termination_bus, "Watchdog",
+                           stall_timeout=0.2, restart_backoff=0.05)
+
+    # Record every status the watchdog writes
+    statuses = []
+    status_bus.add_listener(lambda: statuses.append(dict(status_bus.get_message("test"))))
+    rr.runConcurrently([stalling_node, flaky_node, watchdog,
+                        rr.Timer(termination_bus, 1.5, 0, termination_bus, "Timer")])
+
+    states = {name: set(status[name] for status in statuses) for name in ("Stalling", "Flaky")}
+    assert "stalled" in states["Stalling"]
+    assert {"crashed", "restarting"} <= states["Flaky"]
+
+    # The flaky node was restarted after both crashes, and kept running
+    assert flaky_node.crashes == 2
+    assert len(flaky_calls) > 20
+
+
+def test_crash_without_restart_policy_propagates():
+
+    termination_bus = rr.Bus(False, "Termination")
+    node = rr.Producer(lambda: 1 / 0, rr.Bus(0, "Output"), 0.01, termination_bus, "Bad")
+    watchdog = rr.Watchdog(node, (), 0.02, termination_bus, "Watchdog")
+
+    with pytest.raises(ZeroDivisionError):
+        rr.runConcurrently([node, watchdog, rr.Timer(termination_bus, 0.3, 0, termination_bus, "Timer")])
+    assert watchdog.states[node] == 'crashed'
+
+
+def test_asyncio_restart():
+
+    termination_bus = ra.Bus(False, "Termination")
+    flaky, flaky_calls = flakyFunction((5, 6))
+    node = ra.Producer(flaky, ra.Bus(0, "Flaky"), 0.01, termination_bus, "Flaky")
+    watchdog = ra.Watchdog(node, (), 0.02, termination_bus, "Watchdog", restart_backoff=0.05)
+    ra.runConcurrently([node, watchdog, ra.Timer(termination_bus, 0.5, 0, termination_bus, "Timer")])
+
+    assert node.crashes == 2
+    assert len(flaky_calls) > 10
+
+
+def test_overload_stretches_degradable_nodes():
+
+    termination_bus = rr.Bus(False, "Termination")
+    load = {'heavy': True}
+
+    def critical():
+        if load['heavy']:
+            time.sleep(0.03)
+
+    # The critical node overruns its period until the load is taken off
+    critical_node = rr.Producer(critical, rr.Bus(0, "Critical"), 0.02, termination_bus, "Critical",
+                                fixed_rate=True)
+    background_node = rr.Producer(lambda: 0, rr.Bus(0, "Background"), 0.01, termination_bus, "Background")
+    watchdog = rr.Watchdog((critical_node, background_node), (), 0.05, termination_bus, "Watchdog",
+                           degradable=background_node, max_stretch=8, recovery_time=0.2)
+    delays = []
+    probe = rr.Producer(lambda: delays.append(background_node.delay), rr.Bus(0, "Probe"), 0.05, termination_bus,
+                        "Probe")
+    unload = threading.Timer(0.5, lambda: load.update(heavy=False))
+    unload.start()
+    rr.runConcurrently([critical_node, background_node, watchdog, probe,
+                        rr.Timer(termination_bus, 2.0, 0, termination_bus, "Timer")])
+    unload.join()
+
+    assert max(delays) == 0.08
+    assert delays[-1] == 0.01
+
+
+def test_nodes_without_delay_are_stretched_from_min_period():
+
+    fast_node = rr.Producer(lambda: 1, rr.Bus(0, "Fast"), 0, rr.Bus(False, "Termination"), "Fast")
+    critical_node = rr.Producer(lambda: 1, rr.Bus(0, "Critical"), 0.1, rr.Bus(False, "Termination"), "Critical")
+    watchdog = rr.Watchdog((fast_node, critical_node), degradable=fast_node, min_period=0.01, max_stretch=4.0,
+                           recovery_time=1.0)
+
+    # Stretch four times, which hits the limit of four times the minimum period
+    delays = []
+    for now in range(4):
+        watchdog.adjustPeriods(True, now)
+        delays.append(fast_node.delay)
+    assert delays == [0.02, 0.04, 0.04, 0.04]
+
+    # Shrinking goes back one step per recovery time, and ends at the original zero delay
+    now = 10
+    while fast_node.delay:
+        watchdog.adjustPeriods(False, now)
+        now += 10
+        assert now < 100
+    assert watchdog.last_overload is None
+
+
+def test_degradable_nodes_must_be_supervised():
+
+    node = rr.Producer(lambda: 1, rr.Bus(0, "Output"), 0.01, rr.Bus(False, "Termination"), "Node")
+    other_node = rr.Producer(lambda: 1, rr.Bus(0, "Other"), 0.01, rr.Bus(False, "Termination"), "Other")
+
+    with pytest.raises(ValueError):
+        rr.Watchdog(node, degradable=other_node)
@@ -0,0 +1,75 @@
+"""
+Tests of the M:N worker pool backend
+"""
+
+import threading
+import time
+
+import pytest
+
+import rossros as rr
+
+
+def test_many_nodes_run_on_a_few_threads():
+
+    termination_bus = rr.Bus(False, "Termination")
+    counts = [0] * 200
+    threads = set()
+
+    def step(value, idx):
+        counts[idx] += 1
+        threads.add(threading.get_ident())
+        return value + 1
+
+    nodes = []
+    for idx in range(len(counts)):
+        bus = rr.Bus(0, "Bus {0:d}".format(idx))
+        nodes.append(rr.ConsumerProducer(lambda value, idx=idx: step(value, idx), bus, bus, 0.02, termination_bus,
+                                         "Node {0:d}".format(idx)))
+    nodes.append(rr.Timer(termination_bus, 0.5, 0, termination_bus, "Timer"))
+
+    rr.runConcurrently(nodes, execution='pool', workers=4)
+
+    assert len(threads) <= 4
+    assert min(counts) >= 10
+
+
+def test_triggered_chain_runs_in_the_pool():
+
+    termination_bus = rr.Bus(False, "Termination")
+    source_bus = rr.Bus(0.0, "Source")
+    copy_bus = rr.Bus(0.0, "Copy")
+    latencies = []
+    nodes = [rr.Producer(time.monotonic, source_bus, 0.01, termination_bus, "Source"),
+             rr.ConsumerProducer(lambda value: value, source_bus, copy_bus, 0, termination_bus, "Copier",
+                                 trigger='any'),
+             rr.Consumer(lambda value: latencies.append(time.monotonic() - value), copy_bus, 0, termination_bus,
+                         "Sink", trigger='any'),
+             rr.Timer(termination_bus, 0.3, 0, termination_bus, "Timer")]
+
+    rr.runConcurrently(nodes, execution='pool', workers=2)
+
+    assert len(latencies) >= 10
+    assert sorted(latencies)[len(latencies) // 2] < 0.01
+
+
+def test_node_errors_stop_the_pool():
+
+    def fail():
+        raise RuntimeError("failed")
+
+    termination_bus = rr.Bus(False, "Termination")
+    nodes = [rr.Producer(fail, rr.Bus(0, "Failing output"), 0.01, termination_bus, "Failing"),
+             rr.Producer(lambda: 1, rr.Bus(0, "Output"), 0.01, termination_bus, "Working"),
+             rr.Timer(termination_bus, 5, 0, termination_bus, "Timer")]
+
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="failed"):
+        rr.runConcurrently(nodes, execution='pool')
+    assert time.monotonic() - started < 1
+
+
+def test_pool_needs_a_worker():
+
+    with pytest.raises(ValueError):
+        rr.WorkerPool([], workers=0)